@@ -3,17 +3,167 @@ Anomaly Detection Agent
 
 Identifica patrones sospechosos y red flags usando ML + reglas heurísticas
 """
+import asyncio
 import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from app.db.database import AsyncSessionLocal
 
 from app.core.agent_config import AnomalyDetectionConfig
 from agents.orchestrator.state import WorkflowState, TaskDefinition, AgentType
+from agents.anomaly_detection.rules import (
+    compile_rules, identify_missing_elements, AmountBatch
+)
+from agents.anomaly_detection._kernels import scan_amounts
 
 logger = logging.getLogger(__name__)
 
 
+def _has_enough_lines(text: str, k: int = 10) -> bool:
+    """
+    Indica si el texto tiene al menos `k` líneas
+
+    Equivale a `len(text.split('\\n')) >= k` pero corta al encontrar el
+    salto de línea k-1 y no arma la lista de líneas.
+    """
+    needed = k - 1
+    count = 0
+    pos = 0
+    find = text.find
+    while count < needed:
+        idx = find('\n', pos)
+        if idx < 0:
+            return False
+        count += 1
+        pos = idx + 1
+    return True
+
+
+class _ErrorLogLimiter:
+    """
+    Limita los tracebacks completos en el log durante ráfagas de errores
+
+    Dentro de cada ventana de `window` segundos solo los primeros `limit`
+    errores se loguean con `exc_info`; el resto se loguea en una línea y se
+    cuenta como suprimido.
+    """
+    __slots__ = ('limit', 'window', 'always', '_window_start', '_count')
+
+    def __init__(self, limit: int, window: float, always: bool = False):
+        self.limit = limit
+        self.window = window
+        self.always = always
+        self._window_start = float('-inf')
+        self._count = 0
+
+    def error(self, message: str) -> None:
+        """Loguea `message` con o sin traceback según la ventana actual"""
+        if self.always:
+            logger.error(message, exc_info=True)
+            return
+        
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self._count = 0
+        self._count += 1
+        
+        if self._count <= self.limit:
+            logger.error(message, exc_info=True)
+        else:
+            suppressed = self._count - self.limit
+            logger.error(f"{message} (traceback suprimido, {suppressed} en esta ventana)")
+
+
+@dataclass(frozen=True, slots=True)
+class TokenStats:
+    """Estadísticas de texto calculadas una vez por documento"""
+    n_tokens: int
+    text_len: int
+    structured: bool   # al menos 10 líneas
+    repetitive: bool   # menos de 30% de palabras únicas
+
+
+def _compute_text_stats(text: str) -> TokenStats:
+    """Tokeniza el texto una sola vez y resume lo que usan los scores"""
+    words = text.lower().split()
+    return TokenStats(
+        n_tokens=len(words),
+        text_len=len(text),
+        structured=_has_enough_lines(text, 10),
+        repetitive=_unique_ratio_below(words, 0.3)
+    )
+
+
+@lru_cache(maxsize=1024)
+def _transparency_from_features(n_amounts: int, n_beneficiaries: int,
+                                has_organisms: bool, n_dates: int,
+                                short_text: bool, structured: bool) -> float:
+    """
+    Score de transparencia (0-100) a partir de las features del documento
+
+    Es función pura de escalares acotados, así que se memoiza: documentos
+    con el mismo perfil reutilizan el resultado.
+    """
+    score = 50.0  # Base
+    
+    # Puntos por tener montos identificados
+    if n_amounts:
+        score += 10
+        if n_amounts >= 5:
+            score += 5
+    
+    # Puntos por identificar beneficiarios
+    if n_beneficiaries:
+        score += 15
+        if n_beneficiaries >= 3:
+            score += 5
+    
+    # Puntos por identificar organismos
+    if has_organisms:
+        score += 10
+    
+    # Penalización por texto muy corto
+    if short_text:
+        score -= 15
+    
+    # Penalización por falta de estructura
+    if not structured:
+        score -= 10
+    
+    # Bonus por fechas claras
+    if n_dates >= 2:
+        score += 5
+    
+    # Asegurar rango 0-100
+    return max(0.0, min(100.0, score))
+
+
+def _unique_ratio_below(words: List[str], threshold: float = 0.3) -> bool:
+    """
+    Indica si la proporción de palabras únicas es menor a `threshold`
+
+    Corta apenas la cantidad de únicas alcanza `threshold * len(words)`:
+    a partir de ahí el ratio final ya no puede quedar por debajo, así que
+    en textos normales no se llega a construir el set completo.
+    """
+    limit = threshold * len(words)
+    if not limit:
+        return False
+    
+    seen = set()
+    add = seen.add
+    for word in words:
+        if word not in seen:
+            add(word)
+            if len(seen) >= limit:
+                return False
+    return True
+
+
 class AnomalyDetectionAgent:
     """
     Agente especializado en detección de anomalías
@@ -25,6 +175,25 @@ class AnomalyDetectionAgent:
     - Generación de explicaciones
     """
     
+    # Predicciones ML placeholder: solo dependen de en qué tramo cae el score
+    # de transparencia (>50, 40-50, <40). Son plantillas compartidas: cada
+    # documento recibe una copia.
+    _ML_LOW_RISK = {
+        "random_forest": {"risk_probability": 0.3, "confidence": 0.75},
+        "isolation_forest": {"is_anomaly": False, "anomaly_score": -0.5},
+        "kmeans": {"cluster": 1, "distance_to_centroid": 1.5}
+    }
+    _ML_HIGH_RISK = {
+        "random_forest": {"risk_probability": 0.7, "confidence": 0.75},
+        "isolation_forest": {"is_anomaly": False, "anomaly_score": -0.5},
+        "kmeans": {"cluster": 2, "distance_to_centroid": 1.5}
+    }
+    _ML_HIGH_RISK_ANOMALY = {
+        "random_forest": {"risk_probability": 0.7, "confidence": 0.75},
+        "isolation_forest": {"is_anomaly": True, "anomaly_score": -0.5},
+        "kmeans": {"cluster": 2, "distance_to_centroid": 1.5}
+    }
+    
     def __init__(self, config: Optional[AnomalyDetectionConfig] = None):
         """
         Inicializa el agente
@@ -38,6 +207,19 @@ class AnomalyDetectionAgent:
         # Modelos ML (placeholder - cargar modelos entrenados)
         self.models = {}
         
+        # Reglas de red flags y thresholds de riesgo resueltos una sola vez
+        self._compile_rules()
+        thresholds = self.config.transparency_thresholds
+        self._high_risk_threshold = thresholds.get('high_risk', 30)
+        self._medium_risk_threshold = thresholds.get('medium_risk', 50)
+        self._very_high_amount = self.config.amount_thresholds.get('very_high', 50000000)
+        
+        self._error_log = _ErrorLogLimiter(
+            self.config.error_traceback_limit,
+            self.config.error_window_seconds,
+            always=self.config.debug_tracebacks
+        )
+        
         logger.info("AnomalyDetectionAgent inicializado")
     
     async def execute(self, workflow: WorkflowState, 
@@ -96,21 +278,33 @@ class AnomalyDetectionAgent:
             Análisis completo con red flags y scores
         """
         try:
-            # Calcular score de transparencia
-            transparency_score = self._calculate_transparency_score(text, entities)
+            now_iso = datetime.utcnow().isoformat()
             
-            # Calcular score de anomalía
-            anomaly_score = self._calculate_anomaly_score(entities, text)
+            # Conversiones de los montos compartidas por score y reglas
+            amount_batch = AmountBatch(entities.get('amounts') or [])
+            
+            # Única pasada sobre el texto (CPU-bound), fuera del event loop;
+            # los scores consumen las estadísticas sin volver a tokenizar
+            text_stats = await asyncio.to_thread(_compute_text_stats, text)
+            
+            # Calcular scores de transparencia y anomalía
+            transparency_score = self._calculate_transparency_score(text, entities, text_stats)
+            anomaly_score = self._calculate_anomaly_score(entities, text, amount_batch, text_stats)
             
             # Determinar nivel de riesgo
             risk_level = self._determine_risk_level(transparency_score, anomaly_score)
             
-            # Detectar red flags
-            red_flags = self._detect_red_flags(text, entities, transparency_score)
+            # Detectar red flags (depende del score de transparencia)
+            red_flags = await asyncio.to_thread(
+                self._detect_red_flags,
+                text, entities, transparency_score, amount_batch, now_iso
+            )
             
             # Predicciones ML
             ml_predictions = self._run_ml_predictions(entities, transparency_score)
             
+            # El resultado se mantiene como dict de tipos nativos: el orquestador
+            # lo guarda en TaskDefinition.result y lo persiste en columnas JSON
             result = {
                 "success": True,
                 "document_id": document_id,
@@ -120,7 +314,7 @@ class AnomalyDetectionAgent:
                 "red_flags": red_flags,
                 "num_red_flags": len(red_flags),
                 "ml_predictions": ml_predictions,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": now_iso
             }
             
             logger.info(f"Documento analizado: risk={risk_level}, "
@@ -130,7 +324,7 @@ class AnomalyDetectionAgent:
             return result
             
         except Exception as e:
-            logger.error(f"Error analizando documento: {e}", exc_info=True)
+            self._error_log.error(f"Error analizando documento: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -166,209 +360,115 @@ class AnomalyDetectionAgent:
         return self._detect_red_flags(text, entities, transparency_score)
     
     def _calculate_transparency_score(self, text: str, 
-                                     entities: Dict[str, Any]) -> float:
+                                     entities: Dict[str, Any],
+                                     text_stats: Optional[TokenStats] = None) -> float:
         """Calcula score de transparencia (0-100)"""
-        score = 50.0  # Base
-        
-        # Puntos por tener montos identificados
-        if entities.get('amounts'):
-            score += 10
-            if len(entities['amounts']) >= 5:
-                score += 5
-        
-        # Puntos por identificar beneficiarios
-        if entities.get('beneficiaries'):
-            score += 15
-            if len(entities['beneficiaries']) >= 3:
-                score += 5
-        
-        # Puntos por identificar organismos
-        if entities.get('organisms'):
-            score += 10
-        
-        # Penalización por texto muy corto
-        if len(text) < 1000:
-            score -= 15
-        
-        # Penalización por falta de estructura
-        if '\n' not in text or len(text.split('\n')) < 10:
-            score -= 10
-        
-        # Bonus por fechas claras
-        if entities.get('dates') and len(entities['dates']) >= 2:
-            score += 5
-        
-        # Asegurar rango 0-100
-        return max(0.0, min(100.0, score))
+        if text_stats is not None:
+            text_len, structured = text_stats.text_len, text_stats.structured
+        else:
+            text_len, structured = len(text), _has_enough_lines(text, 10)
+        
+        # Los conteos se saturan en el máximo que distingue el scoring, así el
+        # espacio de claves del cache queda acotado
+        get = entities.get
+        return _transparency_from_features(
+            min(len(get('amounts') or ()), 5),
+            min(len(get('beneficiaries') or ()), 3),
+            bool(get('organisms')),
+            min(len(get('dates') or ()), 2),
+            text_len < 1000,
+            structured
+        )
     
     def _calculate_anomaly_score(self, entities: Dict[str, Any], 
-                                 text: str) -> float:
+                                 text: str,
+                                 amount_batch: Optional[AmountBatch] = None,
+                                 text_stats: Optional[TokenStats] = None) -> float:
         """Calcula score de anomalía (0-100)"""
         anomaly = 0.0
         
+        if amount_batch is None:
+            amount_batch = AmountBatch(entities.get('amounts') or [])
+        
         # Montos sospechosos
-        amounts = entities.get('amounts', [])
-        for amount in amounts:
-            value = amount['numeric_value']
+        if amount_batch:
+            # Patrones sospechosos y montos muy altos en una sola pasada
+            amounts_anomaly, _, _ = scan_amounts(amount_batch.values, self._very_high_amount)
+            anomaly += amounts_anomaly
             
-            # Patrones sospechosos
-            if '999' in str(int(value)):
-                anomaly += 15
-            
-            # Montos muy altos
-            threshold = self.config.amount_thresholds.get('very_high', 50000000)
-            if value > threshold:
-                anomaly += 10
-        
-        # Falta de beneficiarios con montos altos
-        if amounts and not entities.get('beneficiaries'):
-            anomaly += 20
+            # Falta de beneficiarios con montos altos
+            if not entities.get('beneficiaries'):
+                anomaly += 20
         
         # Texto muy repetitivo
-        words = text.lower().split()
-        if len(words) > 0:
-            unique_ratio = len(set(words)) / len(words)
-            if unique_ratio < 0.3:
-                anomaly += 15
+        if text_stats is not None:
+            repetitive = text_stats.repetitive
+        else:
+            repetitive = _unique_ratio_below(text.lower().split(), 0.3)
+        if repetitive:
+            anomaly += 15
         
         return min(100.0, anomaly)
     
     def _determine_risk_level(self, transparency_score: float, 
                              anomaly_score: float) -> str:
         """Determina nivel de riesgo"""
-        thresholds = self.config.transparency_thresholds
-        
         # Basado en transparency score
-        if transparency_score < thresholds.get('high_risk', 30):
+        if transparency_score < self._high_risk_threshold:
             return 'high'
-        elif transparency_score < thresholds.get('medium_risk', 50):
+        elif transparency_score < self._medium_risk_threshold:
             return 'medium'
         elif anomaly_score > 60:
             return 'medium'
         else:
             return 'low'
     
+    def _compile_rules(self) -> None:
+        """Precompila las reglas de red flags desde la configuración"""
+        self._rules = compile_rules(self.config.red_flag_rules)
+        
+        # Métodos `apply` ya ligados; para documentos sin montos se descartan
+        # de antemano las reglas que solo miran montos
+        self._rule_appliers = tuple(rule.apply for rule in self._rules)
+        self._rule_appliers_without_amounts = tuple(
+            rule.apply for rule in self._rules if not rule.requires_amounts
+        )
+    
     def _detect_red_flags(self, text: str, entities: Dict[str, Any],
-                         transparency_score: float) -> List[Dict[str, Any]]:
+                         transparency_score: float,
+                         amount_batch: Optional[AmountBatch] = None,
+                         now_iso: Optional[str] = None) -> List[Dict[str, Any]]:
         """Detecta red flags basadas en reglas"""
         red_flags = []
         
-        # RED FLAG: HIGH_AMOUNT
-        rule = self.config.red_flag_rules.get('HIGH_AMOUNT', {})
-        if rule.get('enabled', True):
-            threshold = rule.get('threshold', 50000000)
-            for amount in entities.get('amounts', []):
-                if amount['numeric_value'] > threshold:
-                    red_flags.append({
-                        "type": "HIGH_AMOUNT",
-                        "severity": "high",
-                        "category": "amounts",
-                        "title": f"Monto muy alto detectado: ${amount['numeric_value']:,.0f}",
-                        "description": f"Se detectó un monto de ${amount['numeric_value']:,.0f} que supera el threshold de ${threshold:,.0f}",
-                        "evidence": {
-                            "amount": amount['numeric_value'],
-                            "raw_text": amount['raw_text'],
-                            "threshold": threshold
-                        },
-                        "confidence_score": 0.9,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-        
-        # RED FLAG: MISSING_BENEFICIARY
-        rule = self.config.red_flag_rules.get('MISSING_BENEFICIARY', {})
-        if rule.get('enabled', True):
-            if entities.get('amounts') and not entities.get('beneficiaries'):
-                red_flags.append({
-                    "type": "MISSING_BENEFICIARY",
-                    "severity": "medium",
-                    "category": "transparency",
-                    "title": "Falta identificación de beneficiario",
-                    "description": "Se detectaron montos pero no se pudo identificar beneficiarios",
-                    "evidence": {
-                        "amounts_count": len(entities.get('amounts', [])),
-                        "beneficiaries_found": 0
-                    },
-                    "confidence_score": 0.7,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-        
-        # RED FLAG: SUSPICIOUS_AMOUNT_PATTERN
-        rule = self.config.red_flag_rules.get('SUSPICIOUS_AMOUNT_PATTERN', {})
-        if rule.get('enabled', True):
-            patterns = rule.get('patterns', ['999999', '9999'])
-            for amount in entities.get('amounts', []):
-                amount_str = str(int(amount['numeric_value']))
-                for pattern in patterns:
-                    if pattern in amount_str:
-                        red_flags.append({
-                            "type": "SUSPICIOUS_AMOUNT_PATTERN",
-                            "severity": "medium",
-                            "category": "patterns",
-                            "title": f"Patrón sospechoso en monto: {pattern}",
-                            "description": f"El monto ${amount['numeric_value']:,.0f} contiene el patrón sospechoso '{pattern}'",
-                            "evidence": {
-                                "amount": amount['numeric_value'],
-                                "pattern": pattern,
-                                "raw_text": amount['raw_text']
-                            },
-                            "confidence_score": 0.8,
-                            "timestamp": datetime.utcnow().isoformat()
-                        })
-        
-        # RED FLAG: LOW_TRANSPARENCY_SCORE
-        rule = self.config.red_flag_rules.get('LOW_TRANSPARENCY_SCORE', {})
-        if rule.get('enabled', True):
-            threshold = rule.get('threshold', 30)
-            if transparency_score < threshold:
-                red_flags.append({
-                    "type": "LOW_TRANSPARENCY_SCORE",
-                    "severity": "high",
-                    "category": "transparency",
-                    "title": f"Score de transparencia muy bajo: {transparency_score:.1f}",
-                    "description": f"El documento tiene un score de transparencia de {transparency_score:.1f}, por debajo del threshold de {threshold}",
-                    "evidence": {
-                        "transparency_score": transparency_score,
-                        "threshold": threshold,
-                        "missing_elements": self._identify_missing_elements(entities)
-                    },
-                    "confidence_score": 0.95,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-        
-        return red_flags
+        # Todas las red flags de un documento comparten el instante de detección
+        if now_iso is None:
+            now_iso = datetime.utcnow().isoformat()
+        if amount_batch is None:
+            amount_batch = AmountBatch(entities.get('amounts') or [])
+        appliers = (self._rule_appliers if amount_batch
+                    else self._rule_appliers_without_amounts)
+        for apply in appliers:
+            apply(text, entities, transparency_score, red_flags, amount_batch, now_iso)
+        
+        return [flag.to_dict() for flag in red_flags]
     
     def _identify_missing_elements(self, entities: Dict[str, Any]) -> List[str]:
         """Identifica elementos faltantes para transparencia"""
-        missing = []
-        
-        if not entities.get('amounts'):
-            missing.append("montos")
-        if not entities.get('beneficiaries'):
-            missing.append("beneficiarios")
-        if not entities.get('organisms'):
-            missing.append("organismos")
-        if not entities.get('dates'):
-            missing.append("fechas")
-        
-        return missing
+        return identify_missing_elements(entities)
     
     def _run_ml_predictions(self, entities: Dict[str, Any],
                            transparency_score: float) -> Dict[str, Any]:
         """Ejecutar predicciones ML (placeholder)"""
-        return {
-            "random_forest": {
-                "risk_probability": 0.3 if transparency_score > 50 else 0.7,
-                "confidence": 0.75
-            },
-            "isolation_forest": {
-                "is_anomaly": transparency_score < 40,
-                "anomaly_score": -0.5
-            },
-            "kmeans": {
-                "cluster": 1 if transparency_score > 50 else 2,
-                "distance_to_centroid": 1.5
-            }
-        }
+        if transparency_score > 50:
+            template = self._ML_LOW_RISK
+        elif transparency_score < 40:
+            template = self._ML_HIGH_RISK_ANOMALY
+        else:
+            template = self._ML_HIGH_RISK
+        # Copia de dos niveles: el resultado se puede modificar sin afectar
+        # a los documentos siguientes
+        return {model: dict(prediction) for model, prediction in template.items()}
     
     async def analyze_high_risk_documents(self, threshold: int = 50, 
                                          limit: int = 20) -> Dict[str, Any]:
@@ -386,32 +486,31 @@ class AnomalyDetectionAgent:
             from agents.tools.analysis_tools import AnalysisTools
             
             async with AsyncSessionLocal() as db:
-                # Obtener documentos de alto riesgo
-                high_risk_docs = await AnalysisTools.get_top_risk_documents(db, limit=limit)
-                
-                # Filtrar por threshold
-                filtered_docs = [
-                    doc for doc in high_risk_docs 
-                    if doc.get('transparency_score', 100) < threshold
-                ]
+                # Obtener documentos de alto riesgo (el threshold se filtra en SQL)
+                high_risk_docs = await AnalysisTools.get_top_risk_documents(
+                    db, limit=limit, max_transparency_score=threshold
+                )
                 
-                # Estadísticas
+                # Estadísticas agregadas en la base de datos
+                db_stats = await AnalysisTools.get_risk_statistics(
+                    db, max_transparency_score=threshold
+                )
                 stats = {
-                    "total_analyzed": len(filtered_docs),
+                    "total_analyzed": db_stats["count"],
                     "threshold_used": threshold,
-                    "average_score": sum(d.get('transparency_score', 0) for d in filtered_docs) / len(filtered_docs) if filtered_docs else 0,
-                    "total_red_flags": sum(d.get('red_flags_count', 0) for d in filtered_docs)
+                    "average_score": db_stats["average_score"],
+                    "total_red_flags": db_stats["total_red_flags"]
                 }
                 
-                logger.info(f"Análisis de alto riesgo completado: {len(filtered_docs)} documentos")
+                logger.info(f"Análisis de alto riesgo completado: {db_stats['count']} documentos")
                 
                 return {
                     "success": True,
                     "task_type": "analyze_high_risk",
                     "statistics": stats,
-                    "high_risk_documents": filtered_docs[:10],  # Top 10
+                    "high_risk_documents": high_risk_docs[:10],  # Top 10
                     "recommendations": [
-                        f"Se encontraron {len(filtered_docs)} documentos con score < {threshold}",
+                        f"Se encontraron {db_stats['count']} documentos con score < {threshold}",
                         "Revisar documentos priorizados por severidad de red flags",
                         "Considerar auditoría manual de casos críticos"
                     ],
@@ -419,7 +518,7 @@ class AnomalyDetectionAgent:
                 }
                 
         except Exception as e:
-            logger.error(f"Error en análisis de alto riesgo: {e}", exc_info=True)
+            self._error_log.error(f"Error en análisis de alto riesgo: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -0,0 +1,285 @@
+"""
+Reglas de red flags para Anomaly Detection Agent
+
+Cada regla se resuelve una única vez desde `AnomalyDetectionConfig` y queda
+congelada: el hot path de `_detect_red_flags` solo itera la tupla de reglas
+sin volver a consultar la configuración.
+"""
+
+import re
+from typing import Dict, List, Any, Tuple, Optional, ClassVar
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def amount_values(amounts: List[Dict[str, Any]]) -> np.ndarray:
+    """Materializa los `numeric_value` de los montos en un array float64"""
+    return np.fromiter(
+        (a['numeric_value'] for a in amounts), dtype=np.float64, count=len(amounts)
+    )
+
+
+class AmountBatch:
+    """
+    Vista de los montos de un documento con conversiones calculadas una vez
+
+    `values` se materializa al construir la vista; `int_strs`
+    (`str(int(numeric_value))` por monto) recién cuando alguna regla lo pide,
+    y queda memoizado para el resto de las reglas del documento.
+    """
+    __slots__ = ('items', 'values', '_int_strs')
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self.values = amount_values(items)
+        self._int_strs: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def int_strs(self) -> List[str]:
+        if self._int_strs is None:
+            self._int_strs = [str(int(a['numeric_value'])) for a in self.items]
+        return self._int_strs
+
+
+def digit_pattern_mask(values: np.ndarray, pattern: str) -> np.ndarray:
+    """
+    Máscara vectorizada equivalente a `pattern in str(int(value))`
+
+    Barre los dígitos de cada monto con aritmética entera: en cada paso
+    compara los últimos `len(pattern)` dígitos contra el patrón y descarta
+    un dígito. Solo se comparan ventanas completas, así que el resultado es
+    exacto también para patrones con ceros a la izquierda.
+    """
+    width = len(pattern)
+    target = int(pattern)
+    modulo = 10 ** width
+    lowest = 10 ** (width - 1)
+
+    remaining = np.abs(values.astype(np.int64))
+    mask = np.zeros(len(remaining), dtype=bool)
+    active = remaining >= lowest
+    while active.any():
+        mask |= active & (remaining % modulo == target)
+        remaining //= 10
+        active = remaining >= lowest
+    return mask
+
+
+@dataclass(frozen=True, slots=True)
+class RedFlag:
+    """Red flag detectada en un documento"""
+    type: str
+    severity: str
+    category: str
+    title: str
+    description: str
+    evidence: Dict[str, Any]
+    confidence_score: float
+    timestamp: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa la red flag al formato de respuesta del agente"""
+        return {
+            "type": self.type,
+            "severity": self.severity,
+            "category": self.category,
+            "title": self.title,
+            "description": self.description,
+            "evidence": self.evidence,
+            "confidence_score": self.confidence_score,
+            "timestamp": self.timestamp
+        }
+
+
+def identify_missing_elements(entities: Dict[str, Any]) -> List[str]:
+    """Identifica elementos faltantes para transparencia"""
+    missing = []
+    get = entities.get
+
+    if not get('amounts'):
+        missing.append("montos")
+    if not get('beneficiaries'):
+        missing.append("beneficiarios")
+    if not get('organisms'):
+        missing.append("organismos")
+    if not get('dates'):
+        missing.append("fechas")
+
+    return missing
+
+
+@dataclass(frozen=True, slots=True)
+class HighAmountRule:
+    """RED FLAG: HIGH_AMOUNT"""
+    requires_amounts: ClassVar[bool] = True
+    threshold: float
+
+    def apply(self, text: str, entities: Dict[str, Any],
+              transparency_score: float, out: List[RedFlag],
+              amounts: AmountBatch, now_iso: str) -> None:
+        if not amounts:
+            return
+        items = amounts.items
+        threshold = self.threshold
+        for idx in np.flatnonzero(amounts.values > threshold):
+            amount = items[idx]
+            out.append(RedFlag(
+                type="HIGH_AMOUNT",
+                severity="high",
+                category="amounts",
+                title=f"Monto muy alto detectado: ${amount['numeric_value']:,.0f}",
+                description=f"Se detectó un monto de ${amount['numeric_value']:,.0f} que supera el threshold de ${threshold:,.0f}",
+                evidence={
+                    "amount": amount['numeric_value'],
+                    "raw_text": amount['raw_text'],
+                    "threshold": threshold
+                },
+                confidence_score=0.9,
+                timestamp=now_iso
+            ))
+
+
+@dataclass(frozen=True, slots=True)
+class MissingBeneficiaryRule:
+    """RED FLAG: MISSING_BENEFICIARY"""
+    requires_amounts: ClassVar[bool] = True
+
+    def apply(self, text: str, entities: Dict[str, Any],
+              transparency_score: float, out: List[RedFlag],
+              amounts: AmountBatch, now_iso: str) -> None:
+        if amounts and not entities.get('beneficiaries'):
+            out.append(RedFlag(
+                type="MISSING_BENEFICIARY",
+                severity="medium",
+                category="transparency",
+                title="Falta identificación de beneficiario",
+                description="Se detectaron montos pero no se pudo identificar beneficiarios",
+                evidence={
+                    "amounts_count": len(amounts),
+                    "beneficiaries_found": 0
+                },
+                confidence_score=0.7,
+                timestamp=now_iso
+            ))
+
+
+@dataclass(frozen=True, slots=True)
+class SuspiciousPatternRule:
+    """RED FLAG: SUSPICIOUS_AMOUNT_PATTERN"""
+    requires_amounts: ClassVar[bool] = True
+    patterns: Tuple[str, ...]
+    # Alternación de todos los patrones: un único scan descarta los montos limpios
+    matcher: re.Pattern
+    # Patrones solo numéricos: se evalúan con aritmética entera sobre los montos
+    numeric: bool
+
+    def apply(self, text: str, entities: Dict[str, Any],
+              transparency_score: float, out: List[RedFlag],
+              amounts: AmountBatch, now_iso: str) -> None:
+        patterns = self.patterns
+        items = amounts.items
+        
+        # Un patrón puede contener a otro ('999999' y '9999'), así que en cada
+        # monto con match se reporta cada patrón presente
+        if self.numeric:
+            masks = [digit_pattern_mask(amounts.values, p) for p in patterns]
+            for idx in np.flatnonzero(np.logical_or.reduce(masks)):
+                amount = items[idx]
+                for pattern, mask in zip(patterns, masks):
+                    if mask[idx]:
+                        out.append(self._flag(amount, pattern, now_iso))
+            return
+        
+        search = self.matcher.search
+        for amount, amount_str in zip(items, amounts.int_strs):
+            if search(amount_str) is None:
+                continue
+            for pattern in patterns:
+                if pattern in amount_str:
+                    out.append(self._flag(amount, pattern, now_iso))
+
+    @staticmethod
+    def _flag(amount: Dict[str, Any], pattern: str, now_iso: str) -> RedFlag:
+        return RedFlag(
+            type="SUSPICIOUS_AMOUNT_PATTERN",
+            severity="medium",
+            category="patterns",
+            title=f"Patrón sospechoso en monto: {pattern}",
+            description=f"El monto ${amount['numeric_value']:,.0f} contiene el patrón sospechoso '{pattern}'",
+            evidence={
+                "amount": amount['numeric_value'],
+                "pattern": pattern,
+                "raw_text": amount['raw_text']
+            },
+            confidence_score=0.8,
+            timestamp=now_iso
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class LowTransparencyRule:
+    """RED FLAG: LOW_TRANSPARENCY_SCORE"""
+    requires_amounts: ClassVar[bool] = False
+    threshold: float
+
+    def apply(self, text: str, entities: Dict[str, Any],
+              transparency_score: float, out: List[RedFlag],
+              amounts: AmountBatch, now_iso: str) -> None:
+        threshold = self.threshold
+        if transparency_score < threshold:
+            out.append(RedFlag(
+                type="LOW_TRANSPARENCY_SCORE",
+                severity="high",
+                category="transparency",
+                title=f"Score de transparencia muy bajo: {transparency_score:.1f}",
+                description=f"El documento tiene un score de transparencia de {transparency_score:.1f}, por debajo del threshold de {threshold}",
+                evidence={
+                    "transparency_score": transparency_score,
+                    "threshold": threshold,
+                    "missing_elements": identify_missing_elements(entities)
+                },
+                confidence_score=0.95,
+                timestamp=now_iso
+            ))
+
+
+def compile_rules(red_flag_rules: Dict[str, Dict[str, Any]]) -> Tuple[Any, ...]:
+    """
+    Resuelve la configuración de red flags en una tupla de reglas listas para aplicar
+
+    Las reglas deshabilitadas no se incluyen, así que el orden de salida de
+    las red flags es el mismo que antes de la compilación.
+
+    Args:
+        red_flag_rules: `AnomalyDetectionConfig.red_flag_rules`
+
+    Returns:
+        Tupla inmutable de reglas habilitadas
+    """
+    rules = []
+
+    rule = red_flag_rules.get('HIGH_AMOUNT', {})
+    if rule.get('enabled', True):
+        rules.append(HighAmountRule(rule.get('threshold', 50000000)))
+
+    rule = red_flag_rules.get('MISSING_BENEFICIARY', {})
+    if rule.get('enabled', True):
+        rules.append(MissingBeneficiaryRule())
+
+    rule = red_flag_rules.get('SUSPICIOUS_AMOUNT_PATTERN', {})
+    if rule.get('enabled', True):
+        patterns = tuple(rule.get('patterns', ['999999', '9999']))
+        if patterns:
+            matcher = re.compile('|'.join(re.escape(p) for p in patterns))
+            numeric = all(p.isascii() and p.isdigit() for p in patterns)
+            rules.append(SuspiciousPatternRule(patterns, matcher, numeric))
+
+    rule = red_flag_rules.get('LOW_TRANSPARENCY_SCORE', {})
+    if rule.get('enabled', True):
+        rules.append(LowTransparencyRule(rule.get('threshold', 30)))
+
+    return tuple(rules)
@@ -3,8 +3,18 @@ Insight & Reporting Agent
 
 Genera insights accionables, reportes y responde queries en lenguaje natural
 """
+import asyncio
+import importlib.util
+import json
 import logging
-from typing import Dict, List, Any, Optional
+import re
+import time
+from string import Template
+from collections import Counter, deque
+from contextlib import aclosing
+from functools import lru_cache
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import os
 
@@ -12,16 +22,175 @@ from app.core.agent_config import InsightReportingConfig
 from agents.orchestrator.state import WorkflowState, TaskDefinition, AgentType
 from agents.tools.database_tools import DatabaseTools
 from agents.tools.analysis_tools import AnalysisTools
+from agents.tools.rate_limited_model import RateLimitedModel
+from agents.insight_reporting.cache import NarrativeTemplateCache, ResponseCache
 from app.db.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 
+# google.generativeai tarda en importarse: acá solo se verifica que esté
+# instalado, y el import real ocurre en `_load_genai` al crear el modelo
 try:
-    import google.generativeai as genai
-    GOOGLE_AI_AVAILABLE = True
+    GOOGLE_AI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
 except ImportError:
     GOOGLE_AI_AVAILABLE = False
+genai = None
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Instrucción de sistema del chat. Es el prefijo estático de todos los prompts
+# de `_generate_ai_response`: no interpolar datos variables acá.
+SYSTEM_PROMPT = (
+    "Eres un asistente experto en análisis de transparencia gubernamental. "
+    "Responde de forma clara y concisa."
+)
+_SYSTEM_PREFIX = f"SYSTEM: {SYSTEM_PROMPT}"
+
+# Palabras clave que deciden qué datos consultar en `query_with_data`
+QUERY_INTENT_KEYWORDS: Dict[str, List[str]] = {
+    'statistics': ['estadísticas', 'stats', 'general', 'resumen', 'cuántos'],
+    'risk': ['riesgo', 'alto riesgo', 'crítico', 'peligroso'],
+    'red_flags': ['red flag', 'alerta', 'problema', 'irregularidad'],
+    'trends': ['tendencia', 'evolución', 'cambio', 'comparar'],
+    'entities': ['beneficiario', 'entidad', 'empresa', 'organismo'],
+}
+
+# Un único scan de la query detecta todas las categorías. El lookahead
+# prueba cada posición sin consumir texto, así que matches superpuestos de
+# distintas categorías no se pierden (equivale a `word in query` por palabra)
+_INTENT_PATTERN = re.compile('(?=' + '|'.join(
+    f"(?P<{intent}>{'|'.join(re.escape(word) for word in words)})"
+    for intent, words in QUERY_INTENT_KEYWORDS.items()
+) + ')')
+
+
+def _load_genai():
+    """Importa google.generativeai en el primer uso"""
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+
+def _detect_intents(query: str) -> set:
+    """Categorías de `QUERY_INTENT_KEYWORDS` presentes en la query"""
+    return {match.lastgroup for match in _INTENT_PATTERN.finditer(query.lower())}
+
+
+# Streaming: el primer chunk se emite solo y los siguientes se agrupan en
+# lotes crecientes (1 → 3 → 9 → 27 → 50) para abaratar el framing HTTP
+STREAM_MIN_BATCH = 1
+STREAM_BATCH_GROWTH = 3
+STREAM_MAX_BATCH = 50
+
+
+def _serialize_context(context: Optional[Dict[str, Any]], max_chars: int) -> str:
+    """
+    Serializa el contexto de datos para el prompt, acotado a `max_chars`
+    
+    Con claves ordenadas el texto es estable para un mismo contexto, así que
+    también sirve como parte de la clave del cache de respuestas.
+    """
+    if not context:
+        return ""
+    if ORJSON_AVAILABLE:
+        serialized = orjson.dumps(
+            context, default=str,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        ).decode()
+    else:
+        serialized = json.dumps(context, sort_keys=True, default=str, ensure_ascii=False)
+    return f"\n\nContexto adicional:\n{serialized[:max_chars]}"
+
+
+# Templates de prompts y narrativas: se parsean una vez al importar y en
+# cada llamada solo se sustituyen los valores
+#
+# Prompt de `_generate_ai_narrative`: template fijo con slots numéricos
+NARRATIVE_PROMPT = Template("""
+        Genera un resumen ejecutivo basado en estas métricas de análisis de transparencia:
+        
+        - Total de documentos analizados: $total_documents
+        - Red flags detectadas: $red_flags_detected
+        - Casos de riesgo alto: $high_risk_cases
+        - Casos de riesgo medio: $medium_risk_cases
+        - Casos de riesgo bajo: $low_risk_cases
+        
+        Genera un párrafo de 3-4 oraciones, profesional y directo.
+        """)
+
+NARRATIVE_METRICS = (
+    'total_documents', 'red_flags_detected', 'high_risk_cases',
+    'medium_risk_cases', 'low_risk_cases'
+)
+
+# Narrativas de `generate_monthly_summary` y `generate_trend_analysis`
+MONTHLY_NARRATIVE = Template("""Resumen del mes $month/$year:
+                - Documentos analizados: $total_documents
+                - Red flags detectadas: $total_red_flags
+                - Score promedio de transparencia: $avg_transparency_score
+                - Documentos de alto riesgo: $high_risk_count""")
+TREND_NARRATIVE = Template("""Análisis de tendencias $start_month/$start_year - $end_month/$end_year:
+                - Períodos analizados: $periods
+                - Cambio en transparencia: $change puntos ($change_pct%)
+                - Tendencia: $trend""")
+
+
+# (segundo, timestamp ISO) del último timestamp formateado. Se reemplaza la
+# tupla completa, así que una lectura nunca ve un par inconsistente
+_timestamp_cache = (0, "")
+
+
+def _utc_now_iso() -> str:
+    """`datetime.utcnow().isoformat()` con resolución de segundo, formateado una vez por segundo"""
+    global _timestamp_cache
+    second = int(time.time())
+    cached_second, cached = _timestamp_cache
+    if second != cached_second:
+        cached = datetime.utcfromtimestamp(second).isoformat()
+        _timestamp_cache = (second, cached)
+    return cached
+
+
+# Narrativa y recomendaciones de template: dependen solo de tres contadores,
+# así que se memoizan (los dashboards piden una y otra vez las mismas métricas)
+@lru_cache(maxsize=1024)
+def _template_narrative(total: int, flags: int, high: int) -> str:
+    """Narrativa de template para `_generate_template_narrative`"""
+    narrative = f"Se analizaron {total} documentos oficiales. "
+    narrative += f"Se detectaron {flags} red flags en total. "
+    
+    if high > 0:
+        narrative += f"Se identificaron {high} casos de riesgo alto que requieren atención inmediata. "
+    else:
+        narrative += "No se identificaron casos de riesgo alto. "
+    
+    narrative += "Se recomienda revisar los casos priorizados por nivel de riesgo."
+    
+    return narrative
+
+
+@lru_cache(maxsize=1024)
+def _recommendations(total: int, flags: int, high: int) -> Tuple[str, ...]:
+    """Recomendaciones para `_generate_recommendations` (tupla: el resultado se comparte)"""
+    recommendations = []
+    
+    if high > 0:
+        recommendations.append(f"Revisar inmediatamente los {high} casos de riesgo alto")
+    
+    if flags > 10:
+        recommendations.append("Considerar ajustar thresholds de detección para reducir falsos positivos")
+    
+    if total > 0:
+        recommendations.append("Continuar con monitoreo regular de boletines oficiales")
+    
+    return tuple(recommendations) if recommendations else ("No hay recomendaciones específicas",)
 
 class InsightReportingAgent:
     """
@@ -44,8 +213,9 @@ class InsightReportingAgent:
         self.config = config or InsightReportingConfig()
         self.agent_type = AgentType.INSIGHT_REPORTING
         
-        # Cliente Google Gemini para generación de texto
+        # Clientes Google Gemini para generación de texto (chat y narrativas)
         self.model = None
+        self.narrative_model = None
         if GOOGLE_AI_AVAILABLE:
             # Intentar obtener API key del config, luego de env, luego de agent_config
             api_key = os.getenv('GOOGLE_API_KEY')
@@ -57,7 +227,9 @@ class InsightReportingAgent:
             
             if api_key and api_key != "":
                 # genai.configure() is called once at app startup in main.py
-                self.model = genai.GenerativeModel("gemini-2.0-flash")
+                _load_genai()
+                self.model = self._build_model(self.config.query_model)
+                self.narrative_model = self._build_model(self.config.narrative_model)
                 logger.info("Google Gemini client inicializado correctamente")
             else:
                 logger.warning("Google API key no encontrada - chat funcionará con fallback")
@@ -72,11 +244,79 @@ class InsightReportingAgent:
             except Exception as e:
                 logger.warning(f"No se pudo inicializar RetrievalService: {e}")
         
-        # Historial de conversación
-        self.conversation_history: List[Dict[str, str]] = []
+        # Historial de conversación (acotado: descarta los turnos más viejos)
+        self.conversation_history: Deque[Dict[str, str]] = deque(
+            maxlen=self.config.max_conversation_history * 2
+        )
+        
+        # Llamadas al modelo en curso, por (query, contexto)
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        
+        # Cache de respuestas del modelo
+        self.response_cache: Optional[ResponseCache] = None
+        if self.config.enable_response_cache:
+            self.response_cache = ResponseCache(
+                max_entries=self.config.response_cache_max_entries,
+                ttl_seconds=self.config.response_cache_ttl_seconds
+            )
+        
+        # Cache estructural de narrativas, por template de prompt + modelo
+        self.narrative_cache: Optional[NarrativeTemplateCache] = None
+        if self.config.enable_narrative_template_cache:
+            self.narrative_cache = NarrativeTemplateCache(
+                max_entries=self.config.response_cache_max_entries,
+                ttl_seconds=self.config.response_cache_ttl_seconds
+            )
+        self._narrative_template_id = ResponseCache.make_key(
+            self.config.narrative_model,
+            NARRATIVE_PROMPT.template,
+            self.config.temperature,
+            self.config.narrative_max_tokens
+        )
+        
+        # Tareas soportadas por `execute`: tipo -> handler(parámetros)
+        self._task_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            "generate_report": lambda p: self.generate_report(
+                p.get("data"),
+                p.get("report_type", "executive")
+            ),
+            "answer_query": lambda p: self.answer_query(
+                p.get("query"),
+                p.get("context")
+            ),
+            "generate_summary": lambda p: self.generate_summary(
+                p.get("data")
+            ),
+            "monthly_summary": lambda p: self.generate_monthly_summary(
+                p.get("year", 2025),
+                p.get("month", 8)
+            ),
+            "bulk_narratives": lambda p: self.generate_bulk_narratives(
+                p.get("metrics_list", [])
+            ),
+            "yearly_report": lambda p: self.generate_yearly_report(
+                p.get("year", 2025)
+            ),
+            "trend_analysis": lambda p: self.generate_trend_analysis(
+                p.get("start_year", 2025),
+                p.get("start_month", 1),
+                p.get("end_year", 2025),
+                p.get("end_month", 11)
+            ),
+        }
         
         logger.info("InsightReportingAgent inicializado")
     
+    def _build_model(self, model_name: str) -> RateLimitedModel:
+        """Crea un modelo Gemini envuelto con los límites configurados"""
+        return RateLimitedModel(
+            genai.GenerativeModel(model_name),
+            max_rpm=self.config.llm_max_rpm,
+            max_tpm=self.config.llm_max_tpm,
+            max_concurrent=self.config.llm_max_concurrent,
+            max_retries=self.config.llm_max_retries
+        )
+    
     async def execute(self, workflow: WorkflowState, 
                      task: TaskDefinition) -> Dict[str, Any]:
         """
@@ -94,34 +334,10 @@ class InsightReportingAgent:
         
         logger.info(f"Ejecutando tarea: {task_type}")
         
-        if task_type == "generate_report":
-            return await self.generate_report(
-                parameters.get("data"),
-                parameters.get("report_type", "executive")
-            )
-        elif task_type == "answer_query":
-            return await self.answer_query(
-                parameters.get("query"),
-                parameters.get("context")
-            )
-        elif task_type == "generate_summary":
-            return await self.generate_summary(
-                parameters.get("data")
-            )
-        elif task_type == "monthly_summary":
-            return await self.generate_monthly_summary(
-                parameters.get("year", 2025),
-                parameters.get("month", 8)
-            )
-        elif task_type == "trend_analysis":
-            return await self.generate_trend_analysis(
-                parameters.get("start_year", 2025),
-                parameters.get("start_month", 1),
-                parameters.get("end_year", 2025),
-                parameters.get("end_month", 11)
-            )
-        else:
+        handler = self._task_handlers.get(task_type)
+        if handler is None:
             raise ValueError(f"Tipo de tarea no soportado: {task_type}")
+        return await handler(parameters)
     
     async def generate_report(self, data: Dict[str, Any],
                              report_type: str = "executive") -> Dict[str, Any]:
@@ -171,13 +387,10 @@ class InsightReportingAgent:
                 "content": query
             })
             
-            # Limitar historial
-            if len(self.conversation_history) > self.config.max_conversation_history * 2:
-                self.conversation_history = self.conversation_history[-self.config.max_conversation_history * 2:]
-            
             # Generar respuesta
             if self.model:
-                response_text = await self._generate_ai_response(query, context)
+                context_str = _serialize_context(context, self.config.max_context_chars)
+                response_text = await self._generate_ai_response(query, context, context_str)
             else:
                 response_text = self._generate_fallback_response(query, context)
             
@@ -191,7 +404,7 @@ class InsightReportingAgent:
                 "success": True,
                 "query": query,
                 "response": response_text,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _utc_now_iso()
             }
             
         except Exception as e:
@@ -201,6 +414,38 @@ class InsightReportingAgent:
                 "error": str(e)
             }
     
+    async def answer_query_stream(self, query: str,
+                                  context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Responde una query en lenguaje natural emitiendo el texto a medida que se genera
+        
+        Args:
+            query: Pregunta del usuario
+            context: Contexto adicional (datos, documentos, etc.)
+        
+        Yields:
+            Fragmentos de la respuesta, en orden
+        """
+        self.conversation_history.append({
+            "role": "user",
+            "content": query
+        })
+        
+        parts: List[str] = []
+        if self.model:
+            context_str = _serialize_context(context, self.config.max_context_chars)
+            async for piece in self._stream_ai_response(query, context, context_str):
+                parts.append(piece)
+                yield piece
+        else:
+            parts.append(self._generate_fallback_response(query, context))
+            yield parts[0]
+        
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": "".join(parts)
+        })
+    
     async def generate_summary(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Genera un resumen ejecutivo de datos
@@ -215,8 +460,11 @@ class InsightReportingAgent:
     
     async def _generate_executive_summary(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Genera resumen ejecutivo"""
-        # Extraer métricas clave
-        metrics = self._extract_key_metrics(data)
+        # Extraer métricas clave (agregadas en la base si vienen IDs de resultados)
+        if data.get("result_ids"):
+            metrics = await self._key_metrics_from_db(data["result_ids"])
+        else:
+            metrics = self._extract_key_metrics(data)
         
         # Generar narrativa
         narrative = await self._create_narrative(metrics)
@@ -225,7 +473,7 @@ class InsightReportingAgent:
             "success": True,
             "report_type": "executive",
             "title": "Resumen Ejecutivo de Análisis",
-            "generated_at": datetime.utcnow().isoformat(),
+            "generated_at": _utc_now_iso(),
             "metrics": metrics,
             "narrative": narrative,
             "recommendations": self._generate_recommendations(metrics)
@@ -237,7 +485,7 @@ class InsightReportingAgent:
             "success": True,
             "report_type": "detailed",
             "title": "Reporte Detallado de Análisis",
-            "generated_at": datetime.utcnow().isoformat(),
+            "generated_at": _utc_now_iso(),
             "data": data,
             "analysis": "Análisis detallado en desarrollo"
         }
@@ -248,7 +496,7 @@ class InsightReportingAgent:
             "success": True,
             "report_type": "comparative",
             "title": "Reporte Comparativo",
-            "generated_at": datetime.utcnow().isoformat(),
+            "generated_at": _utc_now_iso(),
             "comparison": "Comparación en desarrollo"
         }
     
@@ -266,22 +514,38 @@ class InsightReportingAgent:
         # Extraer de los datos
         if "results" in data:
             results = data["results"]
-            metrics["total_documents"] = len(results)
+            total = len(results)
+            # Cualquier nivel distinto de high/medium cuenta como bajo
+            risks = Counter(result.get("risk_level", "low") for result in results)
             
-            for result in results:
-                if "red_flags" in result:
-                    metrics["red_flags_detected"] += len(result["red_flags"])
-                
-                risk = result.get("risk_level", "low")
-                if risk == "high":
-                    metrics["high_risk_cases"] += 1
-                elif risk == "medium":
-                    metrics["medium_risk_cases"] += 1
-                else:
-                    metrics["low_risk_cases"] += 1
+            metrics["total_documents"] = total
+            metrics["red_flags_detected"] = sum(
+                len(result["red_flags"]) for result in results if "red_flags" in result
+            )
+            metrics["high_risk_cases"] = risks["high"]
+            metrics["medium_risk_cases"] = risks["medium"]
+            metrics["low_risk_cases"] = total - risks["high"] - risks["medium"]
         
         return metrics
     
+    async def _key_metrics_from_db(self, result_ids: List[int]) -> Dict[str, Any]:
+        """Métricas clave de `_extract_key_metrics`, agregadas con SQL"""
+        async with AsyncSessionLocal() as db:
+            breakdown = await AnalysisTools.get_risk_level_breakdown(db, result_ids)
+        
+        high = breakdown.get("high", {}).get("count", 0)
+        medium = breakdown.get("medium", {}).get("count", 0)
+        total = sum(row["count"] for row in breakdown.values())
+        
+        return {
+            "total_documents": total,
+            "red_flags_detected": sum(row["red_flags"] for row in breakdown.values()),
+            "high_risk_cases": high,
+            "medium_risk_cases": medium,
+            "low_risk_cases": total - high - medium,
+            "average_transparency_score": 0.0
+        }
+    
     async def _create_narrative(self, metrics: Dict[str, Any]) -> str:
         """Crea narrativa basada en métricas"""
         if self.model:
@@ -291,71 +555,88 @@ class InsightReportingAgent:
     
     async def _generate_ai_narrative(self, metrics: Dict[str, Any]) -> str:
         """Genera narrativa con IA"""
-        prompt = f"""
-        Genera un resumen ejecutivo basado en estas métricas de análisis de transparencia:
+        values = {name: metrics.get(name, 0) for name in NARRATIVE_METRICS}
         
-        - Total de documentos analizados: {metrics.get('total_documents', 0)}
-        - Red flags detectadas: {metrics.get('red_flags_detected', 0)}
-        - Casos de riesgo alto: {metrics.get('high_risk_cases', 0)}
-        - Casos de riesgo medio: {metrics.get('medium_risk_cases', 0)}
-        - Casos de riesgo bajo: {metrics.get('low_risk_cases', 0)}
+        # Métricas de forma similar ya narradas: misma redacción, números actuales
+        if self.narrative_cache is not None:
+            cached = self.narrative_cache.get(self._narrative_template_id, values)
+            if cached is not None:
+                return cached
         
-        Genera un párrafo de 3-4 oraciones, profesional y directo.
-        """
+        prompt = NARRATIVE_PROMPT.substitute(values)
         
         try:
-            import asyncio
-            
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await self.narrative_model.generate_content_async(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=self.config.temperature,
-                    max_output_tokens=self.config.max_tokens
+                    max_output_tokens=self.config.narrative_max_tokens
                 )
             )
             
-            return response.text.strip()
+            narrative = response.text.strip()
+            if self.narrative_cache is not None:
+                self.narrative_cache.set(self._narrative_template_id, values, narrative)
+            return narrative
             
         except Exception as e:
             logger.error(f"Error generando narrativa con IA: {e}")
             return self._generate_template_narrative(metrics)
     
-    def _generate_template_narrative(self, metrics: Dict[str, Any]) -> str:
-        """Genera narrativa con template"""
-        total = metrics.get('total_documents', 0)
-        flags = metrics.get('red_flags_detected', 0)
-        high = metrics.get('high_risk_cases', 0)
-        
-        narrative = f"Se analizaron {total} documentos oficiales. "
-        narrative += f"Se detectaron {flags} red flags en total. "
+    async def generate_bulk_narratives(self, metrics_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Genera narrativas para varios conjuntos de métricas (flujos no interactivos)
         
-        if high > 0:
-            narrative += f"Se identificaron {high} casos de riesgo alto que requieren atención inmediata. "
-        else:
-            narrative += "No se identificaron casos de riesgo alto. "
+        Las llamadas al modelo se lanzan en paralelo, acotadas por
+        `max_concurrent_narratives`, en lugar de una detrás de otra.
         
-        narrative += "Se recomienda revisar los casos priorizados por nivel de riesgo."
+        Args:
+            metrics_list: Lista de métricas (mismo formato que `_extract_key_metrics`)
         
-        return narrative
+        Returns:
+            Narrativas en el mismo orden que las métricas recibidas
+        """
+        try:
+            if self.model:
+                semaphore = asyncio.Semaphore(self.config.max_concurrent_narratives)
+                
+                async def _narrative(metrics: Dict[str, Any]) -> str:
+                    async with semaphore:
+                        return await self._generate_ai_narrative(metrics)
+                
+                narratives = await asyncio.gather(*(_narrative(m) for m in metrics_list))
+            else:
+                narratives = [self._generate_template_narrative(m) for m in metrics_list]
+            
+            return {
+                "success": True,
+                "task_type": "bulk_narratives",
+                "narratives": list(narratives),
+                "timestamp": _utc_now_iso()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generando narrativas en lote: {e}", exc_info=True)
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _generate_template_narrative(self, metrics: Dict[str, Any]) -> str:
+        """Genera narrativa con template"""
+        return _template_narrative(
+            metrics.get('total_documents', 0),
+            metrics.get('red_flags_detected', 0),
+            metrics.get('high_risk_cases', 0)
+        )
     
     def _generate_recommendations(self, metrics: Dict[str, Any]) -> List[str]:
         """Genera recomendaciones basadas en métricas"""
-        recommendations = []
-        
-        high = metrics.get('high_risk_cases', 0)
-        flags = metrics.get('red_flags_detected', 0)
-        
-        if high > 0:
-            recommendations.append(f"Revisar inmediatamente los {high} casos de riesgo alto")
-        
-        if flags > 10:
-            recommendations.append("Considerar ajustar thresholds de detección para reducir falsos positivos")
-        
-        if metrics.get('total_documents', 0) > 0:
-            recommendations.append("Continuar con monitoreo regular de boletines oficiales")
-        
-        return recommendations if recommendations else ["No hay recomendaciones específicas"]
+        return list(_recommendations(
+            metrics.get('total_documents', 0),
+            metrics.get('red_flags_detected', 0),
+            metrics.get('high_risk_cases', 0)
+        ))
     
     async def query_with_data(self, query: str) -> Dict[str, Any]:
         """
@@ -368,74 +649,67 @@ class InsightReportingAgent:
             Respuesta con datos reales
         """
         try:
-            async with AsyncSessionLocal() as db:
-                # Detectar tipo de consulta y obtener datos relevantes
-                query_lower = query.lower()
-                
-                data_context = {}
-                
-                # Estadísticas generales
-                if any(word in query_lower for word in ['estadísticas', 'stats', 'general', 'resumen', 'cuántos']):
-                    data_context['statistics'] = await DatabaseTools.get_statistics(db)
-                
-                # Documentos de alto riesgo
-                if any(word in query_lower for word in ['riesgo', 'alto riesgo', 'crítico', 'peligroso']):
-                    data_context['top_risk'] = await AnalysisTools.get_top_risk_documents(db, limit=10)
-                
-                # Red flags
-                if any(word in query_lower for word in ['red flag', 'alerta', 'problema', 'irregularidad']):
-                    data_context['red_flag_distribution'] = await AnalysisTools.get_red_flag_distribution(db)
-                    data_context['red_flags'] = await DatabaseTools.get_red_flags(db, severity='high', limit=20)
-                
-                # Tendencias
-                if any(word in query_lower for word in ['tendencia', 'evolución', 'cambio', 'comparar']):
-                    data_context['trends'] = await AnalysisTools.get_transparency_trends(
-                        db, 2025, 1, 2025, 11
-                    )
-                
-                # Entidades
-                if any(word in query_lower for word in ['beneficiario', 'entidad', 'empresa', 'organismo']):
-                    data_context['entities'] = await AnalysisTools.get_entity_analysis(db, 'beneficiaries')
-                
-                # Agregar contexto de búsqueda semántica si está disponible
-                if self.retrieval_service:
-                    try:
-                        search_results = await self.retrieval_service.hybrid_search(
-                            query=query,
-                            top_k=5,
-                            rerank=True
-                        )
-                        if search_results:
-                            data_context['semantic_context'] = [
-                                {
-                                    'text': r.text[:500],
-                                    'score': r.score,
-                                    'document_id': r.document_id
-                                }
-                                for r in search_results
-                            ]
-                            logger.info(f"Agregado contexto semántico: {len(search_results)} chunks")
-                    except Exception as e:
-                        logger.warning(f"Error en búsqueda semántica: {e}")
-                
-                # Si no se encontró contexto específico, obtener estadísticas
-                if not data_context:
-                    data_context['statistics'] = await DatabaseTools.get_statistics(db)
-                
-                # Generar respuesta usando IA con el contexto de datos
-                if self.model:
-                    response_text = await self._generate_ai_response(query, data_context)
-                else:
-                    response_text = self._generate_fallback_response(query, data_context)
-                
-                return {
-                    "success": True,
-                    "query": query,
-                    "response": response_text,
-                    "data_used": list(data_context.keys()),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                
+            # Detectar tipo de consulta y elegir los datos relevantes
+            intents = _detect_intents(query)
+            
+            fetchers = []
+            
+            # Estadísticas generales
+            if 'statistics' in intents:
+                fetchers.append(('statistics', DatabaseTools.get_statistics))
+            
+            # Documentos de alto riesgo
+            if 'risk' in intents:
+                fetchers.append(('top_risk', lambda db: AnalysisTools.get_top_risk_documents(db, limit=10)))
+            
+            # Red flags
+            if 'red_flags' in intents:
+                fetchers.append(('red_flag_distribution', AnalysisTools.get_red_flag_distribution))
+                fetchers.append(('red_flags', lambda db: DatabaseTools.get_red_flags(db, severity='high', limit=20)))
+            
+            # Tendencias
+            if 'trends' in intents:
+                fetchers.append(('trends', lambda db: AnalysisTools.get_transparency_trends(
+                    db, 2025, 1, 2025, 11
+                )))
+            
+            # Entidades
+            if 'entities' in intents:
+                fetchers.append(('entities', lambda db: AnalysisTools.get_entity_analysis(db, 'beneficiaries')))
+            
+            # Una AsyncSession no admite queries concurrentes: cada consulta
+            # usa su propia sesión para poder correr en paralelo
+            async def _fetch(fetcher):
+                async with AsyncSessionLocal() as db:
+                    return await fetcher(db)
+            
+            results = await asyncio.gather(
+                *(_fetch(fetcher) for _, fetcher in fetchers),
+                self._semantic_context(query)
+            )
+            data_context = {key: result for (key, _), result in zip(fetchers, results)}
+            if results[-1]:
+                data_context['semantic_context'] = results[-1]
+            
+            # Si no se encontró contexto específico, obtener estadísticas
+            if not data_context:
+                data_context['statistics'] = await _fetch(DatabaseTools.get_statistics)
+            
+            # Generar respuesta usando IA con el contexto de datos
+            if self.model:
+                context_str = _serialize_context(data_context, self.config.max_context_chars)
+                response_text = await self._generate_ai_response(query, data_context, context_str)
+            else:
+                response_text = self._generate_fallback_response(query, data_context)
+            
+            return {
+                "success": True,
+                "query": query,
+                "response": response_text,
+                "data_used": list(data_context.keys()),
+                "timestamp": _utc_now_iso()
+            }
+            
         except Exception as e:
             logger.error(f"Error consultando datos: {e}", exc_info=True)
             return {
@@ -444,42 +718,171 @@ class InsightReportingAgent:
                 "query": query
             }
     
-    async def _generate_ai_response(self, query: str, 
-                                   context: Optional[Dict[str, Any]] = None) -> str:
-        """Genera respuesta con IA"""
-        context_str = ""
-        if context:
-            context_str = f"\n\nContexto adicional:\n{str(context)}"
-        
-        messages = [
-            {"role": "system", "content": "Eres un asistente experto en análisis de transparencia gubernamental. Responde de forma clara y concisa."}
-        ] + self.conversation_history[-6:] + [  # Últimos 3 turnos
-            {"role": "user", "content": query + context_str}
+    async def _semantic_context(self, query: str) -> List[Dict[str, Any]]:
+        """Chunks relevantes de la búsqueda semántica (vacío si no está disponible)"""
+        if not self.retrieval_service:
+            return []
+        try:
+            search_results = await self.retrieval_service.hybrid_search(
+                query=query,
+                top_k=5,
+                rerank=True
+            )
+        except Exception as e:
+            logger.warning(f"Error en búsqueda semántica: {e}")
+            return []
+        
+        if search_results:
+            logger.info(f"Agregado contexto semántico: {len(search_results)} chunks")
+        return [
+            {
+                'text': r.text[:500],
+                'score': r.score,
+                'document_id': r.document_id
+            }
+            for r in search_results or []
         ]
+    
+    async def _generate_ai_response(self, query: str, 
+                                   context: Optional[Dict[str, Any]] = None,
+                                   context_str: Optional[str] = None) -> str:
+        """
+        Genera respuesta con IA
+        
+        Args:
+            query: Pregunta del usuario
+            context: Contexto adicional (para la respuesta fallback)
+            context_str: Contexto ya serializado; si no se pasa, se serializa acá
+        """
+        if context_str is None:
+            context_str = _serialize_context(context, self.config.max_context_chars)
         
         try:
-            import asyncio
-            
             # Convertir el historial de mensajes a formato Gemini
-            conversation_text = "\n\n".join([
-                f"{msg['role'].upper()}: {msg['content']}" 
-                for msg in messages
-            ])
+            conversation_text = self._build_conversation_text(query, context_str)
+            cache_key = self._response_cache_key(conversation_text)
+            
+            # Prompt idéntico (historial + query + contexto) ya respondido
+            if self.response_cache is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.debug(f"Respuesta servida desde cache: {self.response_cache.stats}")
+                    return cached
+            
+            # Misma query y contexto ya en vuelo: esperar esa llamada en lugar de
+            # repetirla. La clave no incluye el historial: una query concurrente
+            # idéntica ya ve el turno de la primera en `conversation_history`
+            inflight_key = (query, context_str)
+            inflight = self._inflight.get(inflight_key)
+            if inflight is not None:
+                response_text = await asyncio.shield(inflight)
+                if response_text is None:
+                    return self._generate_fallback_response(query, context)
+                return response_text
+            
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[inflight_key] = future
+            try:
+                response = await self.model.generate_content_async(
+                    conversation_text,
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=self.config.temperature,
+                        max_output_tokens=self.config.max_tokens
+                    )
+                )
+                
+                response_text = response.text.strip()
+                if self.response_cache is not None:
+                    self.response_cache.set(cache_key, response_text)
+                future.set_result(response_text)
+            finally:
+                # Si la llamada falló, los que esperaban responden con el fallback
+                self._inflight.pop(inflight_key, None)
+                if not future.done():
+                    future.set_result(None)
             
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            return response_text
+            
+        except Exception as e:
+            logger.error(f"Error generando respuesta con IA: {e}")
+            return self._generate_fallback_response(query, context)
+    
+    async def _stream_ai_response(self, query: str,
+                                  context: Optional[Dict[str, Any]],
+                                  context_str: str) -> AsyncIterator[str]:
+        """Versión streaming de `_generate_ai_response` con lotes crecientes"""
+        conversation_text = self._build_conversation_text(query, context_str)
+        cache_key = self._response_cache_key(conversation_text)
+        
+        if self.response_cache is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        emitted = False
+        parts: List[str] = []
+        try:
+            # El iterador del SDK es bloqueante: cada chunk se pide en un
+            # executor del modelo, que mantiene el lugar de concurrencia
+            # tomado hasta agotar o cerrar el stream
+            stream = self.model.generate_content_stream_async(
                 conversation_text,
                 generation_config=genai.types.GenerationConfig(
                     temperature=self.config.temperature,
                     max_output_tokens=self.config.max_tokens
                 )
             )
-            
-            return response.text.strip()
-            
+            batch: List[str] = []
+            batch_size = STREAM_MIN_BATCH
+            # aclosing: si el consumidor corta antes, el lugar se libera ya
+            async with aclosing(stream) as chunks:
+                async for chunk in chunks:
+                    batch.append(chunk.text)
+                    if len(batch) >= batch_size:
+                        piece = "".join(batch)
+                        batch.clear()
+                        parts.append(piece)
+                        emitted = True
+                        yield piece
+                        batch_size = min(STREAM_MAX_BATCH, batch_size * STREAM_BATCH_GROWTH)
+            if batch:
+                piece = "".join(batch)
+                parts.append(piece)
+                emitted = True
+                yield piece
         except Exception as e:
-            logger.error(f"Error generando respuesta con IA: {e}")
-            return self._generate_fallback_response(query, context)
+            logger.error(f"Error generando respuesta con IA (streaming): {e}")
+            if not emitted:
+                yield self._generate_fallback_response(query, context)
+            return
+        
+        if self.response_cache is not None:
+            self.response_cache.set(cache_key, "".join(parts).strip())
+    
+    def _build_conversation_text(self, query: str, context_str: str) -> str:
+        """
+        Arma el prompt del chat
+        
+        El prefijo de sistema va primero y nunca cambia; historial y contexto
+        (que varían) van siempre después, para que el prefijo sea reutilizable.
+        """
+        history = self.conversation_history
+        return "\n\n".join([
+            _SYSTEM_PREFIX,
+            *(f"{msg['role'].upper()}: {msg['content']}"
+              for msg in islice(history, max(0, len(history) - 6), None)),  # Últimos 3 turnos
+            f"USER: {query}{context_str}"
+        ])
+    
+    def _response_cache_key(self, conversation_text: str) -> str:
+        """Clave del cache de respuestas para un prompt del chat"""
+        return ResponseCache.make_key(
+            getattr(self.model, "model_name", ""),
+            conversation_text,
+            self.config.temperature,
+            self.config.max_tokens
+        )
     
     def _generate_fallback_response(self, query: str, 
                                    context: Optional[Dict[str, Any]] = None) -> str:
@@ -492,41 +895,24 @@ class InsightReportingAgent:
         logger.info("Historial de conversación limpiado")
     
     async def generate_monthly_summary(self, year: int = 2025, 
-                                       month: int = 8) -> Dict[str, Any]:
+                                       month: int = 8, *,
+                                       db: Optional[AsyncSession] = None) -> Dict[str, Any]:
         """
         Genera resumen mensual de análisis
         
         Args:
             year: Año a analizar
             month: Mes a analizar
+            db: Sesión abierta a reutilizar; si no se pasa, se abre una propia
         
         Returns:
             Resumen mensual generado
         """
         try:
-            async with AsyncSessionLocal() as db:
-                # Obtener resumen mensual
-                summary = await AnalysisTools.get_monthly_summary(db, year, month)
-                
-                # Generar narrativa
-                narrative = f"""
-                Resumen del mes {month}/{year}:
-                - Documentos analizados: {summary.get('total_documents', 0)}
-                - Red flags detectadas: {summary.get('total_red_flags', 0)}
-                - Score promedio de transparencia: {summary.get('avg_transparency_score', 0):.1f}
-                - Documentos de alto riesgo: {summary.get('high_risk_count', 0)}
-                """
-                
-                logger.info(f"Resumen mensual generado para {month}/{year}")
-                
-                return {
-                    "success": True,
-                    "task_type": "monthly_summary",
-                    "period": f"{month}/{year}",
-                    "summary": summary,
-                    "narrative": narrative.strip(),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
+            if db is None:
+                async with AsyncSessionLocal() as db:
+                    return await self._build_monthly_summary(db, year, month)
+            return await self._build_monthly_summary(db, year, month)
                 
         except Exception as e:
             logger.error(f"Error generando resumen mensual: {e}", exc_info=True)
@@ -535,6 +921,76 @@ class InsightReportingAgent:
                 "error": str(e)
             }
     
+    async def _build_monthly_summary(self, db: AsyncSession, year: int,
+                                     month: int) -> Dict[str, Any]:
+        """Resumen mensual sobre una sesión ya abierta"""
+        # Obtener resumen mensual
+        summary = await AnalysisTools.get_monthly_summary(db, year, month)
+        
+        # Generar narrativa
+        narrative = MONTHLY_NARRATIVE.substitute(
+            month=month,
+            year=year,
+            total_documents=summary.get('total_documents', 0),
+            total_red_flags=summary.get('total_red_flags', 0),
+            avg_transparency_score=f"{summary.get('avg_transparency_score', 0):.1f}",
+            high_risk_count=summary.get('high_risk_count', 0)
+        )
+        
+        logger.info(f"Resumen mensual generado para {month}/{year}")
+        
+        return {
+            "success": True,
+            "task_type": "monthly_summary",
+            "period": f"{month}/{year}",
+            "summary": summary,
+            "narrative": narrative,
+            "timestamp": _utc_now_iso()
+        }
+    
+    async def generate_yearly_report(self, year: int = 2025) -> Dict[str, Any]:
+        """
+        Genera los doce resúmenes mensuales de un año
+        
+        Args:
+            year: Año a analizar
+        
+        Returns:
+            Resúmenes mensuales y totales del año
+        """
+        try:
+            # Una única sesión para los doce meses. Una AsyncSession no admite
+            # queries concurrentes, así que los meses se consultan en orden
+            async with AsyncSessionLocal() as db:
+                months = [
+                    await self._build_monthly_summary(db, year, month)
+                    for month in range(1, 13)
+                ]
+            
+            summaries = [m["summary"] for m in months]
+            
+            logger.info(f"Reporte anual generado para {year}")
+            
+            return {
+                "success": True,
+                "task_type": "yearly_report",
+                "year": year,
+                "months": months,
+                "totals": {
+                    "total_documents": sum(s.get('total_documents', 0) for s in summaries),
+                    "total_analyzed": sum(s.get('total_analyzed', 0) for s in summaries),
+                    "total_red_flags": sum(s.get('total_red_flags', 0) for s in summaries)
+                },
+                "timestamp": _utc_now_iso()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generando reporte anual: {e}", exc_info=True)
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
     async def generate_trend_analysis(self, start_year: int, start_month: int,
                                      end_year: int, end_month: int) -> Dict[str, Any]:
         """
@@ -553,25 +1009,30 @@ class InsightReportingAgent:
             async with AsyncSessionLocal() as db:
                 # Obtener tendencias
                 trends = await AnalysisTools.get_transparency_trends(
-                    db, start_year, start_month, end_year, end_month
+                    db, start_year, start_month, end_year, end_month, as_array=True
                 )
                 
                 # Calcular cambios
+                scores = trends['avg_transparency_score']
                 if len(trends) >= 2:
-                    first_score = trends[0].get('avg_score', 0)
-                    last_score = trends[-1].get('avg_score', 0)
+                    first_score = float(scores[0])
+                    last_score = float(scores[-1])
                     change = last_score - first_score
                     change_pct = (change / first_score * 100) if first_score > 0 else 0
                 else:
                     change = 0
                     change_pct = 0
                 
-                narrative = f"""
-                Análisis de tendencias {start_month}/{start_year} - {end_month}/{end_year}:
-                - Períodos analizados: {len(trends)}
-                - Cambio en transparencia: {change:+.1f} puntos ({change_pct:+.1f}%)
-                - Tendencia: {'Mejorando' if change > 0 else 'Empeorando' if change < 0 else 'Estable'}
-                """
+                narrative = TREND_NARRATIVE.substitute(
+                    start_month=start_month,
+                    start_year=start_year,
+                    end_month=end_month,
+                    end_year=end_year,
+                    periods=len(trends),
+                    change=f"{change:+.1f}",
+                    change_pct=f"{change_pct:+.1f}",
+                    trend='Mejorando' if change > 0 else 'Empeorando' if change < 0 else 'Estable'
+                )
                 
                 logger.info(f"Análisis de tendencias generado: {len(trends)} períodos")
                 
@@ -579,11 +1040,11 @@ class InsightReportingAgent:
                     "success": True,
                     "task_type": "trend_analysis",
                     "period_range": f"{start_month}/{start_year} - {end_month}/{end_year}",
-                    "trends": trends,
+                    "trends": AnalysisTools.trends_to_dicts(trends),
                     "change": change,
                     "change_percentage": change_pct,
-                    "narrative": narrative.strip(),
-                    "timestamp": datetime.utcnow().isoformat()
+                    "narrative": narrative,
+                    "timestamp": _utc_now_iso()
                 }
                 
             
@@ -0,0 +1,161 @@
+"""
+Cache de respuestas LLM para Insight & Reporting Agent
+
+Cache en memoria (LRU + TTL) indexado por el prompt completo y los
+parámetros de generación: un prompt idéntico dentro del TTL devuelve la
+respuesta ya generada sin volver a llamar al modelo.
+
+`NarrativeTemplateCache` cubre los prompts de narrativa, que varían solo en
+sus números: reutiliza la redacción de métricas de forma similar.
+"""
+import hashlib
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Cache LRU con expiración por TTL para respuestas del modelo
+
+    Attributes:
+        max_entries: Cantidad máxima de respuestas guardadas
+        ttl_seconds: Segundos de validez de cada respuesta
+        stats: Contadores de hits y misses
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float,
+                 max_tokens: int) -> str:
+        """Clave SHA256 del prompt y los parámetros de generación"""
+        payload = f"{model}\x00{temperature!r}\x00{max_tokens}\x00{prompt}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la respuesta cacheada o None si no existe o expiró"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Guarda una respuesta, desalojando la menos usada si hace falta"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vacía el cache"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Números en una respuesta: enteros, con o sin separador de miles (1.234 / 1,234)
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_GROUPED_NUMBER = re.compile(r"\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*")
+
+
+class NarrativeTemplateCache:
+    """
+    Cache estructural de narrativas generadas a partir de un prompt template
+    
+    Los prompts de narrativa son un template fijo con slots numéricos, así
+    que un cache exacto casi nunca acierta. Este cache agrupa las métricas en
+    buckets logarítmicos (~10%) y guarda la respuesta del modelo con los
+    números reemplazados por placeholders: un hit devuelve la misma redacción
+    con los números de las métricas actuales.
+    
+    Solo se guardan respuestas en las que cada número corresponde sin
+    ambigüedad a una métrica; si el modelo escribió porcentajes u otros
+    números derivados, la respuesta no se cachea.
+    """
+    
+    BUCKET_BASE = 1.1
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self._cache = ResponseCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats
+    
+    @classmethod
+    def bucket(cls, value: int) -> int:
+        """Bucket logarítmico de un contador (0 tiene su propio bucket)"""
+        if value <= 0:
+            return -1
+        return round(math.log(value, cls.BUCKET_BASE))
+    
+    def _key(self, template_id: str, values: Dict[str, int]) -> str:
+        buckets = ",".join(f"{name}={self.bucket(values[name])}" for name in sorted(values))
+        return f"{template_id}|{buckets}"
+    
+    def get(self, template_id: str, values: Dict[str, int]) -> Optional[str]:
+        """Narrativa para `values` a partir de una respuesta de métricas similares"""
+        skeleton = self._cache.get(self._key(template_id, values))
+        if skeleton is None:
+            return None
+        return skeleton.format(**values)
+    
+    def set(self, template_id: str, values: Dict[str, int], text: str) -> bool:
+        """
+        Guarda `text` como skeleton para el bucket de `values`
+        
+        Returns:
+            False si la respuesta tiene números que no se pueden atribuir a una métrica
+        """
+        names_by_value: Dict[int, List[str]] = {}
+        for name, value in values.items():
+            names_by_value.setdefault(value, []).append(name)
+        
+        parts: List[str] = []
+        last = 0
+        for match in _NUMBER_PATTERN.finditer(text):
+            span = match.group()
+            if span.isdigit():
+                number = int(span)
+            elif _GROUPED_NUMBER.fullmatch(span):
+                number = int(span.replace(".", "").replace(",", ""))
+            else:
+                return False  # Decimales u otros formatos
+            
+            names = names_by_value.get(number)
+            if names is None or len(names) != 1:
+                return False
+            
+            literal = text[last:match.start()]
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            parts.append(f"{{{names[0]}}}")
+            last = match.end()
+        
+        literal = text[last:]
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        self._cache.set(self._key(template_id, values), "".join(parts))
+        return True
+    
+    def clear(self) -> None:
+        self._cache.clear()
+    
+    def __len__(self) -> int:
+        return len(self._cache)
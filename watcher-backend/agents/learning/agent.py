@@ -117,6 +117,46 @@ class LearningAgent:
             "current_metrics": self.get_performance_metrics()
         }
     
+    def record_feedback_bulk(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Registra un lote de feedbacks
+        
+        Equivale a llamar `record_feedback` por cada elemento, pero el
+        análisis de ajustes corre una sola vez al final del lote.
+        
+        Args:
+            records: Lista de dicts con los argumentos de `record_feedback`
+        
+        Returns:
+            Resultado del registro del lote
+        """
+        feedback_ids = []
+        for data in records:
+            record = FeedbackRecord(
+                feedback_type=data['feedback_type'],
+                entity_type=data['entity_type'],
+                entity_id=data['entity_id'],
+                feedback_value=data['feedback_value'],
+                user_notes=data.get('user_notes'),
+                metadata=data.get('metadata')
+            )
+            self.feedback_history.append(record)
+            self._update_metrics(record)
+            feedback_ids.append(id(record))
+        
+        if records:
+            self._analyze_for_adjustments()
+        
+        logger.info(f"Lote de feedback registrado: {len(records)} registros")
+        
+        return {
+            "success": True,
+            "recorded": len(feedback_ids),
+            "feedback_ids": feedback_ids,
+            "timestamp": datetime.utcnow().isoformat(),
+            "current_metrics": self.get_performance_metrics()
+        }
+    
     def validate_red_flag(self, 
                          red_flag_id: str,
                          is_valid: bool,
@@ -4,8 +4,9 @@ Herramientas compartidas para los agentes
 
 from .database_tools import DatabaseTools
 from .analysis_tools import AnalysisTools
+from .rate_limited_model import RateLimitedModel
 
-__all__ = ['DatabaseTools', 'AnalysisTools']
+__all__ = ['DatabaseTools', 'AnalysisTools', 'RateLimitedModel']
 
 
 
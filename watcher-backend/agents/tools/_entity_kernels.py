@@ -0,0 +1,77 @@
+"""
+Kernel numérico para el fallback de `AnalysisTools.get_entity_analysis`
+
+Cuando la base no puede expandir las listas JSON de entidades (SQLite sin
+JSON1), la agregación se hace en el proceso. Si numba está instalado, el
+conteo corre compilado sobre arrays ordenados por (entidad, documento);
+sin numba `NUMBA_AVAILABLE` queda en False y se usa el loop en Python.
+"""
+
+import logging
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _aggregate_sorted(entity_ids, doc_ids, scores, high_risk, n_entities):
+        counts = np.zeros(n_entities, dtype=np.int64)
+        score_sums = np.zeros(n_entities, dtype=np.float64)
+        num_documents = np.zeros(n_entities, dtype=np.int64)
+        high_counts = np.zeros(n_entities, dtype=np.int64)
+        prev_entity = -1
+        prev_doc = -1
+        for i in range(entity_ids.shape[0]):
+            entity = entity_ids[i]
+            doc = doc_ids[i]
+            counts[entity] += 1
+            score_sums[entity] += scores[i]
+            high_counts[entity] += high_risk[i]
+            # Filas ordenadas por (entidad, documento): cada par nuevo es un
+            # documento distinto para la entidad
+            if entity != prev_entity or doc != prev_doc:
+                num_documents[entity] += 1
+                prev_entity = entity
+                prev_doc = doc
+        return counts, score_sums, num_documents, high_counts
+
+    # Compilar al importar para no pagar el JIT en la primera consulta
+    try:
+        _aggregate_sorted(
+            np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+            np.zeros(1, dtype=np.float64), np.zeros(1, dtype=np.int64), 1
+        )
+    except Exception as e:
+        logger.warning(f"No se pudo compilar el kernel de entidades con numba: {e}")
+        NUMBA_AVAILABLE = False
+
+
+def aggregate_entities(entity_ids: np.ndarray, doc_ids: np.ndarray,
+                       scores: np.ndarray, high_risk: np.ndarray,
+                       n_entities: int) -> Tuple[np.ndarray, ...]:
+    """
+    Agrega las apariciones de entidades (requiere numba)
+    
+    Args:
+        entity_ids: Id de entidad (0..n_entities-1) por aparición
+        doc_ids: Documento de cada aparición
+        scores: Score de transparencia de cada aparición (NULL como 0)
+        high_risk: 1 si la aparición es en un resultado de riesgo alto
+        n_entities: Cantidad de entidades distintas
+    
+    Returns:
+        (frecuencias, suma de scores, documentos distintos, apariciones de riesgo alto)
+    """
+    order = np.lexsort((doc_ids, entity_ids))
+    return _aggregate_sorted(
+        entity_ids[order], doc_ids[order], scores[order], high_risk[order], n_entities
+    )
@@ -1,30 +1,245 @@
 """
 Herramientas de análisis para los agentes
 """
+import copy
 import logging
-from typing import List, Dict, Any, Optional
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, desc, and_, or_, case, select
-from collections import defaultdict
+from sqlalchemy import JSON, String, func, desc, and_, or_, bindparam, case, cast, select, true, type_coerce
+from collections import Counter, OrderedDict, defaultdict
 
-from app.db.models import AnalysisResult, RedFlag, BoletinDocument
+from app.core.config import settings
+from app.db.models import AnalysisResult, RedFlag, BoletinDocument, period_index
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+def entity_list_elements(entity_type: str):
+    """
+    Expande `extracted_entities[entity_type]` en una fila por entidad
+    
+    Args:
+        entity_type: Tipo de entidad (clave de `extracted_entities`)
+    
+    Returns:
+        (función tabla con columna `value`, condición "la clave es una lista JSON")
+    """
+    entities = AnalysisResult.extracted_entities
+    if settings.is_postgres:
+        entity_list = entities[entity_type]
+        is_list = func.json_typeof(entity_list) == 'array'
+        elements = func.json_array_elements_text(entity_list).table_valued('value')
+    else:
+        path = f'$.{entity_type}'
+        is_list = func.json_type(entities, path) == 'array'
+        elements = func.json_each(entities, path).table_valued('value')
+    return elements, is_list
+
+
+def _entity_list(entities: Any, entity_type: str) -> list:
+    """
+    Lista `entities[entity_type]` si es una lista; si no, vacía
+    
+    Mismo criterio que la condición `is_list` de `entity_list_elements`.
+    """
+    if not isinstance(entities, dict):
+        return []
+    values = entities.get(entity_type)
+    return values if isinstance(values, list) else []
+
+
+@lru_cache(maxsize=1)
+def _sqlite_has_json_functions() -> bool:
+    """Si el SQLite del proceso incluye las funciones JSON1 (json_each, json_type)"""
+    try:
+        with closing(sqlite3.connect(":memory:")) as conn:
+            conn.execute("SELECT value FROM json_each('[1]')").fetchall()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def json_pushdown_available() -> bool:
+    """Si la base puede expandir listas JSON (ver `entity_list_elements`)"""
+    return settings.is_postgres or _sqlite_has_json_functions()
+
+
+def red_flag_types_column():
+    """
+    Lista de `type` de cada red flag de `AnalysisResult.red_flags`, extraída en la base
+    
+    Evita traer y decodificar el JSON completo de las red flags cuando solo
+    se usan sus tipos.
+    
+    Returns:
+        Columna con la lista JSON (None/NULL si no hay red flags), o None si
+        la base no tiene funciones JSON
+    """
+    if settings.is_postgres:
+        elements = func.json_array_elements(AnalysisResult.red_flags).table_valued('value')
+        types = func.json_agg(elements.c.value.op('->>')('type'))
+    elif _sqlite_has_json_functions():
+        elements = func.json_each(AnalysisResult.red_flags).table_valued('value')
+        types = func.json_group_array(func.json_extract(elements.c.value, '$.type'))
+    else:
+        return None
+    return type_coerce(
+        select(types).select_from(elements).scalar_subquery(), JSON
+    ).label('red_flags_types')
+
+
+def _types_from_json(red_flags: Optional[list]) -> List[str]:
+    """Tipos de red flags a partir de la columna JSON completa"""
+    return [rf['type'] for rf in (red_flags or ())]
+
+
+def _types_from_sql(types: Optional[list]) -> List[str]:
+    """Tipos de red flags ya extraídos por `red_flag_types_column`"""
+    return types or []
+
+
+def _monthly_summary_stmts():
+    """Statements de `get_monthly_summary`, parametrizados por :year y :month"""
+    in_month = and_(
+        BoletinDocument.year == bindparam('year'),
+        BoletinDocument.month == bindparam('month')
+    )
+    
+    # Tres agregados de una fila (documentos, resultados, red flags)
+    # combinados en una única query: cada tabla se recorre una vez
+    documents = select(
+        func.count(BoletinDocument.id).label('total_documents')
+    ).filter(in_month).subquery()
+    
+    results = select(
+        func.count(AnalysisResult.id).label('total_analyzed'),
+        func.avg(func.coalesce(AnalysisResult.transparency_score, 0)).label('avg_score'),
+        *(
+            func.sum(case((AnalysisResult.risk_level == level, 1), else_=0)).label(f'risk_{level}')
+            for level in ('high', 'medium', 'low')
+        )
+    ).join(
+        BoletinDocument, AnalysisResult.document_id == BoletinDocument.id
+    ).filter(in_month).subquery()
+    
+    red_flags = select(
+        func.count(RedFlag.id).label('total_red_flags'),
+        *(
+            func.sum(case((RedFlag.severity == severity, 1), else_=0)).label(f'severity_{severity}')
+            for severity in ('high', 'medium', 'low')
+        )
+    ).join(
+        BoletinDocument, RedFlag.document_id == BoletinDocument.id
+    ).filter(in_month).subquery()
+    
+    totals = select(documents, results, red_flags).select_from(
+        documents.join(results, true()).join(red_flags, true())
+    )
+    
+    top_risk = select(
+        BoletinDocument.filename,
+        AnalysisResult.transparency_score,
+        AnalysisResult.num_red_flags
+    ).join(
+        BoletinDocument, AnalysisResult.document_id == BoletinDocument.id
+    ).filter(in_month).order_by(
+        desc(func.coalesce(AnalysisResult.num_red_flags, 0))
+    ).limit(5)
+    
+    return totals, top_risk
+
+
+# Construidos una vez al importar: cada llamada solo liga year/month y
+# reutiliza el SQL compilado desde el cache del engine
+_MONTHLY_TOTALS_STMT, _MONTHLY_TOP_RISK_STMT = _monthly_summary_stmts()
+
+
+class PeriodCache:
+    """
+    Cache LRU acotado, con TTL, de agregados por período (year, month)
+    
+    Solo se guardan meses cerrados: los agregados del mes en curso (o de
+    meses futuros) todavía cambian con cada ingesta y siempre se consultan.
+    Un mes cerrado igual puede cambiar (carga retroactiva de boletines,
+    nuevas ejecuciones): las escrituras de este proceso llaman a
+    `AnalysisTools.invalidate_period_cache()`, y el TTL acota cuánto tarda
+    en verse una escritura hecha por otro worker o por un script.
+    Los valores se copian al guardar y al leer, así que los callers pueden
+    modificar el resultado sin afectar el cache.
+    """
+    
+    def __init__(self, maxsize: int = 128, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, Tuple[float, Any]]" = OrderedDict()
+    
+    @staticmethod
+    def is_closed(year: int, month: int) -> bool:
+        """Si el período ya terminó (anterior al mes actual)"""
+        today = date.today()
+        return (year, month) < (today.year, today.month)
+    
+    def get(self, key: tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+    
+    def set(self, key: tuple, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class AnalysisTools:
     """
     Herramientas de análisis para insights y reportes (async)
     """
     
+    # Registro por mes de `get_transparency_trends(as_array=True)`
+    TRENDS_DTYPE = [
+        ('year', 'i4'),
+        ('month', 'i1'),
+        ('avg_transparency_score', 'f8'),
+        ('total_documents', 'i4'),
+        ('high_risk_count', 'i4')
+    ]
+    
+    # Agregados de meses cerrados (compare_periods, get_monthly_summary)
+    _period_cache = PeriodCache(maxsize=128)
+    
+    # Tipos de entidad que se guardan en `AnalysisResult.extracted_entities`
+    ENTITY_TYPES = frozenset({'amounts', 'beneficiaries', 'organisms', 'dates', 'contracts'})
+    
     @staticmethod
     async def get_transparency_trends(
         db: AsyncSession,
         start_year: int,
         start_month: int,
         end_year: int,
-        end_month: int
-    ) -> List[Dict[str, Any]]:
+        end_month: int,
+        as_array: bool = False
+    ) -> Union[List[Dict[str, Any]], "np.ndarray"]:
         """
         Analiza tendencias de transparencia en un período
         
@@ -34,9 +249,11 @@ class AnalysisTools:
             start_month: Mes inicial
             end_year: Año final
             end_month: Mes final
+            as_array: Devolver un array estructurado de NumPy (`TRENDS_DTYPE`)
+                en lugar de una lista de dicts
         
         Returns:
-            Lista con promedios por mes
+            Lista con promedios por mes (o array estructurado, un registro por mes)
         """
         stmt = select(
             BoletinDocument.year,
@@ -47,15 +264,10 @@ class AnalysisTools:
         ).join(
             AnalysisResult, BoletinDocument.id == AnalysisResult.document_id
         ).filter(
-            and_(
-                or_(
-                    BoletinDocument.year > start_year,
-                    and_(BoletinDocument.year == start_year, BoletinDocument.month >= start_month)
-                ),
-                or_(
-                    BoletinDocument.year < end_year,
-                    and_(BoletinDocument.year == end_year, BoletinDocument.month <= end_month)
-                )
+            # Período como un único rango sobre year*12 + month (ver idx_boletin_doc_yyyymm)
+            period_index(BoletinDocument).between(
+                start_year * 12 + start_month,
+                end_year * 12 + end_month
             )
         ).group_by(
             BoletinDocument.year,
@@ -68,6 +280,20 @@ class AnalysisTools:
         result = await db.execute(stmt)
         results = result.all()
         
+        if as_array:
+            import numpy as np
+            
+            # Registros tipados directo desde las filas, sin un dict por mes
+            return np.fromiter(
+                (
+                    (year, month, float(avg_score) if avg_score else 0,
+                     total_docs or 0, high_risk_count or 0)
+                    for year, month, avg_score, total_docs, high_risk_count in results
+                ),
+                dtype=AnalysisTools.TRENDS_DTYPE,
+                count=len(results)
+            )
+        
         return [
             {
                 "year": year,
@@ -79,6 +305,12 @@ class AnalysisTools:
             for year, month, avg_score, total_docs, high_risk_count in results
         ]
     
+    @staticmethod
+    def trends_to_dicts(trends: "np.ndarray") -> List[Dict[str, Any]]:
+        """Convierte el array de `get_transparency_trends(as_array=True)` al formato JSON"""
+        names = trends.dtype.names
+        return [dict(zip(names, row)) for row in trends.tolist()]
+    
     @staticmethod
     async def get_red_flag_distribution(
         db: AsyncSession,
@@ -96,27 +328,37 @@ class AnalysisTools:
         Returns:
             Distribución de red flags por tipo, severidad y categoría
         """
-        stmt = select(RedFlag).join(BoletinDocument)
+        # Conteo agrupado en la base: vuelve una fila por combinación
+        # (tipo, severidad, categoría), no una por red flag
+        stmt = select(
+            RedFlag.flag_type,
+            RedFlag.severity,
+            RedFlag.category,
+            func.count(RedFlag.id)
+        ).join(BoletinDocument)
         
         if year:
             stmt = stmt.filter(BoletinDocument.year == year)
         if month:
             stmt = stmt.filter(BoletinDocument.month == month)
         
+        stmt = stmt.group_by(RedFlag.flag_type, RedFlag.severity, RedFlag.category)
+        
         result = await db.execute(stmt)
-        red_flags = result.scalars().all()
         
+        total = 0
         by_type = defaultdict(int)
         by_severity = defaultdict(int)
         by_category = defaultdict(int)
         
-        for rf in red_flags:
-            by_type[rf.flag_type] += 1
-            by_severity[rf.severity] += 1
-            by_category[rf.category] += 1
+        for flag_type, severity, category, count in result.all():
+            total += count
+            by_type[flag_type] += count
+            by_severity[severity] += count
+            by_category[category] += count
         
         return {
-            "total": len(red_flags),
+            "total": total,
             "by_type": dict(by_type),
             "by_severity": dict(by_severity),
             "by_category": dict(by_category)
@@ -125,7 +367,8 @@ class AnalysisTools:
     @staticmethod
     async def get_top_risk_documents(
         db: AsyncSession,
-        limit: int = 20
+        limit: int = 20,
+        max_transparency_score: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
         Obtiene los documentos con mayor riesgo
@@ -133,40 +376,121 @@ class AnalysisTools:
         Args:
             db: Sesión de base de datos async
             limit: Límite de resultados
+            max_transparency_score: Solo documentos con score menor a este valor
         
         Returns:
             Lista de documentos ordenados por riesgo
         """
+        # Solo las columnas del payload: filas livianas, sin instanciar modelos
         stmt = select(
-            AnalysisResult,
-            BoletinDocument
+            BoletinDocument.id,
+            BoletinDocument.filename,
+            BoletinDocument.year,
+            BoletinDocument.month,
+            BoletinDocument.day,
+            AnalysisResult.transparency_score,
+            AnalysisResult.num_red_flags,
+            AnalysisResult.anomaly_score,
+            AnalysisResult.risk_level
         ).join(
             BoletinDocument, AnalysisResult.document_id == BoletinDocument.id
         ).filter(
             AnalysisResult.risk_level == 'high'
-        ).order_by(
+        )
+        
+        if max_transparency_score is not None:
+            stmt = stmt.filter(AnalysisResult.transparency_score < max_transparency_score)
+        
+        stmt = stmt.order_by(
             desc(AnalysisResult.num_red_flags),
             AnalysisResult.transparency_score
         ).limit(limit)
         
         result = await db.execute(stmt)
-        results = result.all()
         
         return [
             {
-                "document_id": doc.id,
-                "filename": doc.filename,
-                "year": doc.year,
-                "month": doc.month,
-                "day": doc.day,
-                "transparency_score": analysis_result.transparency_score,
-                "num_red_flags": analysis_result.num_red_flags,
-                "anomaly_score": analysis_result.anomaly_score,
-                "risk_level": analysis_result.risk_level
+                "document_id": row.id,
+                "filename": row.filename,
+                "year": row.year,
+                "month": row.month,
+                "day": row.day,
+                "transparency_score": row.transparency_score,
+                "num_red_flags": row.num_red_flags,
+                "anomaly_score": row.anomaly_score,
+                "risk_level": row.risk_level
             }
-            for analysis_result, doc in results
+            for row in result.all()
         ]
     
+    @staticmethod
+    async def get_risk_statistics(
+        db: AsyncSession,
+        max_transparency_score: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Agrega en la base de datos las métricas de los documentos de alto riesgo
+        
+        Args:
+            db: Sesión de base de datos async
+            max_transparency_score: Solo documentos con score menor a este valor
+        
+        Returns:
+            Cantidad de documentos, score promedio y total de red flags
+        """
+        stmt = select(
+            func.count(AnalysisResult.id),
+            func.avg(AnalysisResult.transparency_score),
+            func.sum(AnalysisResult.num_red_flags)
+        ).filter(
+            AnalysisResult.risk_level == 'high'
+        )
+        
+        if max_transparency_score is not None:
+            stmt = stmt.filter(AnalysisResult.transparency_score < max_transparency_score)
+        
+        result = await db.execute(stmt)
+        count, avg_score, total_flags = result.one()
+        
+        return {
+            "count": count or 0,
+            "average_score": float(avg_score) if avg_score is not None else 0,
+            "total_red_flags": int(total_flags or 0)
+        }
+    
+    @staticmethod
+    async def get_risk_level_breakdown(
+        db: AsyncSession,
+        result_ids: List[int]
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Cuenta resultados y red flags por nivel de riesgo en la base de datos
+        
+        Args:
+            db: Sesión de base de datos async
+            result_ids: IDs de `AnalysisResult` a considerar
+        
+        Returns:
+            {risk_level: {"count": n, "red_flags": total}}
+        """
+        if not result_ids:
+            return {}
+        
+        result = await db.execute(
+            select(
+                AnalysisResult.risk_level,
+                func.count(AnalysisResult.id),
+                func.coalesce(func.sum(AnalysisResult.num_red_flags), 0)
+            ).filter(
+                AnalysisResult.id.in_(result_ids)
+            ).group_by(AnalysisResult.risk_level)
+        )
+        
+        return {
+            risk_level: {"count": count, "red_flags": int(flags)}
+            for risk_level, count, flags in result.all()
+        }
+    
     @staticmethod
     async def get_entity_analysis(
         db: AsyncSession,
@@ -182,44 +506,154 @@ class AnalysisTools:
         Returns:
             Lista de entidades con frecuencia y scores asociados
         """
-        stmt = select(AnalysisResult).filter(
-            AnalysisResult.extracted_entities.isnot(None)
-        )
+        if entity_type not in AnalysisTools.ENTITY_TYPES:
+            return []
+        
+        if not json_pushdown_available():
+            return await AnalysisTools._entity_analysis_in_process(db, entity_type)
+        
+        # Se expande la lista JSON del tipo pedido en una fila por entidad y
+        # se agrega en la base; solo vuelven las 50 más frecuentes
+        entities = AnalysisResult.extracted_entities
+        elements, is_list = entity_list_elements(entity_type)
+        # Como texto, para agrupar y desempatar igual que `str(entity)` en el
+        # fallback en proceso (json_each devuelve números como números)
+        entity = cast(elements.c.value, String)
+        
+        frequency = func.count()
+        stmt = select(
+            entity,
+            frequency,
+            func.avg(func.coalesce(AnalysisResult.transparency_score, 0)),
+            func.count(func.distinct(AnalysisResult.document_id)),
+            func.sum(case((AnalysisResult.risk_level == 'high', 1), else_=0))
+        ).select_from(AnalysisResult).join(
+            elements, true()
+        ).filter(
+            entities.isnot(None),
+            is_list
+        ).group_by(
+            entity
+        ).order_by(
+            desc(frequency),
+            entity
+        ).limit(50)
         
         result = await db.execute(stmt)
-        results = result.scalars().all()
-        
-        entity_stats = defaultdict(lambda: {
-            'count': 0,
-            'total_score': 0,
-            'documents': set(),
-            'high_risk_count': 0
-        })
-        
-        for result in results:
-            entities = result.extracted_entities or {}
-            entity_list = entities.get(entity_type, [])
+        
+        return [
+            {
+                'entity': str(entity),
+                'frequency': count,
+                'avg_transparency_score': float(avg_score or 0),
+                'num_documents': num_documents,
+                'high_risk_appearances': int(high_risk or 0)
+            }
+            for entity, count, avg_score, num_documents, high_risk in result.all()
+        ]
+    
+    @staticmethod
+    async def _entity_analysis_in_process(
+        db: AsyncSession,
+        entity_type: str
+    ) -> List[Dict[str, Any]]:
+        """
+        `get_entity_analysis` agregando en el proceso (base sin funciones JSON)
+        
+        Con numba la agregación corre compilada sobre arrays; sin numba, con
+        un loop en Python.
+        """
+        from agents.tools import _entity_kernels
+        
+        stmt = select(
+            AnalysisResult.extracted_entities,
+            AnalysisResult.transparency_score,
+            AnalysisResult.document_id,
+            AnalysisResult.risk_level
+        ).filter(
+            AnalysisResult.extracted_entities.isnot(None)
+        ).execution_options(yield_per=1000)
+        
+        # Filas en streaming (cursor del servidor en PostgreSQL): en memoria
+        # quedan solo los acumuladores y un lote de 1000 filas
+        rows = await db.stream(stmt)
+        
+        if _entity_kernels.NUMBA_AVAILABLE:
+            import numpy as np
             
-            for entity in entity_list:
-                entity_str = str(entity)
-                entity_stats[entity_str]['count'] += 1
-                entity_stats[entity_str]['total_score'] += (result.transparency_score or 0)
-                entity_stats[entity_str]['documents'].add(result.document_id)
-                if result.risk_level == 'high':
-                    entity_stats[entity_str]['high_risk_count'] += 1
-        
-        # Convertir a lista y ordenar por frecuencia
-        entity_list = []
-        for entity, stats in entity_stats.items():
-            entity_list.append({
-                'entity': entity,
-                'frequency': stats['count'],
-                'avg_transparency_score': stats['total_score'] / stats['count'] if stats['count'] > 0 else 0,
-                'num_documents': len(stats['documents']),
-                'high_risk_appearances': stats['high_risk_count']
-            })
-        
-        entity_list.sort(key=lambda x: x['frequency'], reverse=True)
+            index: Dict[str, int] = {}
+            entity_ids: List[int] = []
+            doc_ids: List[int] = []
+            scores: List[float] = []
+            high_risk: List[int] = []
+            
+            async for entities, score, document_id, risk_level in rows:
+                score = score or 0
+                high = 1 if risk_level == 'high' else 0
+                for entity in _entity_list(entities, entity_type):
+                    if not isinstance(entity, str):
+                        entity = str(entity)
+                    entity_ids.append(index.setdefault(entity, len(index)))
+                    doc_ids.append(document_id)
+                    scores.append(score)
+                    high_risk.append(high)
+            
+            if not index:
+                return []
+            
+            counts, score_sums, num_documents, high_counts = _entity_kernels.aggregate_entities(
+                np.asarray(entity_ids, dtype=np.int64),
+                np.asarray(doc_ids, dtype=np.int64),
+                np.asarray(scores, dtype=np.float64),
+                np.asarray(high_risk, dtype=np.int64),
+                len(index)
+            )
+            
+            entity_list = [
+                {
+                    'entity': entity,
+                    'frequency': int(counts[i]),
+                    'avg_transparency_score': float(score_sums[i] / counts[i]),
+                    'num_documents': int(num_documents[i]),
+                    'high_risk_appearances': int(high_counts[i])
+                }
+                for entity, i in index.items()
+            ]
+        else:
+            # Mapas paralelos por entidad con factories simples (int/float) y un
+            # set de pares (entidad, documento) en lugar de un dict con un set()
+            # por entidad
+            frequency: Dict[str, int] = defaultdict(int)
+            score_sum: Dict[str, float] = defaultdict(float)
+            high_risk_count: Dict[str, int] = defaultdict(int)
+            entity_doc_pairs = set()
+            
+            async for entities, score, document_id, risk_level in rows:
+                score = score or 0
+                high = risk_level == 'high'
+                for entity in _entity_list(entities, entity_type):
+                    entity_str = entity if isinstance(entity, str) else str(entity)
+                    frequency[entity_str] += 1
+                    score_sum[entity_str] += score
+                    entity_doc_pairs.add((entity_str, document_id))
+                    if high:
+                        high_risk_count[entity_str] += 1
+            
+            num_documents = Counter(entity for entity, _ in entity_doc_pairs)
+            
+            entity_list = [
+                {
+                    'entity': entity,
+                    'frequency': count,
+                    'avg_transparency_score': score_sum[entity] / count,
+                    'num_documents': num_documents[entity],
+                    'high_risk_appearances': high_risk_count.get(entity, 0)
+                }
+                for entity, count in frequency.items()
+            ]
+        
+        # Mismo orden que la versión SQL: frecuencia descendente, luego entidad
+        entity_list.sort(key=lambda x: (-x['frequency'], x['entity']))
         
         return entity_list[:50]  # Top 50
     
@@ -244,36 +678,22 @@ class AnalysisTools:
         Returns:
             Comparación de métricas
         """
-        async def get_period_stats(year, month):
-            stmt = select(AnalysisResult).join(
-                BoletinDocument
-            ).filter(
-                and_(
-                    BoletinDocument.year == year,
-                    BoletinDocument.month == month
-                )
-            )
-            
-            result = await db.execute(stmt)
-            results = result.scalars().all()
-            
-            if not results:
-                return {
-                    'total_docs': 0,
-                    'avg_transparency': 0,
-                    'high_risk_count': 0,
-                    'total_red_flags': 0
-                }
-            
-            return {
-                'total_docs': len(results),
-                'avg_transparency': sum(r.transparency_score or 0 for r in results) / len(results),
-                'high_risk_count': sum(1 for r in results if r.risk_level == 'high'),
-                'total_red_flags': sum(r.num_red_flags or 0 for r in results)
-            }
+        periods = [(period1_year, period1_month), (period2_year, period2_month)]
+        
+        stats: Dict[tuple, Dict[str, Any]] = {}
+        missing = []
+        for period in dict.fromkeys(periods):
+            cached = AnalysisTools._period_cache.get(('period_stats', *period))
+            if cached is None:
+                missing.append(period)
+            else:
+                stats[period] = cached
         
-        stats1 = await get_period_stats(period1_year, period1_month)
-        stats2 = await get_period_stats(period2_year, period2_month)
+        if missing:
+            stats.update(await AnalysisTools._period_stats(db, missing))
+        
+        stats1 = stats[(period1_year, period1_month)]
+        stats2 = stats[(period2_year, period2_month)]
         
         return {
             'period1': {
@@ -293,6 +713,56 @@ class AnalysisTools:
             }
         }
     
+    @staticmethod
+    async def _period_stats(
+        db: AsyncSession,
+        periods: List[tuple]
+    ) -> Dict[tuple, Dict[str, Any]]:
+        """Métricas de `compare_periods` para cada (year, month), cacheando los meses cerrados"""
+        # Todos los períodos en una única query agregada
+        stmt = select(
+            BoletinDocument.year,
+            BoletinDocument.month,
+            func.count(AnalysisResult.id),
+            func.avg(func.coalesce(AnalysisResult.transparency_score, 0)),
+            func.sum(case((AnalysisResult.risk_level == 'high', 1), else_=0)),
+            func.sum(func.coalesce(AnalysisResult.num_red_flags, 0))
+        ).join(
+            AnalysisResult, BoletinDocument.id == AnalysisResult.document_id
+        ).filter(
+            or_(*(
+                and_(BoletinDocument.year == year, BoletinDocument.month == month)
+                for year, month in periods
+            ))
+        ).group_by(
+            BoletinDocument.year,
+            BoletinDocument.month
+        )
+        
+        result = await db.execute(stmt)
+        rows = {
+            (year, month): {
+                'total_docs': total_docs,
+                'avg_transparency': float(avg_score or 0),
+                'high_risk_count': int(high_risk_count or 0),
+                'total_red_flags': int(total_red_flags or 0)
+            }
+            for year, month, total_docs, avg_score, high_risk_count, total_red_flags in result.all()
+        }
+        
+        stats = {}
+        for period in periods:
+            stats[period] = rows.get(period) or {
+                'total_docs': 0,
+                'avg_transparency': 0,
+                'high_risk_count': 0,
+                'total_red_flags': 0
+            }
+            if PeriodCache.is_closed(*period):
+                AnalysisTools._period_cache.set(('period_stats', *period), stats[period])
+        
+        return stats
+    
     @staticmethod
     async def detect_anomalous_patterns(
         db: AsyncSession,
@@ -310,12 +780,26 @@ class AnalysisTools:
         Returns:
             Lista de patrones anómalos detectados
         """
-        # Documentos con bajo score y muchas red flags
+        types_column = red_flag_types_column()
+        # Sin funciones JSON en la base: se decodifica la columna completa
+        red_flags_types = _types_from_json if types_column is None else _types_from_sql
+        if types_column is None:
+            types_column = AnalysisResult.red_flags
+        
+        # Documentos con bajo score y muchas red flags (solo las columnas usadas)
         stmt = select(
-            AnalysisResult,
-            BoletinDocument
+            BoletinDocument.id,
+            BoletinDocument.filename,
+            BoletinDocument.year,
+            BoletinDocument.month,
+            BoletinDocument.day,
+            AnalysisResult.transparency_score,
+            AnalysisResult.num_red_flags,
+            AnalysisResult.anomaly_score,
+            AnalysisResult.risk_level,
+            types_column
         ).join(
-            BoletinDocument
+            BoletinDocument, AnalysisResult.document_id == BoletinDocument.id
         ).filter(
             and_(
                 AnalysisResult.transparency_score < threshold_score,
@@ -326,23 +810,29 @@ class AnalysisTools:
         ).limit(50)
         
         result = await db.execute(stmt)
-        suspicious_results = result.all()
-        
-        patterns = []
-        for analysis_result, doc in suspicious_results:
-            patterns.append({
-                'document_id': doc.id,
-                'filename': doc.filename,
-                'date': f"{doc.year}-{doc.month:02d}-{doc.day:02d}",
-                'transparency_score': analysis_result.transparency_score,
-                'num_red_flags': analysis_result.num_red_flags,
-                'anomaly_score': analysis_result.anomaly_score,
-                'risk_level': analysis_result.risk_level,
-                'red_flags_types': [rf['type'] for rf in (analysis_result.red_flags or [])],
-                'pattern_description': f"Score bajo ({analysis_result.transparency_score:.1f}) con {analysis_result.num_red_flags} red flags"
-            })
-        
-        return patterns
+        
+        # Filas desempaquetadas como tuplas y formateo con `%`: sin lookups
+        # de atributos por campo
+        return [
+            {
+                'document_id': document_id,
+                'filename': filename,
+                'date': '%d-%02d-%02d' % (year, month, day),
+                'transparency_score': score,
+                'num_red_flags': num_red_flags,
+                'anomaly_score': anomaly_score,
+                'risk_level': risk_level,
+                'red_flags_types': red_flags_types(types),
+                'pattern_description': 'Score bajo (%.1f) con %s red flags' % (score, num_red_flags)
+            }
+            for (document_id, filename, year, month, day, score, num_red_flags,
+                 anomaly_score, risk_level, types) in result.all()
+        ]
+    
+    @staticmethod
+    def invalidate_period_cache() -> None:
+        """Descarta los agregados cacheados (tras registrar documentos o guardar resultados)"""
+        AnalysisTools._period_cache.clear()
     
     @staticmethod
     async def get_monthly_summary(
@@ -361,72 +851,61 @@ class AnalysisTools:
         Returns:
             Resumen completo del mes
         """
-        # Documentos del mes
-        stmt = select(BoletinDocument).filter(
-            and_(
-                BoletinDocument.year == year,
-                BoletinDocument.month == month
-            )
-        )
-        result = await db.execute(stmt)
-        documents = result.scalars().all()
-        
-        # Resultados del mes
-        stmt = select(AnalysisResult).join(
-            BoletinDocument
-        ).filter(
-            and_(
-                BoletinDocument.year == year,
-                BoletinDocument.month == month
-            )
-        )
-        result = await db.execute(stmt)
-        results = result.scalars().all()
-        
-        # Red flags del mes
-        stmt = select(RedFlag).join(
-            BoletinDocument
-        ).filter(
-            and_(
-                BoletinDocument.year == year,
-                BoletinDocument.month == month
-            )
-        )
-        result = await db.execute(stmt)
-        red_flags = result.scalars().all()
+        key = ('monthly_summary', year, month)
+        summary = AnalysisTools._period_cache.get(key)
+        if summary is not None:
+            return summary
+        
+        summary = await AnalysisTools._query_monthly_summary(db, year, month)
+        if PeriodCache.is_closed(year, month):
+            AnalysisTools._period_cache.set(key, summary)
+        return summary
+    
+    @staticmethod
+    async def _query_monthly_summary(
+        db: AsyncSession,
+        year: int,
+        month: int
+    ) -> Dict[str, Any]:
+        """Agregados de `get_monthly_summary` (sin cache)"""
+        params = {'year': year, 'month': month}
+        result = await db.execute(_MONTHLY_TOTALS_STMT, params)
+        totals = result.one()
         
-        if not results:
+        if not totals.total_analyzed:
             return {
                 'year': year,
                 'month': month,
-                'total_documents': len(documents),
+                'total_documents': totals.total_documents,
                 'message': 'No hay resultados de análisis para este mes'
             }
         
+        # Top 5 por cantidad de red flags
+        result = await db.execute(_MONTHLY_TOP_RISK_STMT, params)
+        
         return {
             'year': year,
             'month': month,
-            'total_documents': len(documents),
-            'total_analyzed': len(results),
-            'avg_transparency_score': sum(r.transparency_score or 0 for r in results) / len(results),
+            'total_documents': totals.total_documents,
+            'total_analyzed': totals.total_analyzed,
+            'avg_transparency_score': float(totals.avg_score or 0),
             'risk_distribution': {
-                'high': sum(1 for r in results if r.risk_level == 'high'),
-                'medium': sum(1 for r in results if r.risk_level == 'medium'),
-                'low': sum(1 for r in results if r.risk_level == 'low')
+                'high': int(totals.risk_high or 0),
+                'medium': int(totals.risk_medium or 0),
+                'low': int(totals.risk_low or 0)
             },
-            'total_red_flags': len(red_flags),
+            'total_red_flags': totals.total_red_flags,
             'red_flags_by_severity': {
-                'high': sum(1 for rf in red_flags if rf.severity == 'high'),
-                'medium': sum(1 for rf in red_flags if rf.severity == 'medium'),
-                'low': sum(1 for rf in red_flags if rf.severity == 'low')
+                'high': int(totals.severity_high or 0),
+                'medium': int(totals.severity_medium or 0),
+                'low': int(totals.severity_low or 0)
             },
             'top_risk_documents': [
                 {
-                    'filename': r.document.filename,
-                    'transparency_score': r.transparency_score,
-                    'num_red_flags': r.num_red_flags
+                    'filename': filename,
+                    'transparency_score': transparency_score,
+                    'num_red_flags': num_red_flags
                 }
-                for r in sorted(results, key=lambda x: (x.num_red_flags or 0), reverse=True)[:5]
+                for filename, transparency_score, num_red_flags in result.all()
             ]
         }
-
@@ -4,16 +4,62 @@ Herramientas de base de datos para los agentes
 import logging
 from typing import List, Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, desc, select
+from sqlalchemy import func, desc, select, case, true
+from sqlalchemy.orm import raiseload
 
 from app.db.models import (
     BoletinDocument, AnalysisResult, RedFlag
 )
+from app.core.config import settings
 from app.db.database import AsyncSessionLocal
+from agents.tools.analysis_tools import (
+    AnalysisTools, _entity_list, entity_list_elements, json_pushdown_available
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _statistics_stmt():
+    """Totales de las tres tablas en un único round-trip"""
+    # Cada subquery agrega una tabla en una sola pasada y devuelve una fila
+    documents = select(
+        func.count(BoletinDocument.id).label('total_documents'),
+        func.sum(case((BoletinDocument.analysis_status == 'completed', 1), else_=0)).label('total_analyzed')
+    ).subquery()
+    
+    results = select(
+        func.count(AnalysisResult.id).label('total_results'),
+        func.sum(case((AnalysisResult.risk_level == 'high', 1), else_=0)).label('high_risk'),
+        func.avg(AnalysisResult.transparency_score).label('avg_transparency')
+    ).subquery()
+    
+    red_flags = select(
+        func.count(RedFlag.id).label('total_red_flags'),
+        func.sum(case((RedFlag.severity == 'high', 1), else_=0)).label('high_severity_flags')
+    ).subquery()
+    
+    return select(documents, results, red_flags).select_from(
+        documents.join(results, true()).join(red_flags, true())
+    )
+
+
+# Statements de get_statistics construidos una vez al importar: cada llamada
+# reutiliza el mismo objeto y su SQL compilado desde el cache del engine
+_STATISTICS_STMT = _statistics_stmt()
+
+_DOCUMENTS_BY_PERIOD_STMT = select(
+    BoletinDocument.year,
+    BoletinDocument.month,
+    func.count(BoletinDocument.id).label('count')
+).group_by(
+    BoletinDocument.year,
+    BoletinDocument.month
+).order_by(
+    BoletinDocument.year,
+    BoletinDocument.month
+)
+
+
 class DatabaseTools:
     """
     Herramientas para que los agentes accedan a la base de datos (async)
@@ -46,7 +92,19 @@ class DatabaseTools:
         Returns:
             Lista de documentos
         """
-        stmt = select(BoletinDocument)
+        # Solo las columnas devueltas: filas livianas en lugar de objetos mapeados
+        stmt = select(
+            BoletinDocument.id,
+            BoletinDocument.filename,
+            BoletinDocument.year,
+            BoletinDocument.month,
+            BoletinDocument.day,
+            BoletinDocument.section,
+            BoletinDocument.file_path,
+            BoletinDocument.analysis_status,
+            BoletinDocument.num_pages,
+            BoletinDocument.last_analyzed
+        )
         
         if year:
             stmt = stmt.filter(BoletinDocument.year == year)
@@ -57,7 +115,6 @@ class DatabaseTools:
         
         stmt = stmt.limit(limit)
         result = await db.execute(stmt)
-        documents = result.scalars().all()
         
         return [
             {
@@ -72,7 +129,7 @@ class DatabaseTools:
                 "num_pages": doc.num_pages,
                 "last_analyzed": doc.last_analyzed.isoformat() if doc.last_analyzed else None
             }
-            for doc in documents
+            for doc in result.all()
         ]
     
     @staticmethod
@@ -82,7 +139,8 @@ class DatabaseTools:
         risk_level: Optional[str] = None,
         min_score: Optional[float] = None,
         min_red_flags: Optional[int] = None,
-        limit: int = 100
+        limit: int = 100,
+        include_json: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Obtiene resultados de análisis
@@ -94,11 +152,31 @@ class DatabaseTools:
             min_score: Score mínimo de transparencia
             min_red_flags: Mínimo de red flags
             limit: Límite de resultados
+            include_json: Incluir las columnas JSON (extracted_entities,
+                red_flags, ml_predictions); por defecto no se leen
         
         Returns:
             Lista de resultados
         """
-        stmt = select(AnalysisResult)
+        columns = [
+            AnalysisResult.id,
+            AnalysisResult.document_id,
+            AnalysisResult.transparency_score,
+            AnalysisResult.risk_level,
+            AnalysisResult.anomaly_score,
+            AnalysisResult.num_red_flags,
+            AnalysisResult.analyzed_at
+        ]
+        # Las columnas JSON dominan el tamaño de cada fila y el costo de
+        # decodificación: solo se traen si se piden
+        if include_json:
+            columns += [
+                AnalysisResult.extracted_entities,
+                AnalysisResult.red_flags,
+                AnalysisResult.ml_predictions
+            ]
+        
+        stmt = select(*columns)
         
         if document_id:
             stmt = stmt.filter(AnalysisResult.document_id == document_id)
@@ -110,24 +188,26 @@ class DatabaseTools:
             stmt = stmt.filter(AnalysisResult.num_red_flags >= min_red_flags)
         
         stmt = stmt.order_by(desc(AnalysisResult.analyzed_at)).limit(limit)
-        result = await db.execute(stmt)
-        results = result.scalars().all()
+        rows = await db.execute(stmt)
         
-        return [
-            {
+        results = []
+        for result in rows.all():
+            item = {
                 "id": result.id,
                 "document_id": result.document_id,
                 "transparency_score": result.transparency_score,
                 "risk_level": result.risk_level,
                 "anomaly_score": result.anomaly_score,
                 "num_red_flags": result.num_red_flags,
-                "extracted_entities": result.extracted_entities,
-                "red_flags": result.red_flags,
-                "ml_predictions": result.ml_predictions,
                 "analyzed_at": result.analyzed_at.isoformat() if result.analyzed_at else None
             }
-            for result in results
-        ]
+            if include_json:
+                item["extracted_entities"] = result.extracted_entities
+                item["red_flags"] = result.red_flags
+                item["ml_predictions"] = result.ml_predictions
+            results.append(item)
+        
+        return results
     
     @staticmethod
     async def get_red_flags(
@@ -148,7 +228,20 @@ class DatabaseTools:
         Returns:
             Lista de red flags
         """
-        stmt = select(RedFlag).join(AnalysisResult).join(BoletinDocument)
+        stmt = select(
+            RedFlag.id,
+            RedFlag.result_id,
+            RedFlag.document_id,
+            RedFlag.flag_type,
+            RedFlag.severity,
+            RedFlag.category,
+            RedFlag.title,
+            RedFlag.description,
+            RedFlag.evidence,
+            RedFlag.confidence_score,
+            RedFlag.page_number,
+            RedFlag.created_at
+        ).join(AnalysisResult).join(BoletinDocument)
         
         if severity:
             stmt = stmt.filter(RedFlag.severity == severity)
@@ -157,7 +250,7 @@ class DatabaseTools:
         
         stmt = stmt.order_by(desc(RedFlag.created_at)).limit(limit)
         result = await db.execute(stmt)
-        red_flags = result.scalars().all()
+        red_flags = result.all()
         
         return [
             {
@@ -188,69 +281,20 @@ class DatabaseTools:
         Returns:
             Diccionario con estadísticas
         """
-        # Total documents
-        result = await db.execute(select(func.count(BoletinDocument.id)))
-        total_documents = result.scalar()
-        
-        # Total analyzed
-        result = await db.execute(
-            select(func.count(BoletinDocument.id)).filter(
-                BoletinDocument.analysis_status == 'completed'
-            )
-        )
-        total_analyzed = result.scalar()
-        
-        # Total results
-        result = await db.execute(select(func.count(AnalysisResult.id)))
-        total_results = result.scalar()
+        result = await db.execute(_STATISTICS_STMT)
+        totals = result.one()
         
-        # High risk documents
-        result = await db.execute(
-            select(func.count(AnalysisResult.id)).filter(
-                AnalysisResult.risk_level == 'high'
-            )
-        )
-        high_risk = result.scalar()
-        
-        # Total red flags
-        result = await db.execute(select(func.count(RedFlag.id)))
-        total_red_flags = result.scalar()
-        
-        # High severity flags
-        result = await db.execute(
-            select(func.count(RedFlag.id)).filter(
-                RedFlag.severity == 'high'
-            )
-        )
-        high_severity_flags = result.scalar()
-        
-        # Average transparency score
-        result = await db.execute(select(func.avg(AnalysisResult.transparency_score)))
-        avg_transparency = result.scalar()
-        
-        # Distribución por año y mes
-        stmt = select(
-            BoletinDocument.year,
-            BoletinDocument.month,
-            func.count(BoletinDocument.id).label('count')
-        ).group_by(
-            BoletinDocument.year,
-            BoletinDocument.month
-        ).order_by(
-            BoletinDocument.year,
-            BoletinDocument.month
-        )
-        result = await db.execute(stmt)
+        result = await db.execute(_DOCUMENTS_BY_PERIOD_STMT)
         docs_by_period = result.all()
         
         return {
-            "total_documents": total_documents or 0,
-            "total_analyzed": total_analyzed or 0,
-            "total_results": total_results or 0,
-            "high_risk_documents": high_risk or 0,
-            "total_red_flags": total_red_flags or 0,
-            "high_severity_flags": high_severity_flags or 0,
-            "avg_transparency_score": float(avg_transparency) if avg_transparency else 0,
+            "total_documents": totals.total_documents or 0,
+            "total_analyzed": int(totals.total_analyzed or 0),
+            "total_results": totals.total_results or 0,
+            "high_risk_documents": int(totals.high_risk or 0),
+            "total_red_flags": totals.total_red_flags or 0,
+            "high_severity_flags": int(totals.high_severity_flags or 0),
+            "avg_transparency_score": float(totals.avg_transparency) if totals.avg_transparency else 0,
             "documents_by_period": [
                 {
                     "year": year,
@@ -276,8 +320,11 @@ class DatabaseTools:
         Returns:
             Diccionario con documento y resultados
         """
+        # Las tres queries cargan solo columnas propias: con raiseload('*'),
+        # acceder a una relación falla en lugar de disparar un lazy load por fila
+        
         # Get document
-        stmt = select(BoletinDocument).filter(BoletinDocument.id == document_id)
+        stmt = select(BoletinDocument).options(raiseload('*')).filter(BoletinDocument.id == document_id)
         result = await db.execute(stmt)
         document = result.scalar_one_or_none()
         
@@ -285,12 +332,12 @@ class DatabaseTools:
             return None
         
         # Get analysis results
-        stmt = select(AnalysisResult).filter(AnalysisResult.document_id == document_id)
+        stmt = select(AnalysisResult).options(raiseload('*')).filter(AnalysisResult.document_id == document_id)
         result = await db.execute(stmt)
         results = result.scalars().all()
         
         # Get red flags
-        stmt = select(RedFlag).filter(RedFlag.document_id == document_id)
+        stmt = select(RedFlag).options(raiseload('*')).filter(RedFlag.document_id == document_id)
         result = await db.execute(stmt)
         red_flags = result.scalars().all()
         
@@ -352,35 +399,90 @@ class DatabaseTools:
         Returns:
             Lista de documentos con la entidad
         """
-        # Buscar en extracted_entities JSON
-        stmt = select(AnalysisResult).join(BoletinDocument).filter(
+        if entity_type not in AnalysisTools.ENTITY_TYPES:
+            return []
+        
+        stmt = select(
+            AnalysisResult.document_id,
+            BoletinDocument.filename,
+            AnalysisResult.transparency_score,
+            AnalysisResult.risk_level,
+            AnalysisResult.extracted_entities,
+            AnalysisResult.analyzed_at
+        ).join(
+            BoletinDocument, AnalysisResult.document_id == BoletinDocument.id
+        ).filter(
             AnalysisResult.extracted_entities.isnot(None)
-        ).limit(limit * 2)  # Obtener más para filtrar
+        )
         
-        result = await db.execute(stmt)
-        results = result.scalars().all()
+        # lower() de SQLite solo pasa a minúsculas ASCII ("CÓRDOBA" no
+        # coincidiría con "córdoba"): ahí la coincidencia se evalúa en el proceso
+        if not settings.is_postgres:
+            return await DatabaseTools._search_by_entity_in_process(
+                db, stmt, entity_type, entity_value, limit
+            )
         
-        matching_results = []
-        for result in results:
-            entities = result.extracted_entities or {}
-            entity_list = entities.get(entity_type, [])
-            
-            # Buscar coincidencia (case-insensitive)
-            if any(entity_value.lower() in str(e).lower() for e in entity_list):
-                matching_results.append({
-                    "document_id": result.document_id,
-                    "document_filename": result.document.filename if result.document else None,
-                    "transparency_score": result.transparency_score,
-                    "risk_level": result.risk_level,
-                    "entities_found": entity_list,
-                    "analyzed_at": result.analyzed_at.isoformat() if result.analyzed_at else None
-                })
-                
-                if len(matching_results) >= limit:
-                    break
+        # La coincidencia (case-insensitive, por substring) se evalúa en la
+        # base sobre cada elemento de la lista JSON del tipo pedido
+        elements, is_list = entity_list_elements(entity_type)
+        matches = select(1).select_from(elements).filter(
+            func.lower(elements.c.value).contains(entity_value.lower(), autoescape=True)
+        ).exists()
+        
+        result = await db.execute(stmt.filter(is_list, matches).limit(limit))
+        
+        return [
+            DatabaseTools._entity_match(row, row.extracted_entities.get(entity_type, []))
+            for row in result.all()
+        ]
+    
+    @staticmethod
+    async def _search_by_entity_in_process(
+        db: AsyncSession,
+        stmt,
+        entity_type: str,
+        entity_value: str,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        `search_by_entity` comparando las entidades en Python (SQLite)
+        
+        Las filas llegan en streaming y la lectura se corta al llegar a
+        `limit` coincidencias.
+        """
+        if json_pushdown_available():
+            # Con JSON1 al menos se descartan en la base las filas sin lista
+            _, is_list = entity_list_elements(entity_type)
+            stmt = stmt.filter(is_list)
+        
+        needle = entity_value.lower()
+        matching_results: List[Dict[str, Any]] = []
+        
+        rows = await db.stream(stmt.execution_options(yield_per=1000))
+        try:
+            async for row in rows:
+                entity_list = _entity_list(row.extracted_entities, entity_type)
+                if any(needle in str(e).lower() for e in entity_list):
+                    matching_results.append(DatabaseTools._entity_match(row, entity_list))
+                    if len(matching_results) >= limit:
+                        break
+        finally:
+            await rows.close()
         
         return matching_results
     
+    @staticmethod
+    def _entity_match(row, entity_list: List[Any]) -> Dict[str, Any]:
+        """Resultado de `search_by_entity` para una fila"""
+        return {
+            "document_id": row.document_id,
+            "document_filename": row.filename,
+            "transparency_score": row.transparency_score,
+            "risk_level": row.risk_level,
+            "entities_found": entity_list,
+            "analyzed_at": row.analyzed_at.isoformat() if row.analyzed_at else None
+        }
+    
     @staticmethod
     async def search_documents(
         query: str,
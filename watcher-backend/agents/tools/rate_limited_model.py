@@ -0,0 +1,249 @@
+"""
+Wrapper con rate limiting para modelos generativos (Gemini)
+
+Envuelve un `genai.GenerativeModel` y limita las llamadas a
+`generate_content` por:
+- Requests por minuto (ventana deslizante)
+- Tokens por minuto (según `usage_metadata` de cada respuesta)
+- Llamadas concurrentes (semáforo)
+
+Los errores de cuota (429) y 5xx se reintentan con backoff exponencial con
+jitter. Desde código async se usa `await model.generate_content_async(...)`
+(o `model.generate_content_stream_async(...)` para streaming): las llamadas
+(y sus esperas) corren en un executor propio del modelo, así que un modelo
+saturado no ocupa los threads del executor por defecto de asyncio que usan
+otros `asyncio.to_thread`.
+"""
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_ERRORS: Tuple[type, ...] = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+except ImportError:
+    RETRYABLE_ERRORS = ()
+
+
+class _SlotStream:
+    """
+    Respuesta en streaming que mantiene tomado el lugar de concurrencia
+
+    Con `stream=True` el SDK devuelve la respuesta antes de leer ningún
+    chunk, así que el lugar se libera recién al agotar el stream, ante un
+    error o al cerrarlo (`close`).
+    """
+
+    def __init__(self, response: Any, on_close: Callable[[Any], None]):
+        self._response = response
+        self._chunks = iter(response)
+        self._on_close = on_close
+
+    def __iter__(self) -> "_SlotStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._chunks is None:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Libera el lugar de concurrencia (idempotente)"""
+        if self._chunks is not None:
+            self._chunks = None
+            self._on_close(self._response)
+
+    def __del__(self) -> None:
+        # Red de seguridad si el consumidor abandona el stream sin cerrarlo
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+
+class RateLimitedModel:
+    """
+    Modelo generativo con límites de RPM, TPM, concurrencia y reintentos
+
+    Es thread-safe: `generate_content` puede llamarse desde varios threads,
+    y las esperas ocurren en el thread que llama. `generate_content_async`
+    despacha a un executor acotado a `max_concurrent` threads.
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, model: Any, max_rpm: int = 1000, max_tpm: int = 4_000_000,
+                 max_concurrent: int = 8, max_retries: int = 5,
+                 max_backoff_seconds: float = 60.0):
+        """
+        Args:
+            model: Modelo a envolver (expone `generate_content`)
+            max_rpm: Máximo de requests por minuto
+            max_tpm: Máximo de tokens por minuto
+            max_concurrent: Máximo de llamadas simultáneas
+            max_retries: Reintentos ante errores de cuota o de servidor
+            max_backoff_seconds: Espera máxima entre reintentos
+        """
+        self._model = model
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.max_retries = max_retries
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="rate-limited-model"
+        )
+        # Lecturas de chunks de streams abiertos: solo las hace quien ya tiene
+        # un lugar del semáforo, así que no pueden quedar detrás de llamadas
+        # que esperan ese lugar ocupando el executor principal
+        self._stream_executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="rate-limited-model-stream"
+        )
+        self._lock = threading.Lock()
+        self._requests: Deque[float] = deque()
+        self._tokens: Deque[Tuple[float, int]] = deque()
+        self._tokens_in_window = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Atributos no envueltos (model_name, etc.) se delegan al modelo
+        return getattr(self._model, name)
+
+    async def generate_content_async(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        `generate_content` desde código async, en el executor del modelo
+
+        Las esperas por límites y los backoffs bloquean solo threads de ese
+        executor, nunca los del executor por defecto del event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self.generate_content, *args, **kwargs)
+        )
+
+    async def generate_content_stream_async(self, *args: Any,
+                                            **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        `generate_content(..., stream=True)` desde código async
+
+        Cada chunk se pide en un executor propio de los streams del modelo y
+        el lugar de concurrencia queda tomado hasta agotar o cerrar el
+        generador.
+        """
+        loop = asyncio.get_running_loop()
+        stream = await loop.run_in_executor(
+            self._executor,
+            functools.partial(self.generate_content, *args, stream=True, **kwargs)
+        )
+        end = object()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    self._stream_executor, next, stream, end
+                )
+                if chunk is end:
+                    return
+                yield chunk
+        finally:
+            stream.close()
+
+    def generate_content(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        `generate_content` del modelo, respetando límites y con reintentos
+
+        Con `stream=True` devuelve un `_SlotStream`, que mantiene tomado el
+        lugar de concurrencia hasta agotarse o cerrarse.
+        """
+        stream = kwargs.get("stream", False)
+        attempt = 0
+        while True:
+            self._semaphore.acquire()
+            release = True
+            try:
+                self._acquire_slot()
+                try:
+                    response = self._model.generate_content(*args, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    error = e
+                else:
+                    if stream:
+                        release = False
+                        return _SlotStream(response, self._finish_stream)
+                    self._record_tokens(response)
+                    return response
+            finally:
+                if release:
+                    self._semaphore.release()
+
+            # Backoff exponencial con jitter, fuera del semáforo
+            delay = random.uniform(0, min(self.max_backoff_seconds, 2 ** attempt))
+            attempt += 1
+            logger.warning(
+                f"Error transitorio del modelo ({type(error).__name__}), "
+                f"reintento {attempt}/{self.max_retries} en {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def _acquire_slot(self) -> None:
+        """Espera hasta que la ventana tenga lugar para un request más"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._evict(now)
+                wait = 0.0
+                if len(self._requests) >= self.max_rpm:
+                    wait = self._requests[0] + self.WINDOW_SECONDS - now
+                elif self._tokens_in_window >= self.max_tpm and self._tokens:
+                    wait = self._tokens[0][0] + self.WINDOW_SECONDS - now
+                if wait <= 0:
+                    self._requests.append(now)
+                    return
+            time.sleep(wait)
+
+    def _finish_stream(self, response: Any) -> None:
+        """Cierre de un `_SlotStream`: registra tokens y libera el lugar"""
+        try:
+            self._record_tokens(response)
+        except Exception as e:
+            logger.debug(f"Sin usage_metadata en el stream: {e}")
+        finally:
+            self._semaphore.release()
+
+    def _record_tokens(self, response: Any) -> None:
+        """Registra los tokens consumidos por una respuesta"""
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "total_token_count", 0) or 0
+        if not tokens:
+            return
+        with self._lock:
+            self._tokens.append((time.monotonic(), tokens))
+            self._tokens_in_window += tokens
+
+    def _evict(self, now: float) -> None:
+        """Descarta requests y tokens fuera de la ventana (requiere el lock)"""
+        cutoff = now - self.WINDOW_SECONDS
+        requests = self._requests
+        while requests and requests[0] <= cutoff:
+            requests.popleft()
+        tokens = self._tokens
+        while tokens and tokens[0][0] <= cutoff:
+            self._tokens_in_window -= tokens.popleft()[1]
@@ -0,0 +1,46 @@
+"""Add composite/covering indexes for period and risk queries
+
+Revision ID: add_analysis_covering_indexes
+Revises: add_fts5_index
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_analysis_covering_indexes'
+down_revision = 'add_fts5_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create composite indexes (INCLUDE columns and CONCURRENTLY only apply on PostgreSQL)."""
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_boletin_doc_period', 'boletin_documents', ['year', 'month', 'id'],
+            postgresql_include=['filename', 'day'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'idx_result_document_risk', 'analysis_results', ['document_id', 'risk_level'],
+            postgresql_include=['transparency_score', 'num_red_flags'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'idx_result_risk_flags_score', 'analysis_results',
+            ['risk_level', sa.text('num_red_flags DESC'), 'transparency_score'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    """Drop composite indexes."""
+    op.drop_index('idx_result_risk_flags_score', table_name='analysis_results', if_exists=True)
+    op.drop_index('idx_result_document_risk', table_name='analysis_results', if_exists=True)
+    op.drop_index('idx_boletin_doc_period', table_name='boletin_documents', if_exists=True)
@@ -0,0 +1,31 @@
+"""Add expression index on year * 12 + month for period range filters
+
+Revision ID: add_boletin_period_index
+Revises: add_analysis_covering_indexes
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_boletin_period_index'
+down_revision = 'add_analysis_covering_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create expression index (CONCURRENTLY only applies on PostgreSQL)."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_boletin_doc_yyyymm', 'boletin_documents',
+            [sa.text('(year * 12 + month)')],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    """Drop expression index."""
+    op.drop_index('idx_boletin_doc_yyyymm', table_name='boletin_documents', if_exists=True)
@@ -0,0 +1,48 @@
+"""Add indexes for dashboard aggregates on analisis
+
+Revision ID: add_dashboard_indexes
+Revises: add_boletin_period_index
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_dashboard_indexes'
+down_revision = 'add_boletin_period_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create analisis indexes (INCLUDE columns and CONCURRENTLY only apply on PostgreSQL)."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_analisis_boletin_created', 'analisis', ['boletin_id', 'created_at'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'idx_analisis_riesgo_created', 'analisis', ['riesgo', 'created_at'],
+            postgresql_include=['monto_numerico'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'idx_analisis_created', 'analisis', ['created_at'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'idx_analisis_categoria', 'analisis', ['categoria'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    """Drop analisis indexes."""
+    op.drop_index('idx_analisis_categoria', table_name='analisis', if_exists=True)
+    op.drop_index('idx_analisis_created', table_name='analisis', if_exists=True)
+    op.drop_index('idx_analisis_riesgo_created', table_name='analisis', if_exists=True)
+    op.drop_index('idx_analisis_boletin_created', table_name='analisis', if_exists=True)
@@ -2,6 +2,7 @@
 API endpoints para gestión de agentes
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -165,6 +166,17 @@ async def chat_with_agent(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_with_agent_stream(request: ChatRequest):
+    """
+    Chat con el Insight Agent emitiendo la respuesta a medida que se genera
+    """
+    return StreamingResponse(
+        insight_agent.answer_query_stream(request.query, request.context),
+        media_type="text/plain; charset=utf-8"
+    )
+
+
 @router.post("/chat/clear")
 async def clear_chat_history():
     """
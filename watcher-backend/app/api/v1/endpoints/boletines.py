@@ -2,6 +2,8 @@
 API endpoints para gestión de boletines
 """
 
+import asyncio
+from collections import OrderedDict
 from typing import List, Dict, Optional
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query
 from pathlib import Path
@@ -18,6 +20,20 @@ from app.db import crud
 from app.db.models import Boletin
 import uuid
 
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _json_datetime(value):
+    """orjson serializa datetimes de forma nativa; sin orjson, ISO 8601."""
+    if ORJSON_AVAILABLE or value is None:
+        return value
+    return value.isoformat()
+
 
 def _find_pdf_path(filename: str) -> Optional[Path]:
     """
@@ -300,7 +316,7 @@ async def get_boletines_status(
     """
     try:
         # Obtener boletines con filtros
-        boletines = await crud.get_boletines(
+        boletines, total = await crud.get_boletines(
             db=db,
             skip=skip,
             limit=limit,
@@ -310,29 +326,24 @@ async def get_boletines_status(
         # Obtener estadísticas generales
         stats = await crud.get_analisis_stats(db)
         
+        # Cantidad de análisis y categoría/riesgo del más reciente, para
+        # todos los boletines de la página en una sola query
+        analisis_summary = await crud.get_analisis_summary_for_boletines(
+            db, [boletin.id for boletin in boletines]
+        )
+        sin_analisis = (0, None, None)
+        
         # Convertir a formato de respuesta
-        boletines_data = []
-        for boletin in boletines:
-            # Obtener análisis más reciente para categoría
-            analisis_list = await crud.get_analisis_by_boletin(db, boletin.id, limit=1)
-            categoria = None
-            riesgo = None
-            analisis_count = 0
-            
-            if analisis_list:
-                analisis_count = len(await crud.get_analisis_by_boletin(db, boletin.id, limit=100))
-                primer_analisis = analisis_list[0]
-                categoria = primer_analisis.categoria
-                riesgo = primer_analisis.riesgo
-            
-            boletines_data.append({
+        resumenes = (analisis_summary.get(boletin.id, sin_analisis) for boletin in boletines)
+        boletines_data = [
+            {
                 "id": boletin.id,
                 "filename": boletin.filename,
                 "date": boletin.date,
                 "section": boletin.section,
                 "status": boletin.status,
-                "created_at": boletin.created_at.isoformat() if boletin.created_at else None,
-                "updated_at": boletin.updated_at.isoformat() if boletin.updated_at else None,
+                "created_at": _json_datetime(boletin.created_at),
+                "updated_at": _json_datetime(boletin.updated_at),
                 "error_message": boletin.error_message,
                 "categoria": categoria,
                 "riesgo": riesgo,
@@ -341,53 +352,119 @@ async def get_boletines_status(
                 "jurisdiccion_id": boletin.jurisdiccion_id,
                 "jurisdiccion_nombre": boletin.jurisdiccion.nombre if boletin.jurisdiccion else None,
                 "seccion_nombre": boletin.seccion_nombre
-            })
+            }
+            for boletin, (analisis_count, categoria, riesgo) in zip(boletines, resumenes)
+        ]
         
-        return {
+        content = {
             "boletines": boletines_data,
-            "total": len(boletines_data),
+            "total": total,
+            "page_size": len(boletines_data),
             "stats": stats
         }
+        # Con orjson se serializa directo (datetimes incluidos), sin pasar
+        # por jsonable_encoder
+        if ORJSON_AVAILABLE:
+            return ORJSONResponse(content)
+        return content
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Estado de los jobs de procesamiento individual (en memoria, por proceso)
+_process_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_MAX_PROCESS_JOBS = 1000
+
+
+def _register_process_job(filename: str, output_path: Path, **fields) -> str:
+    """
+    Registra un job en `_process_jobs` y devuelve su task_id.
+    """
+    task_id = str(uuid.uuid4())
+    _process_jobs[task_id] = {
+        "task_id": task_id,
+        "filename": filename,
+        "status": "queued",
+        "output_file": str(output_path),
+        **fields
+    }
+    while len(_process_jobs) > _MAX_PROCESS_JOBS:
+        _process_jobs.popitem(last=False)
+    return task_id
+
+
+async def _process_and_analyze(task_id: str, pdf_path: Path, output_path: Path,
+                               txt_path: Optional[Path] = None) -> None:
+    """
+    Convierte el PDF a texto y lo analiza con Watcher, fuera del request.
+    
+    Si `txt_path` viene dado, el PDF ya se convirtió y solo se analiza.
+    """
+    job = _process_jobs.get(task_id)
+    if job is None:
+        # El registro se descartó (más de _MAX_PROCESS_JOBS encolados) antes
+        # de que la tarea arrancara: nadie puede consultarla
+        return
+    job["status"] = "running"
+    try:
+        if txt_path is None:
+            txt_path = await pdf_processor.process_pdf(pdf_path)
+            job["text_file"] = str(txt_path)
+        await watcher_service.process_file(txt_path, output_path)
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+
+
 @router.post("/{filename}/process")
 async def process_boletin(
     filename: str,
     background_tasks: BackgroundTasks
 ) -> Dict:
     """
-    Procesa un boletín específico.
+    Encola el procesamiento de un boletín específico.
+    
+    La conversión a texto y el análisis corren en una única tarea en segundo
+    plano; la respuesta vuelve de inmediato con un task_id consultable en
+    /tasks/{task_id}.
     
     Args:
         filename: Nombre del archivo PDF
         background_tasks: Tareas en segundo plano
     """
+    pdf_path = _find_pdf_path(filename) or Path(filename)
+    if not pdf_path.exists():
+        raise HTTPException(status_code=404, detail="Boletín no encontrado")
+    
     try:
-        # Convertir a texto
-        txt_path = pdf_processor.process_pdf(filename)
-        
-        # Analizar con Watcher en segundo plano
         output_path = settings.DATA_DIR / "results" / f"{Path(filename).stem}_analysis.jsonl"
-        background_tasks.add_task(
-            watcher_service.process_file,
-            txt_path,
-            output_path
-        )
+        task_id = _register_process_job(filename, output_path)
+        
+        background_tasks.add_task(_process_and_analyze, task_id, pdf_path, output_path)
         
         return {
-            "message": "Procesamiento iniciado",
+            "message": "Procesamiento encolado",
+            "task_id": task_id,
+            "status": "queued",
             "filename": filename,
-            "text_file": str(txt_path),
             "output_file": str(output_path)
         }
         
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Boletín no encontrado")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/tasks/{task_id}")
+async def get_process_task(task_id: str) -> Dict:
+    """
+    Estado de un procesamiento encolado con /{filename}/process o /batch/process.
+    """
+    job = _process_jobs.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    return dict(job)
+
 @router.post("/batch/process")
 async def process_batch(
     filenames: List[str],
@@ -401,33 +478,38 @@ async def process_batch(
         background_tasks: Tareas en segundo plano
     """
     try:
+        # Convertir todos los PDFs a texto en paralelo (la extracción corre
+        # en threads dentro de process_pdf)
+        txt_paths = await asyncio.gather(
+            *(pdf_processor.process_pdf(filename) for filename in filenames),
+            return_exceptions=True
+        )
+        
         results = []
-        for filename in filenames:
-            try:
-                # Convertir a texto
-                txt_path = pdf_processor.process_pdf(filename)
-                
-                # Analizar con Watcher en segundo plano
-                output_path = settings.DATA_DIR / "results" / f"{Path(filename).stem}_analysis.jsonl"
-                background_tasks.add_task(
-                    watcher_service.process_file,
-                    txt_path,
-                    output_path
-                )
-                
-                results.append({
-                    "filename": filename,
-                    "status": "processing",
-                    "text_file": str(txt_path),
-                    "output_file": str(output_path)
-                })
-                
-            except Exception as e:
+        for filename, txt_path in zip(filenames, txt_paths):
+            if isinstance(txt_path, Exception):
                 results.append({
                     "filename": filename,
                     "status": "error",
-                    "error": str(e)
+                    "error": str(txt_path)
                 })
+                continue
+            
+            # Analizar con Watcher en segundo plano; el estado queda
+            # consultable en /tasks/{task_id}
+            output_path = settings.DATA_DIR / "results" / f"{Path(filename).stem}_analysis.jsonl"
+            task_id = _register_process_job(filename, output_path, text_file=str(txt_path))
+            background_tasks.add_task(
+                _process_and_analyze, task_id, Path(filename), output_path, txt_path
+            )
+            
+            results.append({
+                "filename": filename,
+                "status": "processing",
+                "task_id": task_id,
+                "text_file": str(txt_path),
+                "output_file": str(output_path)
+            })
         
         return {
             "message": f"Procesando {len(filenames)} boletines",
@@ -448,39 +530,8 @@ async def get_monthly_stats(
         db: Sesión de base de datos
     """
     try:
-        # Obtener todos los boletines
-        boletines = await crud.get_boletines(db=db, limit=1000)
-        
-        # Agrupar por mes
-        monthly_stats = {}
-        
-        for boletin in boletines:
-            if boletin.date and boletin.date != 'unknown' and len(boletin.date) >= 6:
-                month = boletin.date[:6]  # YYYYMM
-                
-                if month not in monthly_stats:
-                    monthly_stats[month] = {
-                        'month': month,
-                        'total': 0,
-                        'completed': 0,
-                        'pending': 0,
-                        'failed': 0,
-                        'processing': 0
-                    }
-                
-                monthly_stats[month]['total'] += 1
-                
-                if boletin.status == 'completed':
-                    monthly_stats[month]['completed'] += 1
-                elif boletin.status == 'pending':
-                    monthly_stats[month]['pending'] += 1
-                elif boletin.status == 'failed':
-                    monthly_stats[month]['failed'] += 1
-                elif boletin.status == 'processing':
-                    monthly_stats[month]['processing'] += 1
-        
-        # Convertir a lista ordenada
-        stats_list = sorted(monthly_stats.values(), key=lambda x: x['month'])
+        # Conteos por mes y estado agregados en SQL, ordenados por mes
+        stats_list = await crud.get_monthly_status_counts(db)
         
         return {
             "monthly_stats": stats_list,
@@ -2,12 +2,15 @@
 Dashboard endpoint with real data from Watcher Agent
 """
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, desc
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+import hashlib
+import json
+import time
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import func, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Optional, Tuple
 
-from app.db.sync_session import get_sync_db
+from app.db.session import get_db
 from app.db.models import (
     Boletin,  # Tabla real de boletines
     Analisis,  # Tabla real de análisis
@@ -16,47 +19,82 @@ from app.db.models import (
 
 router = APIRouter()
 
+# El dashboard consulta /stats periódicamente: la respuesta serializada se
+# reutiliza durante unos segundos y se valida con ETag (304 sin body)
+STATS_CACHE_TTL_SECONDS = 15
+_stats_cache: Optional[Tuple[float, bytes, str]] = None  # (expira, payload, etag)
+
 
 @router.get("/stats")
 async def get_dashboard_stats(
-    db: Session = Depends(get_sync_db)
-) -> Dict[str, Any]:
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> Response:
     """
     Get comprehensive dashboard statistics from real Watcher Agent data
+    
+    Cached for STATS_CACHE_TTL_SECONDS; supports conditional GET via ETag/If-None-Match.
     """
+    global _stats_cache
+    
+    now = time.monotonic()
+    if _stats_cache is not None and _stats_cache[0] > now:
+        _, payload, etag = _stats_cache
+    else:
+        stats = await _compute_dashboard_stats(db)
+        payload = json.dumps(stats, ensure_ascii=False).encode("utf-8")
+        etag = f'"{hashlib.md5(payload).hexdigest()}"'
+        # Los errores no se cachean: el próximo request vuelve a intentar
+        if 'error' not in stats:
+            _stats_cache = (now + STATS_CACHE_TTL_SECONDS, payload, etag)
+    
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'private, max-age={STATS_CACHE_TTL_SECONDS}'
+    }
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type='application/json', headers=headers)
+
+
+async def _compute_dashboard_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Calcula las estadísticas de /stats (sin cache)"""
     try:
-        # Documentos totales (boletines)
-        total_documents = db.query(func.count(Boletin.id)).scalar() or 0
-        
-        # Documentos con texto extraído (status='completed')
-        analyzed_documents = db.query(func.count(Boletin.id)).filter(
-            Boletin.status == 'completed'
-        ).scalar() or 0
-        
-        # Documentos pendientes de extracción
-        pending_documents = db.query(func.count(Boletin.id)).filter(
-            Boletin.status == 'pending'
-        ).scalar() or 0
+        # Conteos de boletines en un solo recorrido (COUNT(*) FILTER (WHERE ...))
+        result = await db.execute(select(
+            func.count(Boletin.id),
+            # Documentos con texto extraído (status='completed')
+            func.count(Boletin.id).filter(Boletin.status == 'completed'),
+            # Documentos pendientes de extracción
+            func.count(Boletin.id).filter(Boletin.status == 'pending')
+        ))
+        total_documents, analyzed_documents, pending_documents = result.one()
         
-        # Total de workflows ejecutados
-        total_executions = db.query(func.count(AgentWorkflow.id)).scalar() or 0
+        # Workflows: totales, completados y activos (configuraciones activas)
+        result = await db.execute(select(
+            func.count(AgentWorkflow.id),
+            func.count(AgentWorkflow.id).filter(AgentWorkflow.status == 'completed'),
+            func.count(AgentWorkflow.id).filter(AgentWorkflow.status.in_(['pending', 'running']))
+        ))
+        total_executions, completed_executions, active_configs = result.one()
         
-        # Workflows completados
-        completed_executions = db.query(func.count(AgentWorkflow.id)).filter(
-            AgentWorkflow.status == 'completed'
-        ).scalar() or 0
+        # Red flags por "severidad" (mapeando riesgo a severidad), con el
+        # monto detectado por nivel en el mismo GROUP BY
+        result = await db.execute(select(
+            Analisis.riesgo,
+            func.count(Analisis.id),
+            func.sum(Analisis.monto_numerico)
+        ).group_by(Analisis.riesgo))
+        risk_rows = result.all()
+        risk_stats = [(riesgo, count) for riesgo, count, _ in risk_rows]
         
-        # Total análisis realizados (RED FLAGS = análisis con riesgo ALTO)
-        total_analyses = db.query(func.count(Analisis.id)).scalar() or 0
-        total_red_flags = db.query(func.count(Analisis.id)).filter(
-            Analisis.riesgo == 'ALTO'
-        ).scalar() or 0
+        # Total análisis realizados (RED FLAGS = análisis con riesgo ALTO),
+        # derivados del mismo GROUP BY
+        total_analyses = sum(count for _, count in risk_stats)
+        total_red_flags = sum(count for riesgo, count in risk_stats if riesgo == 'ALTO')
         
-        # Red flags por "severidad" (mapeando riesgo a severidad)
-        risk_stats = db.query(
-            Analisis.riesgo,
-            func.count(Analisis.id)
-        ).group_by(Analisis.riesgo).all()
+        # Montos totales detectados (suma de monto_numerico de todos los niveles)
+        total_amount_detected = sum(amount for _, _, amount in risk_rows if amount is not None)
         
         red_flags_by_severity = {
             'critical': 0,  # ALTO
@@ -97,7 +135,8 @@ async def get_dashboard_stats(
                 risk_distribution['low'] = count
         
         # Documentos por mes (basado en fecha del boletín: YYYYMMDD)
-        boletines_with_dates = db.query(Boletin.date).filter(Boletin.date.isnot(None)).all()
+        result = await db.execute(select(Boletin.date).where(Boletin.date.isnot(None)))
+        boletines_with_dates = result.all()
         
         monthly_counts = {}
         for (date_str,) in boletines_with_dates:
@@ -118,9 +157,12 @@ async def get_dashboard_stats(
             })
         
         # Últimas ejecuciones (workflows completados)
-        recent_workflows = db.query(AgentWorkflow).filter(
-            AgentWorkflow.status == 'completed'
-        ).order_by(desc(AgentWorkflow.created_at)).limit(5).all()
+        result = await db.execute(
+            select(AgentWorkflow).where(
+                AgentWorkflow.status == 'completed'
+            ).order_by(desc(AgentWorkflow.created_at)).limit(5)
+        )
+        recent_workflows = result.scalars().all()
         
         executions_list = []
         for wf in recent_workflows:
@@ -135,24 +177,17 @@ async def get_dashboard_stats(
             })
         
         # Top categorías de análisis
-        top_categories = db.query(
+        result = await db.execute(select(
             Analisis.categoria,
             func.count(Analisis.id).label('count')
-        ).group_by(Analisis.categoria).order_by(desc('count')).limit(10).all()
+        ).group_by(Analisis.categoria).order_by(desc('count')).limit(10))
+        top_categories = result.all()
         
         top_red_flags = [
             {'type': categoria or 'sin_categoria', 'count': count}
             for categoria, count in top_categories
         ]
         
-        # Montos totales detectados (sumar de monto_numerico)
-        total_amount_detected = db.query(func.sum(Analisis.monto_numerico)).scalar() or 0
-        
-        # Configuraciones activas (usar total de workflows como proxy)
-        active_configs = db.query(func.count(AgentWorkflow.id)).filter(
-            AgentWorkflow.status.in_(['pending', 'running'])
-        ).scalar() or 0
-        
         return {
             'summary': {
                 'total_documents': total_documents,
@@ -205,14 +240,17 @@ async def get_dashboard_stats(
 async def get_recent_red_flags(
     limit: int = 20,
     severity: str = None,
-    db: Session = Depends(get_sync_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get recent high-risk analyses (red flags) from Analisis table
     """
     try:
-        # Consultar análisis de alto riesgo (RED FLAGS)
-        query = db.query(Analisis).order_by(desc(Analisis.created_at))
+        # Consultar análisis de alto riesgo (RED FLAGS) junto con su boletín
+        # en una sola query (sin un lookup del boletín por análisis)
+        query = select(Analisis, Boletin).outerjoin(
+            Boletin, Boletin.id == Analisis.boletin_id
+        ).order_by(desc(Analisis.created_at))
         
         # Mapear severity a riesgo
         if severity:
@@ -226,15 +264,11 @@ async def get_recent_red_flags(
             # Por defecto, solo mostrar alto riesgo
             query = query.filter(Analisis.riesgo == 'ALTO')
         
-        analyses = query.limit(limit).all()
+        result = await db.execute(query.limit(limit))
+        rows = result.all()
         
         result = []
-        for analisis in analyses:
-            # Get boletin info
-            boletin = db.query(Boletin).filter(
-                Boletin.id == analisis.boletin_id
-            ).first()
-            
+        for analisis, boletin in rows:
             # Mapear riesgo a severity
             severity_map = {
                 'ALTO': 'critical',
@@ -290,23 +324,26 @@ async def get_recent_red_flags(
 
 @router.get("/timeline")
 async def get_analysis_timeline(
-    db: Session = Depends(get_sync_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get timeline of workflow execution activity
     """
     try:
         # Get all completed workflows
-        workflows = db.query(AgentWorkflow).filter(
-            AgentWorkflow.status == 'completed'
-        ).order_by(AgentWorkflow.created_at).all()
+        result = await db.execute(
+            select(AgentWorkflow).where(
+                AgentWorkflow.status == 'completed'
+            ).order_by(AgentWorkflow.created_at)
+        )
+        workflows = result.scalars().all()
         
         timeline = []
         for wf in workflows:
             # Contar análisis generados por este workflow (aproximado por fecha)
-            analyses_count = db.query(func.count(Analisis.id)).filter(
-                Analisis.created_at >= wf.created_at
-            ).scalar() or 0
+            analyses_count = (await db.execute(
+                select(func.count(Analisis.id)).where(Analisis.created_at >= wf.created_at)
+            )).scalar_one() or 0
             
             duration = 0
             if wf.updated_at and wf.created_at:
@@ -19,6 +19,12 @@ from app.schemas.dslab import (
 router = APIRouter()
 
 
+def _invalidate_period_aggregates() -> None:
+    """Los documentos nuevos o modificados cambian los agregados por período cacheados"""
+    from agents.tools.analysis_tools import AnalysisTools
+    AnalysisTools.invalidate_period_cache()
+
+
 @router.post("/documents", response_model=BoletinDocumentResponse, status_code=201)
 async def register_document(
     document: BoletinDocumentCreate,
@@ -40,6 +46,7 @@ async def register_document(
     db.add(db_document)
     db.commit()
     db.refresh(db_document)
+    _invalidate_period_aggregates()
     
     return db_document
 
@@ -119,6 +126,7 @@ async def update_document(
     document.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(document)
+    _invalidate_period_aggregates()
     
     return document
 
@@ -269,6 +277,9 @@ async def batch_register_documents(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error en commit: {str(e)}")
     
+    if registered:
+        _invalidate_period_aggregates()
+    
     return {
         "registered": len(registered),
         "skipped": len(skipped),
@@ -62,6 +62,7 @@ async def run_analysis_task(
     from sqlalchemy import create_engine
     from sqlalchemy.orm import sessionmaker
     from app.services.dslab_analyzer import DSLabAnalyzer
+    from agents.tools.analysis_tools import AnalysisTools
     
     # Crear nueva sesión para el background task
     engine = create_engine(f"sqlite:///{db_path}")
@@ -202,6 +203,8 @@ async def run_analysis_task(
     
     finally:
         db.close()
+        # Los resultados nuevos cambian los agregados por período ya cacheados
+        AnalysisTools.invalidate_period_cache()
 
 
 @router.post("/analysis/executions", response_model=AnalysisExecutionResponse, status_code=201)
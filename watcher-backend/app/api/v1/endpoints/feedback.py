@@ -1,16 +1,32 @@
 """
 API endpoints para sistema de feedback y learning
 """
-from fastapi import APIRouter, HTTPException
-from typing import Optional, Dict, Any
+import threading
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 
 from agents.learning import LearningAgent
 
 router = APIRouter()
 
-# Instancia global del learning agent
-learning_agent = LearningAgent()
+# Instancia global del learning agent, creada en el primer request
+_learning_agent: Optional[LearningAgent] = None
+_learning_agent_lock = threading.Lock()
+
+
+def get_learning_agent() -> LearningAgent:
+    """Get or create global learning agent instance."""
+    global _learning_agent
+    
+    # Las dependencias sync corren en el threadpool: el lock evita crear
+    # dos instancias (y perder el feedback de una) con requests simultáneos
+    if _learning_agent is None:
+        with _learning_agent_lock:
+            if _learning_agent is None:
+                _learning_agent = LearningAgent()
+    
+    return _learning_agent
 
 
 # Schemas
@@ -38,7 +54,10 @@ class GenericFeedbackRequest(BaseModel):
 
 # Endpoints
 @router.post("/red-flag/validate")
-async def validate_red_flag(request: ValidateRedFlagRequest):
+async def validate_red_flag(
+    request: ValidateRedFlagRequest,
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Valida una red flag como verdadero o falso positivo
     """
@@ -54,7 +73,10 @@ async def validate_red_flag(request: ValidateRedFlagRequest):
 
 
 @router.post("/classification/rate")
-async def rate_classification(request: RateClassificationRequest):
+async def rate_classification(
+    request: RateClassificationRequest,
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Registra corrección de clasificación
     """
@@ -71,7 +93,10 @@ async def rate_classification(request: RateClassificationRequest):
 
 
 @router.post("")
-async def submit_feedback(request: GenericFeedbackRequest):
+async def submit_feedback(
+    request: GenericFeedbackRequest,
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Envía feedback genérico
     """
@@ -89,8 +114,26 @@ async def submit_feedback(request: GenericFeedbackRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/bulk")
+async def submit_feedback_bulk(
+    requests: List[GenericFeedbackRequest],
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
+    """
+    Envía un lote de feedback genérico en un solo request
+    """
+    try:
+        return learning_agent.record_feedback_bulk(
+            [request.model_dump() for request in requests]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/metrics")
-async def get_performance_metrics():
+async def get_performance_metrics(
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Obtiene métricas de performance del sistema
     """
@@ -98,7 +141,9 @@ async def get_performance_metrics():
 
 
 @router.get("/adjustments")
-async def get_suggested_adjustments():
+async def get_suggested_adjustments(
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Obtiene ajustes sugeridos basados en feedback
     """
@@ -108,7 +153,10 @@ async def get_suggested_adjustments():
 
 
 @router.post("/adjustments/{adjustment_id}/apply")
-async def apply_adjustment(adjustment_id: int):
+async def apply_adjustment(
+    adjustment_id: int,
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Marca un ajuste como aplicado
     """
@@ -121,7 +169,11 @@ async def apply_adjustment(adjustment_id: int):
 
 
 @router.get("/history")
-async def get_feedback_history(entity_type: Optional[str] = None, limit: int = 100):
+async def get_feedback_history(
+    entity_type: Optional[str] = None,
+    limit: int = 100,
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Obtiene historial de feedback
     """
@@ -131,7 +183,9 @@ async def get_feedback_history(entity_type: Optional[str] = None, limit: int = 1
 
 
 @router.get("/insights")
-async def get_learning_insights():
+async def get_learning_insights(
+    learning_agent: LearningAgent = Depends(get_learning_agent)
+):
     """
     Obtiene insights sobre el aprendizaje del sistema
     """
@@ -3,6 +3,7 @@ API endpoints para el servicio Watcher
 """
 
 from typing import Dict, Optional
+import aiofiles
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pathlib import Path
 
@@ -12,6 +13,8 @@ from app.services.watcher_service import WatcherService
 router = APIRouter()
 watcher_service = WatcherService()
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 @router.post("/analyze/text/")
 async def analyze_text(
     text: str,
@@ -61,9 +64,11 @@ async def analyze_file(
         input_path = settings.UPLOADS_DIR / file.filename
         output_path = settings.RESULTS_DIR / f"{Path(file.filename).stem}_analysis.jsonl"
         
-        content = await file.read()
-        with open(input_path, "wb") as f:
-            f.write(content)
+        # Copiar en bloques: no se carga el archivo entero en memoria ni se
+        # bloquea el event loop escribiendo a disco
+        async with aiofiles.open(input_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
         
         # Procesar archivo
         result_path = await watcher_service.process_file(input_path, output_path, max_fragments)
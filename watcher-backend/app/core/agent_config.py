@@ -64,6 +64,11 @@ class AnomalyDetectionConfig(BaseModel):
             "max_depth": 10
         }
     })
+    # Logging de errores: tracebacks completos solo para los primeros N
+    # errores de cada ventana (o siempre, con debug_tracebacks)
+    debug_tracebacks: bool = False
+    error_traceback_limit: int = 5
+    error_window_seconds: float = 60.0
 
 
 class InsightReportingConfig(BaseModel):
@@ -76,6 +81,26 @@ class InsightReportingConfig(BaseModel):
     enable_reranking: bool = True
     temperature: float = 0.7
     max_tokens: int = 2000
+    # Tope de caracteres del contexto de datos serializado en el prompt
+    max_context_chars: int = 6000
+    # Modelos: las narrativas son párrafos cortos sobre métricas fijas y no
+    # necesitan el mismo modelo que el chat
+    query_model: str = "gemini-2.0-flash"
+    narrative_model: str = "gemini-2.0-flash-lite"
+    narrative_max_tokens: int = 256
+    # Cache de respuestas del modelo (prompt idéntico dentro del TTL)
+    enable_response_cache: bool = True
+    response_cache_max_entries: int = 256
+    response_cache_ttl_seconds: int = 3600
+    # Cache estructural de narrativas (métricas de forma similar, ±10%)
+    enable_narrative_template_cache: bool = True
+    # Narrativas en lote (flujos no interactivos)
+    max_concurrent_narratives: int = 4
+    # Límites de llamadas al modelo
+    llm_max_rpm: int = 1000
+    llm_max_tpm: int = 4000000
+    llm_max_concurrent: int = 8
+    llm_max_retries: int = 5
 
 
 class OrchestratorConfig(BaseModel):
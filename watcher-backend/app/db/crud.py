@@ -4,10 +4,10 @@ Operaciones CRUD para la base de datos
 
 import re
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload
 
 from .models import Boletin, Analisis
 
@@ -107,13 +107,66 @@ async def get_boletines(
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None
-) -> List[Boletin]:
-    """Obtiene lista de boletines con filtros opcionales."""
-    query = select(Boletin).options(selectinload(Boletin.jurisdiccion)).offset(skip).limit(limit)
+) -> Tuple[List[Boletin], int]:
+    """
+    Obtiene una página de boletines con filtros opcionales.
+    
+    Returns:
+        (boletines de la página, total de boletines que cumplen los filtros)
+    """
+    # jurisdiccion (many-to-one) viene en el mismo SELECT con un JOIN; el
+    # resto de las relaciones no se cargan y acceder a ellas falla en lugar
+    # de disparar una query por boletín. El total sale de la misma query con
+    # COUNT(*) OVER (), calculado antes del LIMIT/OFFSET
+    query = (
+        select(Boletin, func.count().over().label("total_count"))
+        .options(joinedload(Boletin.jurisdiccion), raiseload("*"))
+        .order_by(Boletin.id)
+        .offset(skip)
+        .limit(limit)
+    )
     if status:
         query = query.where(Boletin.status == status)
     result = await db.execute(query)
-    return result.scalars().all()
+    rows = result.all()
+    
+    if rows:
+        return [row[0] for row in rows], rows[0].total_count
+    if not skip:
+        return [], 0
+    
+    # Página fuera de rango: la ventana no devuelve filas, el total se cuenta aparte
+    count_query = select(func.count(Boletin.id))
+    if status:
+        count_query = count_query.where(Boletin.status == status)
+    return [], await db.scalar(count_query)
+
+async def get_monthly_status_counts(db: AsyncSession) -> List[Dict]:
+    """
+    Cantidad de boletines por mes (YYYYMM) y estado, agregada en la base.
+    
+    Ignora boletines sin fecha, con fecha 'unknown' o con menos de 6 caracteres.
+    """
+    month = func.substr(Boletin.date, 1, 6).label("month")
+    query = (
+        select(
+            month,
+            func.count(Boletin.id).label("total"),
+            *(
+                func.count(Boletin.id).filter(Boletin.status == status).label(status)
+                for status in ("completed", "pending", "failed", "processing")
+            )
+        )
+        .where(
+            Boletin.date.isnot(None),
+            Boletin.date != "unknown",
+            func.length(Boletin.date) >= 6
+        )
+        .group_by(month)
+        .order_by(month)
+    )
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
 
 async def update_boletin_status(
     db: AsyncSession,
@@ -245,6 +298,7 @@ async def get_analisis_by_boletin(
     """Obtiene análisis de un boletín específico."""
     query = (
         select(Analisis)
+        .options(raiseload(Analisis.boletin))
         .where(Analisis.boletin_id == boletin_id)
         .offset(skip)
         .limit(limit)
@@ -252,6 +306,46 @@ async def get_analisis_by_boletin(
     result = await db.execute(query)
     return result.scalars().all()
 
+async def get_analisis_summary_for_boletines(
+    db: AsyncSession,
+    boletin_ids: List[int]
+) -> Dict[int, Tuple[int, Optional[str], Optional[str]]]:
+    """
+    Cantidad de análisis y categoría/riesgo del más reciente, para varios boletines.
+    
+    Una sola query: ROW_NUMBER() elige el análisis más reciente de cada
+    boletín y COUNT(*) OVER cuenta los análisis de la partición.
+    
+    Returns:
+        {boletin_id: (cantidad, categoria, riesgo)}; los boletines sin análisis no aparecen
+    """
+    if not boletin_ids:
+        return {}
+    
+    ranked = (
+        select(
+            Analisis.boletin_id,
+            Analisis.categoria,
+            Analisis.riesgo,
+            func.row_number().over(
+                partition_by=Analisis.boletin_id,
+                order_by=(Analisis.created_at.desc(), Analisis.id.desc())
+            ).label("rn"),
+            func.count().over(partition_by=Analisis.boletin_id).label("total")
+        )
+        .where(Analisis.boletin_id.in_(boletin_ids))
+        .subquery()
+    )
+    query = (
+        select(ranked.c.boletin_id, ranked.c.total, ranked.c.categoria, ranked.c.riesgo)
+        .where(ranked.c.rn == 1)
+    )
+    result = await db.execute(query)
+    return {
+        boletin_id: (total, categoria, riesgo)
+        for boletin_id, total, categoria, riesgo in result.all()
+    }
+
 async def get_analisis_stats(db: AsyncSession) -> Dict:
     """Obtiene estadísticas generales de los análisis."""
     # Total de boletines por estado
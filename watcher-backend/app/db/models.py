@@ -4,7 +4,7 @@ Modelos de base de datos - Versión completa con historial acumulativo
 
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Date, Boolean, Index
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Date, Boolean, Index, literal_column
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -86,6 +86,17 @@ class Analisis(Base):
     # Relación con boletín
     boletin = relationship("Boletin", back_populates="analisis")
 
+    __table_args__ = (
+        # Análisis de un boletín, el más reciente primero
+        Index('idx_analisis_boletin_created', 'boletin_id', 'created_at'),
+        # GROUP BY riesgo del dashboard (con el monto en el índice en
+        # PostgreSQL) y red flags recientes filtradas por riesgo
+        Index('idx_analisis_riesgo_created', 'riesgo', 'created_at',
+              postgresql_include=['monto_numerico']),
+        Index('idx_analisis_created', 'created_at'),
+        Index('idx_analisis_categoria', 'categoria'),
+    )
+
 class ActoAdministrativo(Base):
     """Modelo para actos administrativos extraídos de boletines"""
     __tablename__ = "actos_administrativos"
@@ -398,9 +409,22 @@ class BoletinDocument(Base):
     __table_args__ = (
         Index('idx_boletin_doc_date', 'year', 'month', 'day'),
         Index('idx_boletin_doc_status', 'analysis_status'),
+        # Filtros por período + join con analysis_results (index-only scan en PostgreSQL)
+        Index('idx_boletin_doc_period', 'year', 'month', 'id', postgresql_include=['filename', 'day']),
     )
 
 
+def period_index(document):
+    """Período de un boletín como entero monótono (year * 12 + month)"""
+    # 12 como literal y no como parámetro: la expresión tiene que coincidir
+    # textualmente con la del índice para que el planner lo use
+    return document.year * literal_column('12') + document.month
+
+
+# Rangos de períodos como un único BETWEEN (get_transparency_trends)
+Index('idx_boletin_doc_yyyymm', period_index(BoletinDocument))
+
+
 class AnalysisConfig(Base):
     """Configuraciones y versiones de modelos de análisis"""
     __tablename__ = "analysis_configs"
@@ -499,9 +523,21 @@ class AnalysisResult(Base):
         Index('idx_result_document_execution', 'document_id', 'execution_id', unique=True),
         Index('idx_result_risk', 'risk_level'),
         Index('idx_result_score', 'transparency_score'),
+        # Agregados por documento/riesgo sin visitar la tabla en PostgreSQL
+        Index('idx_result_document_risk', 'document_id', 'risk_level',
+              postgresql_include=['transparency_score', 'num_red_flags']),
     )
 
 
+# Orden de get_top_risk_documents: evita el sort sobre los resultados de riesgo alto
+Index(
+    'idx_result_risk_flags_score',
+    AnalysisResult.risk_level,
+    AnalysisResult.num_red_flags.desc(),
+    AnalysisResult.transparency_score
+)
+
+
 class RedFlag(Base):
     """Red flags individuales (para análisis detallado)"""
     __tablename__ = "red_flags"
@@ -36,10 +36,20 @@ if _google_api_key:
 else:
     logger.warning("GOOGLE_API_KEY not set — Google AI features will be unavailable")
 
+# ---------------------------------------------------------------------------
+# JSON responses — orjson when installed, stdlib json otherwise
+# ---------------------------------------------------------------------------
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API para análisis de boletines oficiales",
     version="1.1.0",
+    default_response_class=DefaultJSONResponse,
 )
 
 
@@ -6,6 +6,7 @@ import asyncio
 import json
 import logging
 import re
+from pathlib import Path
 from typing import Dict, List, Optional
 import google.generativeai as genai
 import os
@@ -382,10 +383,16 @@ Siempre incluye motivo_riesgo y accion_sugerida, incluso para riesgo "bajo" (ej:
                 "error": str(e)
             }
 
-    async def analyze_content(self, content: str, metadata: Dict) -> List[Dict]:
+    async def analyze_content(self, content: str, metadata: Dict,
+                              max_fragments: Optional[int] = None) -> List[Dict]:
         """
         Analiza contenido dividiéndolo en fragmentos si es necesario.
         
+        Args:
+            content: Texto a analizar
+            metadata: Contexto del documento (boletín, sección, jurisdicción)
+            max_fragments: Número máximo de fragmentos a procesar (None = todos)
+        
         Returns:
             Lista de actos extraídos (cada uno es un dict con los campos de ActoExtraido).
             Cada acto incluye metadata adicional del fragmento.
@@ -399,6 +406,9 @@ Siempre incluye motivo_riesgo y accion_sugerida, incluso para riesgo "bajo" (ej:
                 fragments = self.split_content_by_tokens(content)
                 logger.info(f"Dividiendo contenido en {len(fragments)} fragmentos (total: {total_tokens} tokens)")
             
+            if max_fragments:
+                fragments = fragments[:max_fragments]
+            
             all_actos: List[Dict] = []
             
             for i, fragment in enumerate(fragments):
@@ -428,4 +438,40 @@ Siempre incluye motivo_riesgo y accion_sugerida, incluso para riesgo "bajo" (ej:
                 
         except Exception as e:
             logger.error(f"Error en analyze_content: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    async def process_file(self, input_path: Path, output_path: Path,
+                           max_fragments: Optional[int] = None) -> Path:
+        """
+        Analiza un archivo de texto y guarda los actos extraídos en JSONL.
+        
+        Args:
+            input_path: Archivo .txt a analizar (p. ej. la salida de PDFProcessor)
+            output_path: Archivo .jsonl de salida, un acto por línea
+            max_fragments: Número máximo de fragmentos a procesar (None = todos)
+        
+        Returns:
+            Ruta del archivo de resultados
+        """
+        input_path = Path(input_path)
+        output_path = Path(output_path)
+        
+        content = await asyncio.to_thread(input_path.read_text, encoding="utf-8")
+        
+        # Nombres tipo 20250101_1_Secc.txt: la sección da contexto al prompt
+        metadata = {"boletin": input_path.stem}
+        match = re.match(r"\d{8}_(\d+)_", input_path.name)
+        if match:
+            metadata["section_type"] = match.group(1)
+        
+        actos = await self.analyze_content(content, metadata, max_fragments=max_fragments)
+        
+        def _write_results() -> None:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as f:
+                for acto in actos:
+                    f.write(json.dumps(acto, ensure_ascii=False, default=str) + "\n")
+        
+        await asyncio.to_thread(_write_results)
+        logger.info(f"Resultados de {input_path.name} guardados en {output_path} ({len(actos)} actos)")
+        return output_path
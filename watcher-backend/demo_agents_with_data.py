@@ -165,17 +165,23 @@ async def demo_chat_agent():
         "¿Cómo ha evolucionado la transparencia en 2025?"
     ]
     
-    for query in queries:
+    # Las queries son independientes (cada una abre su propia sesión):
+    # se lanzan en paralelo y se imprimen en orden
+    results = await asyncio.gather(
+        *[agent.query_with_data(query) for query in queries],
+        return_exceptions=True
+    )
+    
+    for query, result in zip(queries, results):
         print(f"\n❓ Usuario: {query}")
-        result = await agent.query_with_data(query)
         
-        if result['success']:
+        if isinstance(result, Exception):
+            print(f"❌ Error: {result}")
+        elif result['success']:
             print(f"🤖 Agent: {result['response']}")
             print(f"📊 Datos usados: {', '.join(result['data_used'])}")
         else:
             print(f"❌ Error: {result['error']}")
-        
-        await asyncio.sleep(1)  # Pausa entre queries
 
 
 async def main():
@@ -38,6 +38,92 @@ def mock_async_session():
     return session
 
 
+@pytest.fixture
+async def sqlite_session_maker():
+    """Session factory over an in-memory aiosqlite database with all tables."""
+    from sqlalchemy.ext.asyncio import (
+        AsyncSession,
+        async_sessionmaker,
+        create_async_engine,
+    )
+
+    import app.db.models  # noqa: F401  (registra las tablas en Base.metadata)
+    from app.db.database import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
+
+
+@pytest.fixture
+def seed_analysis_results(sqlite_session_maker):
+    """
+    Factory that stores analysis results in the SQLite database.
+
+    Each result is a dict of AnalysisResult columns; the optional "document"
+    key is the index of its document (default: one document per result).
+    Every result gets its own execution, so a document can have several.
+    """
+    from app.db.models import (
+        AnalysisConfig,
+        AnalysisExecution,
+        AnalysisResult,
+        BoletinDocument,
+    )
+
+    async def _seed(results):
+        results = [dict(result) for result in results]
+        for i, result in enumerate(results):
+            result.setdefault("document", i)
+
+        async with sqlite_session_maker() as db:
+            config = AnalysisConfig(config_name="test", version="1", parameters={})
+            db.add(config)
+            await db.flush()
+            executions = [AnalysisExecution(config_id=config.id) for _ in results]
+            documents = [
+                BoletinDocument(
+                    filename=f"202501{i:02d}_1_Secc.pdf", year=2025, month=1, day=i + 1,
+                    section=1, file_path="x"
+                )
+                for i in range(max((r["document"] for r in results), default=-1) + 1)
+            ]
+            db.add_all(executions + documents)
+            await db.flush()
+
+            for execution, result in zip(executions, results):
+                document = documents[result.pop("document")]
+                db.add(AnalysisResult(
+                    document_id=document.id, execution_id=execution.id,
+                    config_id=config.id, **result
+                ))
+            await db.commit()
+
+    return _seed
+
+
+@pytest.fixture
+def seed_boletines(sqlite_session_maker):
+    """Factory that stores boletines (dicts of Boletin columns) in one jurisdiction."""
+    from app.db.models import Boletin, Jurisdiccion
+
+    async def _seed(boletines):
+        async with sqlite_session_maker() as db:
+            jurisdiccion = Jurisdiccion(nombre="Provincia de Córdoba", tipo="provincia")
+            db.add(jurisdiccion)
+            await db.flush()
+            db.add_all(
+                Boletin(jurisdiccion_id=jurisdiccion.id, **boletin) for boletin in boletines
+            )
+            await db.commit()
+
+    return _seed
+
+
 # ============================================================================
 # Scraper Fixtures
 # ============================================================================
@@ -0,0 +1,251 @@
+"""
+Unit tests for the compiled red-flag rules and the amount scan of
+AnomalyDetectionAgent.
+
+The compiled rules (agents/anomaly_detection/rules.py) and the amount
+kernels must produce the same output as the original implementation,
+reproduced below as `baseline_red_flags` and `baseline_anomaly_score`.
+"""
+
+import pytest
+
+from agents.anomaly_detection import _kernels
+from agents.anomaly_detection.agent import AnomalyDetectionAgent, _compute_text_stats
+from agents.anomaly_detection.rules import amount_values, digit_pattern_mask
+from app.core.agent_config import AnomalyDetectionConfig
+
+
+NOW_ISO = "2025-01-01T00:00:00"
+
+
+def _identify_missing_elements(entities):
+    missing = []
+    if not entities.get('amounts'):
+        missing.append("montos")
+    if not entities.get('beneficiaries'):
+        missing.append("beneficiarios")
+    if not entities.get('organisms'):
+        missing.append("organismos")
+    if not entities.get('dates'):
+        missing.append("fechas")
+    return missing
+
+
+def baseline_red_flags(red_flag_rules, entities, transparency_score):
+    """Original `_detect_red_flags`, with a fixed timestamp."""
+    red_flags = []
+
+    rule = red_flag_rules.get('HIGH_AMOUNT', {})
+    if rule.get('enabled', True):
+        threshold = rule.get('threshold', 50000000)
+        for amount in entities.get('amounts', []):
+            if amount['numeric_value'] > threshold:
+                red_flags.append({
+                    "type": "HIGH_AMOUNT",
+                    "severity": "high",
+                    "category": "amounts",
+                    "title": f"Monto muy alto detectado: ${amount['numeric_value']:,.0f}",
+                    "description": f"Se detectó un monto de ${amount['numeric_value']:,.0f} que supera el threshold de ${threshold:,.0f}",
+                    "evidence": {
+                        "amount": amount['numeric_value'],
+                        "raw_text": amount['raw_text'],
+                        "threshold": threshold
+                    },
+                    "confidence_score": 0.9,
+                    "timestamp": NOW_ISO
+                })
+
+    rule = red_flag_rules.get('MISSING_BENEFICIARY', {})
+    if rule.get('enabled', True):
+        if entities.get('amounts') and not entities.get('beneficiaries'):
+            red_flags.append({
+                "type": "MISSING_BENEFICIARY",
+                "severity": "medium",
+                "category": "transparency",
+                "title": "Falta identificación de beneficiario",
+                "description": "Se detectaron montos pero no se pudo identificar beneficiarios",
+                "evidence": {
+                    "amounts_count": len(entities.get('amounts', [])),
+                    "beneficiaries_found": 0
+                },
+                "confidence_score": 0.7,
+                "timestamp": NOW_ISO
+            })
+
+    rule = red_flag_rules.get('SUSPICIOUS_AMOUNT_PATTERN', {})
+    if rule.get('enabled', True):
+        patterns = rule.get('patterns', ['999999', '9999'])
+        for amount in entities.get('amounts', []):
+            amount_str = str(int(amount['numeric_value']))
+            for pattern in patterns:
+                if pattern in amount_str:
+                    red_flags.append({
+                        "type": "SUSPICIOUS_AMOUNT_PATTERN",
+                        "severity": "medium",
+                        "category": "patterns",
+                        "title": f"Patrón sospechoso en monto: {pattern}",
+                        "description": f"El monto ${amount['numeric_value']:,.0f} contiene el patrón sospechoso '{pattern}'",
+                        "evidence": {
+                            "amount": amount['numeric_value'],
+                            "pattern": pattern,
+                            "raw_text": amount['raw_text']
+                        },
+                        "confidence_score": 0.8,
+                        "timestamp": NOW_ISO
+                    })
+
+    rule = red_flag_rules.get('LOW_TRANSPARENCY_SCORE', {})
+    if rule.get('enabled', True):
+        threshold = rule.get('threshold', 30)
+        if transparency_score < threshold:
+            red_flags.append({
+                "type": "LOW_TRANSPARENCY_SCORE",
+                "severity": "high",
+                "category": "transparency",
+                "title": f"Score de transparencia muy bajo: {transparency_score:.1f}",
+                "description": f"El documento tiene un score de transparencia de {transparency_score:.1f}, por debajo del threshold de {threshold}",
+                "evidence": {
+                    "transparency_score": transparency_score,
+                    "threshold": threshold,
+                    "missing_elements": _identify_missing_elements(entities)
+                },
+                "confidence_score": 0.95,
+                "timestamp": NOW_ISO
+            })
+
+    return red_flags
+
+
+def baseline_anomaly_score(very_high, entities, text):
+    """Original `_calculate_anomaly_score`."""
+    anomaly = 0.0
+    amounts = entities.get('amounts', [])
+    for amount in amounts:
+        value = amount['numeric_value']
+        if '999' in str(int(value)):
+            anomaly += 15
+        if value > very_high:
+            anomaly += 10
+    if amounts and not entities.get('beneficiaries'):
+        anomaly += 20
+    words = text.lower().split()
+    if len(words) > 0:
+        unique_ratio = len(set(words)) / len(words)
+        if unique_ratio < 0.3:
+            anomaly += 15
+    return min(100.0, anomaly)
+
+
+def _amounts(*values):
+    return [{"numeric_value": v, "raw_text": f"$ {v}"} for v in values]
+
+
+AMOUNTS = _amounts(
+    99999999, 1234567.89, 10999, 50000000, 60000000.5, -1999999, 0, 9999.99, 1000999
+)
+
+DEFAULT_RULES = AnomalyDetectionConfig().red_flag_rules
+
+RULE_CONFIGS = {
+    "default": DEFAULT_RULES,
+    "empty": {},
+    "leading_zero_patterns": {
+        **DEFAULT_RULES,
+        "SUSPICIOUS_AMOUNT_PATTERN": {"enabled": True, "patterns": ["0999", "99"]},
+    },
+    "non_numeric_patterns": {
+        **DEFAULT_RULES,
+        "SUSPICIOUS_AMOUNT_PATTERN": {"enabled": True, "patterns": ["-1", "9999"]},
+    },
+    "no_patterns": {
+        **DEFAULT_RULES,
+        "SUSPICIOUS_AMOUNT_PATTERN": {"enabled": True, "patterns": []},
+    },
+    "disabled": {
+        name: {**rule, "enabled": False} for name, rule in DEFAULT_RULES.items()
+    },
+    "custom_thresholds": {
+        **DEFAULT_RULES,
+        "HIGH_AMOUNT": {"enabled": True, "threshold": 10000},
+        "LOW_TRANSPARENCY_SCORE": {"enabled": True, "threshold": 60},
+    },
+}
+
+DOCUMENTS = {
+    "amounts_without_beneficiaries": ({"amounts": AMOUNTS}, 25.0),
+    "amounts_with_beneficiaries": (
+        {"amounts": AMOUNTS, "beneficiaries": ["Acme SA"], "organisms": ["Ministerio"]}, 45.0
+    ),
+    "no_amounts": ({"beneficiaries": ["Acme SA"]}, 10.0),
+    "empty_amounts": ({"amounts": [], "dates": ["2025-01-01"]}, 80.0),
+    "no_entities": ({}, 0.0),
+}
+
+
+@pytest.mark.parametrize("rules_name", RULE_CONFIGS)
+@pytest.mark.parametrize("document_name", DOCUMENTS)
+def test_compiled_rules_match_baseline(rules_name, document_name):
+    """Same red flags, in the same order, as the original implementation."""
+    red_flag_rules = RULE_CONFIGS[rules_name]
+    entities, transparency_score = DOCUMENTS[document_name]
+    agent = AnomalyDetectionAgent(AnomalyDetectionConfig(red_flag_rules=red_flag_rules))
+
+    result = agent._detect_red_flags("", entities, transparency_score, now_iso=NOW_ISO)
+
+    assert result == baseline_red_flags(red_flag_rules, entities, transparency_score)
+
+
+AMOUNTS_FOR_MASK = _amounts(
+    0, 9, 99, 999, 1000, 10999, 1000999, 12345, 123456789, 99999999.9, -1999999, 2000001
+)
+
+
+@pytest.mark.parametrize("pattern", ["9", "99", "0999", "000", "1000", "12345"])
+def test_digit_pattern_mask_matches_substring_search(pattern):
+    """The integer digit sweep equals `pattern in str(int(value))`."""
+    mask = digit_pattern_mask(amount_values(AMOUNTS_FOR_MASK), pattern)
+
+    expected = [pattern in str(int(a["numeric_value"])) for a in AMOUNTS_FOR_MASK]
+    assert mask.tolist() == expected
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def amount_kernel(request, monkeypatch):
+    """Forces the numba or the NumPy amount scan."""
+    if request.param == "numba":
+        if not _kernels.NUMBA_AVAILABLE:
+            pytest.skip("numba not installed")
+    else:
+        monkeypatch.setattr(_kernels, "NUMBA_AVAILABLE", False)
+    return request.param
+
+
+@pytest.mark.parametrize("text", ["", "uno dos tres cuatro", "pago " * 20])
+@pytest.mark.parametrize("document_name", DOCUMENTS)
+def test_anomaly_score_matches_baseline(amount_kernel, document_name, text):
+    """Both amount kernels give the original anomaly score."""
+    entities, _ = DOCUMENTS[document_name]
+    agent = AnomalyDetectionAgent()
+    very_high = agent.config.amount_thresholds['very_high']
+
+    score = agent._calculate_anomaly_score(entities, text)
+    score_with_stats = agent._calculate_anomaly_score(
+        entities, text, text_stats=_compute_text_stats(text)
+    )
+
+    expected = baseline_anomaly_score(very_high, entities, text)
+    assert score == score_with_stats == expected
+
+
+def test_scan_amounts_kernels_agree():
+    """The numba kernel and the NumPy version return the same masks."""
+    if not _kernels.NUMBA_AVAILABLE:
+        pytest.skip("numba not installed")
+    values = amount_values(AMOUNTS_FOR_MASK)
+
+    jit = _kernels.scan_amounts(values, 50000000)
+    numpy = _kernels._scan_amounts_numpy(values, 50000000)
+
+    assert jit[0] == numpy[0]
+    assert jit[1].tolist() == numpy[1].tolist()
+    assert jit[2].tolist() == numpy[2].tolist()
@@ -0,0 +1,108 @@
+"""
+Unit tests for the queued boletin processing jobs of the boletines endpoints.
+"""
+
+from pathlib import Path
+
+import pytest
+from fastapi import BackgroundTasks
+
+import app.api.v1.endpoints.boletines as boletines_module
+
+
+class FakePDFProcessor:
+    """Converts any PDF name to a .txt path, failing for 'broken' files."""
+
+    async def process_pdf(self, pdf_path):
+        if "broken" in str(pdf_path):
+            raise ValueError("PDF ilegible")
+        return Path(str(pdf_path)).with_suffix(".txt")
+
+
+class FakeWatcherService:
+    """Records the files it analyzes."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.processed = []
+
+    async def process_file(self, input_path, output_path, max_fragments=None):
+        if self.fail:
+            raise RuntimeError("Gemini no disponible")
+        self.processed.append((Path(input_path), Path(output_path)))
+        return output_path
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    """Replaces the PDF processor, the Watcher service and the job registry."""
+    watcher = FakeWatcherService()
+    monkeypatch.setattr(boletines_module, "pdf_processor", FakePDFProcessor())
+    monkeypatch.setattr(boletines_module, "watcher_service", watcher)
+    monkeypatch.setattr(boletines_module, "_process_jobs", type(boletines_module._process_jobs)())
+    return watcher
+
+
+@pytest.mark.asyncio
+async def test_process_job_completes(fakes):
+    """A queued job converts the PDF, analyzes the text and completes."""
+    output_path = Path("/tmp/results/20250101_1_Secc_analysis.jsonl")
+    task_id = boletines_module._register_process_job("20250101_1_Secc.pdf", output_path)
+
+    await boletines_module._process_and_analyze(task_id, Path("20250101_1_Secc.pdf"), output_path)
+
+    job = await boletines_module.get_process_task(task_id)
+    assert job["status"] == "completed"
+    assert job["text_file"] == "20250101_1_Secc.txt"
+    assert fakes.processed == [(Path("20250101_1_Secc.txt"), output_path)]
+
+
+@pytest.mark.asyncio
+async def test_process_job_records_failure(fakes):
+    """Errors end the job as failed with the message."""
+    fakes.fail = True
+    task_id = boletines_module._register_process_job("a.pdf", Path("a.jsonl"))
+
+    await boletines_module._process_and_analyze(task_id, Path("a.pdf"), Path("a.jsonl"))
+
+    job = boletines_module._process_jobs[task_id]
+    assert job["status"] == "failed"
+    assert job["error"] == "Gemini no disponible"
+
+
+@pytest.mark.asyncio
+async def test_process_job_evicted_before_start(fakes):
+    """A job dropped from the registry before it runs is skipped quietly."""
+    await boletines_module._process_and_analyze("missing", Path("a.pdf"), Path("a.jsonl"))
+
+    assert fakes.processed == []
+
+
+def test_register_process_job_keeps_registry_bounded(fakes, monkeypatch):
+    """The oldest jobs are evicted past _MAX_PROCESS_JOBS."""
+    monkeypatch.setattr(boletines_module, "_MAX_PROCESS_JOBS", 2)
+    first = boletines_module._register_process_job("a.pdf", Path("a.jsonl"))
+    boletines_module._register_process_job("b.pdf", Path("b.jsonl"))
+    boletines_module._register_process_job("c.pdf", Path("c.jsonl"))
+
+    assert len(boletines_module._process_jobs) == 2
+    assert first not in boletines_module._process_jobs
+
+
+@pytest.mark.asyncio
+async def test_process_batch_queues_pollable_jobs(fakes):
+    """Each converted PDF gets a job; conversion errors are reported inline."""
+    background_tasks = BackgroundTasks()
+
+    response = await boletines_module.process_batch(
+        ["20250101_1_Secc.pdf", "broken.pdf"], background_tasks
+    )
+    ok, error = response["results"]
+    assert error == {"filename": "broken.pdf", "status": "error", "error": "PDF ilegible"}
+    assert ok["status"] == "processing"
+
+    await background_tasks()
+
+    job = await boletines_module.get_process_task(ok["task_id"])
+    assert job["status"] == "completed"
+    assert fakes.processed == [(Path("20250101_1_Secc.txt"), Path(ok["output_file"]))]
@@ -0,0 +1,88 @@
+"""
+Unit tests for the boletin listing queries of app.db.crud.
+"""
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app.db import crud
+
+# (filename, date, status)
+BOLETINES = [
+    ("20250101_1_Secc.pdf", "20250101", "completed"),
+    ("20250102_1_Secc.pdf", "20250102", "pending"),
+    ("20250103_1_Secc.pdf", "20250103", "completed"),
+    ("20250201_1_Secc.pdf", "20250201", "failed"),
+    ("20250202_1_Secc.pdf", "20250202", "completed"),
+    ("unknown_1_Secc.pdf", "unknown", "pending"),
+    ("no_date_1_Secc.pdf", None, "completed"),
+]
+
+
+@pytest.fixture
+async def seeded_session(sqlite_session_maker, seed_boletines):
+    """Session with the boletines of BOLETINES, all in one jurisdiction."""
+    await seed_boletines(
+        {"filename": filename, "date": date, "section": "1", "status": status}
+        for filename, date, status in BOLETINES
+    )
+
+    # Sesión nueva: nada queda cargado en el identity map
+    async with sqlite_session_maker() as db:
+        yield db
+
+
+@pytest.mark.asyncio
+async def test_get_boletines_returns_page_and_total(seeded_session):
+    """The total counts every boletin, not only the page."""
+    boletines, total = await crud.get_boletines(seeded_session, skip=2, limit=3)
+
+    assert total == len(BOLETINES)
+    assert [b.filename for b in boletines] == [b[0] for b in BOLETINES[2:5]]
+
+
+@pytest.mark.asyncio
+async def test_get_boletines_total_respects_status_filter(seeded_session):
+    """With a status filter, the total counts only matching boletines."""
+    boletines, total = await crud.get_boletines(seeded_session, limit=2, status="completed")
+
+    assert total == 4
+    assert [b.filename for b in boletines] == ["20250101_1_Secc.pdf", "20250103_1_Secc.pdf"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, expected_total", [(None, len(BOLETINES)), ("pending", 2)])
+async def test_get_boletines_out_of_range_page_keeps_total(seeded_session, status, expected_total):
+    """A page past the end is empty but still reports the total."""
+    boletines, total = await crud.get_boletines(seeded_session, skip=100, limit=10, status=status)
+
+    assert boletines == []
+    assert total == expected_total
+
+
+@pytest.mark.asyncio
+async def test_get_boletines_empty_table(sqlite_session_maker):
+    """No boletines: empty page and zero total."""
+    async with sqlite_session_maker() as db:
+        assert await crud.get_boletines(db) == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_get_boletines_loads_jurisdiccion_only(seeded_session):
+    """jurisdiccion comes with the page; other relationships are not loaded."""
+    boletines, _ = await crud.get_boletines(seeded_session, limit=1)
+
+    assert boletines[0].jurisdiccion.nombre == "Provincia de Córdoba"
+    with pytest.raises(InvalidRequestError):
+        _ = boletines[0].analisis
+
+
+@pytest.mark.asyncio
+async def test_get_monthly_status_counts(seeded_session):
+    """Counts per month and status, skipping boletines without a usable date."""
+    counts = await crud.get_monthly_status_counts(seeded_session)
+
+    assert counts == [
+        {"month": "202501", "total": 3, "completed": 2, "pending": 1, "failed": 0, "processing": 0},
+        {"month": "202502", "total": 2, "completed": 1, "pending": 0, "failed": 1, "processing": 0},
+    ]
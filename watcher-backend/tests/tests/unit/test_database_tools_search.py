@@ -0,0 +1,87 @@
+"""
+Unit tests for DatabaseTools.search_by_entity on SQLite.
+"""
+
+import pytest
+
+import agents.tools.analysis_tools as analysis_tools_module
+from agents.tools.database_tools import DatabaseTools
+
+BENEFICIARIES = [
+    ["CÓRDOBA OBRAS SA", "Juan Pérez"],
+    ["Municipalidad de Córdoba"],
+    ["ÑANDÚ SRL", 1234],
+    ["Acme SA"],
+    [],
+]
+
+
+@pytest.fixture
+async def seeded_session(sqlite_session_maker, seed_analysis_results):
+    """Session with one analysis result per entry of BENEFICIARIES."""
+    await seed_analysis_results(
+        [
+            {"transparency_score": 50.0, "risk_level": "low",
+             "extracted_entities": {"beneficiaries": beneficiaries}}
+            for beneficiaries in BENEFICIARIES
+        ]
+        # Entidades que no son lista: no deben coincidir ni romper la búsqueda
+        + [{"extracted_entities": {"beneficiaries": "córdoba"}}]
+    )
+
+    async with sqlite_session_maker() as db:
+        yield db
+
+
+def _filenames(results):
+    return sorted(r["document_filename"] for r in results)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("json_functions", [True, False])
+async def test_search_by_entity_folds_non_ascii_case(seeded_session, monkeypatch, json_functions):
+    """'córdoba' matches 'CÓRDOBA' and 'Córdoba', with or without JSON1."""
+    monkeypatch.setattr(analysis_tools_module, "_sqlite_has_json_functions", lambda: json_functions)
+
+    results = await DatabaseTools.search_by_entity(seeded_session, "beneficiaries", "córdoba")
+
+    assert _filenames(results) == ["20250100_1_Secc.pdf", "20250101_1_Secc.pdf"]
+
+    results = await DatabaseTools.search_by_entity(seeded_session, "beneficiaries", "ñandú")
+    assert _filenames(results) == ["20250102_1_Secc.pdf"]
+    assert results[0]["entities_found"] == ["ÑANDÚ SRL", 1234]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("json_functions", [True, False])
+async def test_search_by_entity_skips_non_list_entities(seeded_session, monkeypatch, json_functions):
+    """A string value is not searched character by character."""
+    monkeypatch.setattr(analysis_tools_module, "_sqlite_has_json_functions", lambda: json_functions)
+
+    results = await DatabaseTools.search_by_entity(seeded_session, "beneficiaries", "r")
+
+    assert _filenames(results) == [
+        "20250100_1_Secc.pdf", "20250101_1_Secc.pdf", "20250102_1_Secc.pdf"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_by_entity_matches_non_string_entities(seeded_session):
+    """Non-string entities are compared through their string form."""
+    results = await DatabaseTools.search_by_entity(seeded_session, "beneficiaries", "123")
+
+    assert _filenames(results) == ["20250102_1_Secc.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_search_by_entity_respects_limit(seeded_session):
+    """At most `limit` documents are returned."""
+    results = await DatabaseTools.search_by_entity(seeded_session, "beneficiaries", "a", limit=2)
+
+    assert len(results) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_by_entity_unknown_type(seeded_session):
+    """Unknown entity types return no results."""
+    assert await DatabaseTools.search_by_entity(seeded_session, "unknown", "a") == []
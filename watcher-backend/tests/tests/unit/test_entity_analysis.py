@@ -0,0 +1,121 @@
+"""
+Unit tests for AnalysisTools.get_entity_analysis.
+
+The SQL aggregation (json_each), the numba kernel and the pure-Python
+fallback must return the same output.
+"""
+
+import pytest
+
+import agents.tools.analysis_tools as analysis_tools_module
+from agents.tools import _entity_kernels
+from agents.tools.analysis_tools import AnalysisTools
+
+
+# (document index, transparency score, risk level, beneficiaries)
+RESULTS = [
+    (0, 80.0, "high", ["Acme SA", "Beta SRL", "Acme SA"]),
+    (1, 40.5, "low", ["Acme SA", "Gamma SA", 1234, 99]),
+    (1, None, "high", ["Beta SRL", "Delta SA", 99, 1.5]),
+    (2, 60.25, "medium", ["Gamma SA", "Beta SRL", "CÓRDOBA OBRAS"]),
+    (3, 20.0, "high", ["Delta SA", "Acme SA", 1234]),
+    (3, 90.0, "low", "Acme SA"),
+    (4, 70.0, "low", []),
+]
+
+
+@pytest.fixture
+async def seeded_session(sqlite_session_maker, seed_analysis_results):
+    """Session with the analysis results of RESULTS."""
+    await seed_analysis_results(
+        [
+            {"document": doc_index, "transparency_score": score, "risk_level": risk_level,
+             "extracted_entities": {"beneficiaries": beneficiaries, "amounts": [100]}}
+            for doc_index, score, risk_level, beneficiaries in RESULTS
+        ]
+        # Resultado sin entidades: se ignora
+        + [{"document": 4, "transparency_score": 10.0, "risk_level": "high"}]
+    )
+
+    async with sqlite_session_maker() as db:
+        yield db
+
+
+def _expected():
+    """Hand-computed aggregation of RESULTS for beneficiaries."""
+    return [
+        {"entity": "Acme SA", "frequency": 4, "avg_transparency_score": (80.0 * 2 + 40.5 + 20.0) / 4,
+         "num_documents": 3, "high_risk_appearances": 3},
+        {"entity": "Beta SRL", "frequency": 3, "avg_transparency_score": (80.0 + 0 + 60.25) / 3,
+         "num_documents": 3, "high_risk_appearances": 2},
+        {"entity": "1234", "frequency": 2, "avg_transparency_score": (40.5 + 20.0) / 2,
+         "num_documents": 2, "high_risk_appearances": 1},
+        {"entity": "99", "frequency": 2, "avg_transparency_score": 40.5 / 2,
+         "num_documents": 1, "high_risk_appearances": 1},
+        {"entity": "Delta SA", "frequency": 2, "avg_transparency_score": 20.0 / 2,
+         "num_documents": 2, "high_risk_appearances": 2},
+        {"entity": "Gamma SA", "frequency": 2, "avg_transparency_score": (40.5 + 60.25) / 2,
+         "num_documents": 2, "high_risk_appearances": 0},
+        {"entity": "1.5", "frequency": 1, "avg_transparency_score": 0.0,
+         "num_documents": 1, "high_risk_appearances": 1},
+        {"entity": "CÓRDOBA OBRAS", "frequency": 1, "avg_transparency_score": 60.25,
+         "num_documents": 1, "high_risk_appearances": 0},
+    ]
+
+
+@pytest.fixture(params=["sql", "numba", "python"])
+def aggregation_path(request, monkeypatch):
+    """Forces one of the three aggregation paths."""
+    if request.param == "sql":
+        if not analysis_tools_module._sqlite_has_json_functions():
+            pytest.skip("SQLite without JSON1")
+        return request.param
+
+    monkeypatch.setattr(analysis_tools_module, "_sqlite_has_json_functions", lambda: False)
+    if request.param == "numba":
+        if not _entity_kernels.NUMBA_AVAILABLE:
+            pytest.skip("numba not installed")
+    else:
+        monkeypatch.setattr(_entity_kernels, "NUMBA_AVAILABLE", False)
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_entity_analysis_matches_expected(seeded_session, aggregation_path):
+    """Every path returns the same counts, averages and tie order."""
+    result = await AnalysisTools.get_entity_analysis(seeded_session, "beneficiaries")
+
+    assert result == _expected()
+
+
+@pytest.mark.asyncio
+async def test_entity_analysis_returns_plain_python_types(seeded_session, aggregation_path):
+    """Numbers come back as int/float, never numpy scalars."""
+    result = await AnalysisTools.get_entity_analysis(seeded_session, "beneficiaries")
+
+    for entity in result:
+        assert type(entity["frequency"]) is int
+        assert type(entity["num_documents"]) is int
+        assert type(entity["high_risk_appearances"]) is int
+        assert type(entity["avg_transparency_score"]) is float
+
+
+@pytest.mark.asyncio
+async def test_entity_analysis_limits_to_top_50(sqlite_session_maker, seed_analysis_results,
+                                                aggregation_path):
+    """Only the 50 most frequent entities are returned."""
+    await seed_analysis_results([{
+        "transparency_score": 50.0, "risk_level": "low",
+        "extracted_entities": {"organisms": [f"Organismo {i:02d}" for i in range(60)]}
+    }])
+
+    async with sqlite_session_maker() as db:
+        result = await AnalysisTools.get_entity_analysis(db, "organisms")
+
+    assert [e["entity"] for e in result] == [f"Organismo {i:02d}" for i in range(50)]
+
+
+@pytest.mark.asyncio
+async def test_entity_analysis_unknown_type(seeded_session):
+    """Entity types outside ENTITY_TYPES return no results."""
+    assert await AnalysisTools.get_entity_analysis(seeded_session, "unknown") == []
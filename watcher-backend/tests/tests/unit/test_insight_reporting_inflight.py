@@ -0,0 +1,77 @@
+"""
+Unit tests for InsightReportingAgent in-flight request deduplication.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agents.insight_reporting.agent as insight_module
+from agents.insight_reporting.agent import InsightReportingAgent
+from agents.tools.rate_limited_model import RateLimitedModel
+from app.core.agent_config import InsightReportingConfig
+
+
+class CountingModel:
+    """Fake Gemini model that counts calls and answers slowly."""
+
+    model_name = "fake-model"
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return SimpleNamespace(text="respuesta", usage_metadata=None)
+
+
+@pytest.fixture
+def agent_with_fake_model(monkeypatch):
+    """Agent wired to a counting fake model (no Google API needed)."""
+    monkeypatch.setattr(insight_module, "GOOGLE_AI_AVAILABLE", False)
+    monkeypatch.setattr(
+        insight_module, "genai",
+        SimpleNamespace(types=SimpleNamespace(GenerationConfig=lambda **kwargs: kwargs))
+    )
+    config = InsightReportingConfig(use_vector_db=False, enable_response_cache=False)
+    agent = InsightReportingAgent(config)
+    fake = CountingModel()
+    agent.model = RateLimitedModel(fake)
+    return agent, fake
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_share_one_model_call(agent_with_fake_model):
+    """Two concurrent identical queries trigger a single generate_content."""
+    agent, fake = agent_with_fake_model
+    context = {"periodo": "2025-08"}
+
+    first, second = await asyncio.gather(
+        agent.answer_query("¿Cuántos documentos hay?", context),
+        agent.answer_query("¿Cuántos documentos hay?", context),
+    )
+
+    assert fake.calls == 1
+    assert first["success"] and second["success"]
+    assert first["response"] == second["response"] == "respuesta"
+    assert not agent._inflight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_different_queries_are_not_deduplicated(agent_with_fake_model):
+    """Different queries each reach the model."""
+    agent, fake = agent_with_fake_model
+
+    await asyncio.gather(
+        agent.answer_query("¿Cuántos documentos hay?"),
+        agent.answer_query("¿Cuál es el riesgo promedio?"),
+    )
+
+    assert fake.calls == 2
@@ -0,0 +1,62 @@
+"""
+Unit tests for the closed-period aggregate cache of AnalysisTools.
+"""
+
+import agents.tools.analysis_tools as analysis_tools_module
+from agents.tools.analysis_tools import AnalysisTools, PeriodCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_period_cache_entries_expire_after_ttl(monkeypatch):
+    """Entries are served until the TTL elapses, then dropped."""
+    clock = FakeClock()
+    monkeypatch.setattr(analysis_tools_module.time, "monotonic", clock.monotonic)
+    cache = PeriodCache(maxsize=4, ttl_seconds=60)
+
+    cache.set(("period_stats", 2024, 1), {"total_documents": 10})
+    clock.now += 59
+    assert cache.get(("period_stats", 2024, 1)) == {"total_documents": 10}
+
+    clock.now += 2
+    assert cache.get(("period_stats", 2024, 1)) is None
+    assert len(cache) == 0
+
+
+def test_period_cache_returns_copies():
+    """Mutating a returned value does not change the cached one."""
+    cache = PeriodCache()
+    cache.set(("summary", 2024, 1), {"top": [1, 2]})
+
+    value = cache.get(("summary", 2024, 1))
+    value["top"].append(3)
+
+    assert cache.get(("summary", 2024, 1)) == {"top": [1, 2]}
+
+
+def test_period_cache_evicts_least_recently_used():
+    """The cache keeps at most `maxsize` entries."""
+    cache = PeriodCache(maxsize=2)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    cache.get(("a",))
+    cache.set(("c",), 3)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    assert cache.get(("c",)) == 3
+
+
+def test_invalidate_period_cache_clears_entries():
+    """invalidate_period_cache drops every cached aggregate."""
+    AnalysisTools._period_cache.set(("period_stats", 2020, 1), {"total_documents": 1})
+
+    AnalysisTools.invalidate_period_cache()
+
+    assert len(AnalysisTools._period_cache) == 0
@@ -0,0 +1,93 @@
+"""
+Unit tests for RateLimitedModel streaming.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from agents.tools.rate_limited_model import RateLimitedModel
+
+
+class StreamingModel:
+    """Fake Gemini model; with stream=True yields chunks lazily."""
+
+    model_name = "fake-model"
+
+    def __init__(self, chunks=("uno ", "dos ", "tres")):
+        self.chunks = chunks
+        self.chunk_threads = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if not stream:
+            return SimpleNamespace(text="".join(self.chunks), usage_metadata=None)
+        return self._stream()
+
+    def _stream(self):
+        for text in self.chunks:
+            self.chunk_threads.append(threading.current_thread().name)
+            yield SimpleNamespace(text=text)
+
+
+def _free_slots(model: RateLimitedModel) -> int:
+    return model._semaphore._value
+
+
+@pytest.mark.asyncio
+async def test_stream_holds_concurrency_slot_until_exhausted():
+    """The slot stays taken while chunks are read, and is freed at the end."""
+    model = RateLimitedModel(StreamingModel(), max_concurrent=2)
+
+    texts = []
+    async for chunk in model.generate_content_stream_async("hola"):
+        texts.append(chunk.text)
+        assert _free_slots(model) == 1
+
+    assert texts == ["uno ", "dos ", "tres"]
+    assert _free_slots(model) == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_reads_chunks_on_model_executor():
+    """Chunks are pulled on the model's own executor, not the default one."""
+    fake = StreamingModel()
+    model = RateLimitedModel(fake)
+
+    async for _ in model.generate_content_stream_async("hola"):
+        pass
+
+    assert fake.chunk_threads
+    assert all(name.startswith("rate-limited-model") for name in fake.chunk_threads)
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_early_releases_slot():
+    """Stopping after the first chunk frees the slot when the stream closes."""
+    model = RateLimitedModel(StreamingModel(), max_concurrent=1)
+
+    stream = model.generate_content_stream_async("hola")
+    await stream.__anext__()
+    assert _free_slots(model) == 0
+    await stream.aclose()
+
+    assert _free_slots(model) == 1
+
+
+@pytest.mark.asyncio
+async def test_open_stream_bounds_concurrent_calls():
+    """With one slot, a regular call waits for the open stream to finish."""
+    model = RateLimitedModel(StreamingModel(), max_concurrent=1)
+
+    stream = model.generate_content_stream_async("hola")
+    await stream.__anext__()
+    call = asyncio.ensure_future(model.generate_content_async("chau"))
+    await asyncio.sleep(0.2)
+    assert not call.done()
+
+    async for _ in stream:
+        pass
+    response = await asyncio.wait_for(call, timeout=5)
+
+    assert response.text == "uno dos tres"
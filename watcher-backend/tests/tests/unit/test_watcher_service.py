@@ -0,0 +1,58 @@
+"""
+Unit tests for WatcherService.process_file.
+"""
+
+import json
+
+import pytest
+
+from app.services.watcher_service import WatcherService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """WatcherService without API key, with a fake fragment analysis."""
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    service = WatcherService()
+    calls = []
+
+    async def analyze_fragment(content, metadata):
+        calls.append(metadata)
+        return {
+            "actos": [{"tipo_acto": "decreto", "numero": f"{metadata['fragment_number']}/2025"}],
+            "resumen_general": "resumen",
+            "model_used": "fake-model"
+        }
+
+    monkeypatch.setattr(service, "analyze_fragment", analyze_fragment)
+    service.calls = calls
+    return service
+
+
+@pytest.mark.asyncio
+async def test_process_file_writes_one_acto_per_line(service, tmp_path):
+    """Each extracted acto is a JSONL line in the output file."""
+    input_path = tmp_path / "20250101_1_Secc.txt"
+    input_path.write_text("DECRETO 1/2025. Se designa a Juan Pérez.", encoding="utf-8")
+    output_path = tmp_path / "results" / "20250101_1_Secc_analysis.jsonl"
+
+    result = await service.process_file(input_path, output_path)
+
+    assert result == output_path
+    lines = output_path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["numero"] for line in lines] == ["1/2025"]
+    assert service.calls[0]["boletin"] == "20250101_1_Secc"
+    assert service.calls[0]["section_type"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_process_file_respects_max_fragments(service, tmp_path):
+    """Only the first `max_fragments` fragments are analyzed."""
+    input_path = tmp_path / "boletin.txt"
+    input_path.write_text("Artículo de prueba.\n\n" * 20000, encoding="utf-8")
+    output_path = tmp_path / "boletin_analysis.jsonl"
+
+    await service.process_file(input_path, output_path, max_fragments=2)
+
+    assert len(service.calls) == 2
+    assert len(output_path.read_text(encoding="utf-8").splitlines()) == 2
@@ -52,7 +52,7 @@ async def analyze_document_with_redflags(
             )
             
             flag_dict = asdict(flag)
-            flag_dict['visual_evidence'] = evidence_data
+            flag_dict['visual_evidence'] = evidence_data.to_dict()
             enhanced_flags.append(flag_dict)
         
         # Resultado enriquecido
@@ -153,6 +153,22 @@ class WatcherDetectionAgent:
         
         return flags
     
+    def analyze_consistency(self, document_data: Dict) -> List[RedFlag]:
+        """
+        Ejecuta solo el chequeo de inconsistencia de clasificación (falso
+        positivo potencial), el único que aplica a documentos limpios
+        """
+        doc_id = document_data.get('filename', 'unknown')
+        
+        try:
+            fp_analysis = self.fp_detector.analyze_single_case(pd.Series(document_data))
+            if fp_analysis.is_false_positive:
+                return [self._create_inconsistency_flag(document_data, fp_analysis)]
+        except Exception as e:
+            logger.error(f"Error analizando consistencia de {doc_id}: {e}")
+        
+        return []
+    
     def _create_transparency_flag(self, doc_data: Dict, score: float) -> RedFlag:
         """
         Crea red flag por transparencia crítica
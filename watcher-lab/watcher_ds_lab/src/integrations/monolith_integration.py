@@ -19,6 +19,10 @@ from agents.detection_agent import WatcherDetectionAgent, RedFlag
 
 logger = logging.getLogger(__name__)
 
+# Umbrales del pre-filtro de documentos limpios en la sincronización
+CLEAN_TRANSPARENCY_MIN = 80
+CLEAN_MAX_AMOUNTS = 5
+
 @dataclass
 class MonolithConfig:
     """Configuración para la integración con el monolito"""
@@ -99,7 +103,7 @@ async def analyze_document_with_redflags(
             )
             
             flag_dict = asdict(flag)
-            flag_dict['visual_evidence'] = evidence_data
+            flag_dict['visual_evidence'] = evidence_data.to_dict()
             enhanced_flags.append(flag_dict)
         
         # Resultado enriquecido
@@ -507,8 +511,14 @@ export default AnalyzerPage;
             
             df = pd.read_csv(data_files[0])
             
-            # Analizar todos los documentos para obtener red flags
-            report = self.agent.analyze_dataset(df)
+            # Pre-filtro vectorizado: documentos claramente limpios solo pueden
+            # generar la red flag INCONSISTENCIA_CLASIFICACION (INFORMATIVO), así
+            # que se omiten del scoring completo y solo se les aplica ese chequeo
+            clean_mask = self._clean_documents_mask(df)
+            suspects = df[~clean_mask]
+            
+            # Analizar solo los documentos sospechosos para obtener red flags
+            report = self.agent.analyze_dataset(suspects)
             
             # Estructura para sincronización
             sync_data = {
@@ -519,20 +529,24 @@ export default AnalyzerPage;
                     if 'CRITICO' in doc['severities']
                 ],
                 "sync_timestamp": pd.Timestamp.now().isoformat(),
+                "clean_documents": [],
                 "red_flags_by_document": {}
             }
             
-            # Procesar cada documento
-            for _, row in df.iterrows():
+            # Procesar cada documento sospechoso
+            for _, row in suspects.iterrows():
                 doc_id = row['filename']
                 red_flags = self.agent.analyze_document(row.to_dict())
-                
-                sync_data['red_flags_by_document'][doc_id] = {
-                    "red_flags_count": len(red_flags),
-                    "critical_count": len([f for f in red_flags if f.severity == 'CRITICO']),
-                    "high_count": len([f for f in red_flags if f.severity == 'ALTO']),
-                    "flags": [asdict(flag) for flag in red_flags]
-                }
+                sync_data['red_flags_by_document'][doc_id] = self._summarize_flags(red_flags)
+            
+            # Documentos limpios: solo el chequeo de consistencia de clasificación
+            for _, row in df[clean_mask].iterrows():
+                doc_id = row['filename']
+                red_flags = self.agent.analyze_consistency(row.to_dict())
+                if red_flags:
+                    sync_data['red_flags_by_document'][doc_id] = self._summarize_flags(red_flags)
+                else:
+                    sync_data['clean_documents'].append(doc_id)
             
             # Guardar datos de sincronización
             sync_file = BASE_DIR / "reports" / "monolith_sync.json"
@@ -547,6 +561,33 @@ export default AnalyzerPage;
             logger.error(f"Error en sincronización: {e}")
             return {"error": str(e)}
     
+    @staticmethod
+    def _summarize_flags(red_flags: List[RedFlag]) -> Dict[str, any]:
+        """
+        Resume las red flags de un documento para el archivo de sincronización
+        """
+        return {
+            "red_flags_count": len(red_flags),
+            "critical_count": len([f for f in red_flags if f.severity == 'CRITICO']),
+            "high_count": len([f for f in red_flags if f.severity == 'ALTO']),
+            "flags": [asdict(flag) for flag in red_flags]
+        }
+    
+    @staticmethod
+    def _clean_documents_mask(df: pd.DataFrame) -> pd.Series:
+        """
+        Marca documentos claramente limpios (transparencia alta, pocos montos,
+        sin riesgo alto ni anomalía ML) para excluirlos del análisis completo
+        """
+        mask = (
+            (df['transparency_score'] >= CLEAN_TRANSPARENCY_MIN)
+            & (df['num_amounts'] < CLEAN_MAX_AMOUNTS)
+            & (df['risk_level'] != 'ALTO')
+        )
+        if 'is_anomaly' in df.columns:
+            mask &= ~df['is_anomaly'].fillna(False).astype(bool)
+        return mask
+    
     def create_migration_script(self) -> str:
         """
         Crea script SQL para agregar red flags a la base de datos del monolito
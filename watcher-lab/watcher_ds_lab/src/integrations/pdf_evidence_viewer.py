@@ -5,20 +5,233 @@ Herramienta para extraer y visualizar evidencia de red flags directamente en PDF
 
 import re
 import logging
-import pdfplumber
+import functools
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, NamedTuple
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterator, List, Optional, Tuple, NamedTuple
+from dataclasses import dataclass, field
 import json
 import sys
+from urllib.parse import urlencode
 
-# Imports locales
-sys.path.append(str(Path(__file__).parent.parent.parent))
-from agents.detection_agent import RedFlag
+import numpy as np
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+    fitz = None
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+    pdfplumber = None
+
+# RedFlag solo se usa en anotaciones: sin costo de import en runtime
+if TYPE_CHECKING:
+    from agents.detection_agent import RedFlag
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Patrones estáticos compilados una sola vez al importar el módulo
+_NUMBER_RE = re.compile(r'\d+(?:\.\d{3})*(?:,\d{2})?')
+_CAPS_RE = re.compile(r'\b[A-Z]{2,}\b')
+
+# Keywords de búsqueda por tipo de red flag
+_FLAG_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    'TRANSPARENCIA_CRITICA': (
+        'urgencia', 'emergencia', 'excepcional', 'directa',
+        'sin licitación', 'contratación directa'
+    ),
+    'MONTO_SOSPECHOSO': (
+        '$', 'pesos', 'monto', 'valor', 'precio', 'costo',
+        'adjudicación', 'subsidio', 'transferencia'
+    ),
+    'ANOMALIA_ML': (
+        'irregular', 'inusual', 'excepcional', 'atípico'
+    ),
+    'PATRON_SECCION_INUSUAL': (
+        'notificación', 'convocatoria', 'citación'
+    ),
+    'PATRON_ENTIDADES_OPACO': (
+        'cooperativa', 'empresa', 'sociedad', 'fundación',
+        'asociación', 'beneficiario', 'contratista'
+    ),
+    'INCONSISTENCIA_CLASIFICACION': (
+        'licitación pública', 'concurso', 'transparencia',
+        'proceso regular', 'marco legal'
+    ),
+}
+
+# Evidencia suficiente por red flag: al alcanzar ambos topes se deja de
+# recorrer páginas (el visor usa 5 coordenadas y el reporte 10)
+MAX_COORDS = 20
+MAX_HIGHLIGHTS = 10
+
+# Puntuación que puede preceder a una keyword dentro de una palabra del PDF
+_LEADING_PUNCT = '$(["\'«¿¡'
+
+class _KeywordMatcher(NamedTuple):
+    """Keywords de una red flag precompiladas para el matching por palabra"""
+    pattern: re.Pattern
+    terms: FrozenSet[str]
+    prefixes: FrozenSet[str]
+    
+    def matches_word(self, word_text: str) -> bool:
+        """
+        True si la palabra (en minúsculas) es o comienza con alguna keyword.
+        
+        El set de prefijos de 2 caracteres descarta en O(1) la gran mayoría
+        de palabras antes de llegar al regex.
+        """
+        if word_text in self.terms:
+            return True
+        stripped = word_text.lstrip(_LEADING_PUNCT)
+        if stripped[:2] not in self.prefixes:
+            return False
+        return self.pattern.match(stripped) is not None
+
+def _compile_keywords(keywords: List[str]) -> _KeywordMatcher:
+    """
+    Compila las keywords en una única alternación (las más largas primero)
+    y arma el set de términos para matching exacto de palabras sueltas,
+    incluyendo los tokens de keywords compuestas (p.ej. 'sin licitación')
+    """
+    ordered = sorted(keywords, key=len, reverse=True)
+    keyword_re = re.compile('|'.join(map(re.escape, ordered)), re.IGNORECASE)
+    
+    terms = set(keywords)
+    for keyword in keywords:
+        terms.update(token for token in keyword.split() if len(token) > 2)
+    
+    prefixes = frozenset(keyword[:2] for keyword in keywords)
+    
+    return _KeywordMatcher(keyword_re, frozenset(terms), prefixes)
+
+# Palabra con su bounding box: (x0, top, x1, bottom, text)
+WordBox = Tuple[float, float, float, float, str]
+
+# Página parseada: (page_num, page_text, words, total_pages)
+ParsedPage = Tuple[int, str, List[WordBox], int]
+
+class _PDFBackend(ABC):
+    """Interfaz común de extracción de texto + coordenadas por página"""
+    
+    name = ""
+    
+    @abstractmethod
+    def iter_pages(self, path: Path) -> Iterator[ParsedPage]:
+        """Páginas del PDF como `ParsedPage`, en orden"""
+
+
+class PyMuPDFBackend(_PDFBackend):
+    """
+    Backend sobre PyMuPDF (motor MuPDF en C): texto y coordenadas en código nativo
+    """
+    
+    name = "pymupdf"
+    
+    def iter_pages(self, path: Path) -> Iterator[ParsedPage]:
+        with fitz.open(str(path)) as doc:
+            total_pages = doc.page_count
+            for page_num, page in enumerate(doc, 1):
+                # get_text("words") -> (x0, y0, x1, y1, text, block, line, wno)
+                words = [w[:5] for w in page.get_text("words")]
+                yield page_num, page.get_text(), words, total_pages
+
+
+class PdfPlumberBackend(_PDFBackend):
+    """
+    Backend sobre pdfplumber (pdfminer.six, Python puro); fallback
+    """
+    
+    name = "pdfplumber"
+    
+    def iter_pages(self, path: Path) -> Iterator[ParsedPage]:
+        with pdfplumber.open(path) as pdf:
+            total_pages = len(pdf.pages)
+            for page_num, page in enumerate(pdf.pages, 1):
+                # Parsear la página una sola vez: los chars quedan cacheados
+                # y tanto words como text se derivan de ellos
+                _ = page.chars
+                words = self._extract_page_words(page, page_num)
+                yield page_num, page.extract_text() or "", words, total_pages
+    
+    def _extract_page_words(self, page, page_num: int) -> List[WordBox]:
+        """
+        Extrae las palabras de una página con sus coordenadas (atributos mínimos)
+        """
+        try:
+            return [
+                (w['x0'], w['top'], w['x1'], w['bottom'], w['text'])
+                for w in page.extract_words(use_text_flow=False, extra_attrs=[])
+            ]
+        except Exception as e:
+            logger.warning(f"Error extrayendo palabras de página {page_num}: {e}")
+            return []
+
+_BACKENDS = {
+    PyMuPDFBackend.name: (PyMuPDFBackend, PYMUPDF_AVAILABLE),
+    PdfPlumberBackend.name: (PdfPlumberBackend, PDFPLUMBER_AVAILABLE),
+}
+
+def _resolve_backend(backend: Optional[str]) -> _PDFBackend:
+    """
+    Instancia el backend pedido, o el más rápido disponible si no se especifica
+    """
+    if backend is None:
+        backend = PyMuPDFBackend.name if PYMUPDF_AVAILABLE else PdfPlumberBackend.name
+    
+    if backend not in _BACKENDS:
+        raise ValueError(f"Backend PDF desconocido: {backend}")
+    
+    backend_cls, available = _BACKENDS[backend]
+    if not available:
+        raise ImportError(
+            f"Backend PDF '{backend}' no disponible. "
+            "Instalar con: pip install pymupdf pdfplumber"
+        )
+    return backend_cls()
+
+@functools.lru_cache(maxsize=16)
+def _parse_pdf(backend_name: str, path_str: str, mtime: float,
+               cache_dir: Optional[str] = None) -> Tuple[ParsedPage, ...]:
+    """
+    Parsea un PDF completo y cachea sus páginas en memoria (LRU por ruta+mtime).
+    
+    Si se indica cache_dir, además persiste el parseo en disco bajo el md5
+    del contenido del PDF, para reutilizarlo entre sesiones.
+    """
+    path = Path(path_str)
+    cache_file = None
+    
+    if cache_dir is not None:
+        pdf_hash = hashlib.md5(path.read_bytes()).hexdigest()
+        cache_file = Path(cache_dir) / f"{pdf_hash}_{backend_name}.json"
+        if cache_file.exists():
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return tuple(
+                    (page_num, page_text, [tuple(w) for w in words], total_pages)
+                    for page_num, page_text, words, total_pages in json.load(f)
+                )
+    
+    pages = tuple(_resolve_backend(backend_name).iter_pages(path))
+    
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(pages, f, ensure_ascii=False)
+    
+    return pages
+
+@dataclass(slots=True, frozen=True)
 class EvidenceCoordinate:
     """Coordenada de evidencia en PDF"""
     page: int
@@ -29,25 +242,144 @@ class EvidenceCoordinate:
     text: str
     context: str
 
-@dataclass 
+@dataclass(eq=False)
+class CoordBatch:
+    """
+    Coordenadas de evidencia en layout columnar (SoA): arrays NumPy para la
+    geometría y listas para el texto. Las EvidenceCoordinate se materializan
+    solo al indexar/iterar.
+    
+    La geometría se guarda en float64 para que `tolist()` devuelva los mismos
+    floats que PyMuPDF (float32 agrega ruido: 63.277 -> 63.277000427246094).
+    """
+    page: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    w: np.ndarray
+    h: np.ndarray
+    text: List[str]
+    context: List[str]
+    
+    @classmethod
+    def from_lists(cls, page: List[int], x: List[float], y: List[float],
+                   w: List[float], h: List[float],
+                   text: List[str], context: List[str]) -> "CoordBatch":
+        return cls(
+            page=np.asarray(page, dtype=np.int32),
+            x=np.asarray(x, dtype=np.float64),
+            y=np.asarray(y, dtype=np.float64),
+            w=np.asarray(w, dtype=np.float64),
+            h=np.asarray(h, dtype=np.float64),
+            text=text,
+            context=context
+        )
+    
+    @classmethod
+    def empty(cls) -> "CoordBatch":
+        return cls.from_lists([], [], [], [], [], [], [])
+    
+    @classmethod
+    def concat(cls, batches: List["CoordBatch"]) -> "CoordBatch":
+        if not batches:
+            return cls.empty()
+        return cls(
+            page=np.concatenate([b.page for b in batches]),
+            x=np.concatenate([b.x for b in batches]),
+            y=np.concatenate([b.y for b in batches]),
+            w=np.concatenate([b.w for b in batches]),
+            h=np.concatenate([b.h for b in batches]),
+            text=[t for b in batches for t in b.text],
+            context=[c for b in batches for c in b.context]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.text)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CoordBatch(
+                page=self.page[index], x=self.x[index], y=self.y[index],
+                w=self.w[index], h=self.h[index],
+                text=self.text[index], context=self.context[index]
+            )
+        return EvidenceCoordinate(
+            page=int(self.page[index]),
+            x=float(self.x[index]),
+            y=float(self.y[index]),
+            width=float(self.w[index]),
+            height=float(self.h[index]),
+            text=self.text[index],
+            context=self.context[index]
+        )
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def to_dicts(self) -> List[Dict]:
+        """
+        Coordenadas como lista de dicts (mismo formato que `asdict` de cada
+        EvidenceCoordinate), para serializar a JSON
+        """
+        return [
+            {
+                'page': page, 'x': x, 'y': y, 'width': w, 'height': h,
+                'text': text, 'context': context
+            }
+            for page, x, y, w, h, text, context in zip(
+                self.page.tolist(), self.x.tolist(), self.y.tolist(),
+                self.w.tolist(), self.h.tolist(), self.text, self.context
+            )
+        ]
+
+@dataclass(slots=True, frozen=True)
 class PDFEvidenceData:
     """Datos completos de evidencia en PDF"""
     red_flag_id: str
     document_path: str
-    coordinates: List[EvidenceCoordinate]
+    coordinates: CoordBatch
     highlighted_text: List[str]
     total_pages: int
     extraction_confidence: float
+    document_name: str = field(init=False)
+    
+    def __post_init__(self):
+        # Nombre de archivo del PDF, calculado una sola vez al construir
+        object.__setattr__(self, 'document_name', Path(self.document_path).name)
+    
+    def to_dict(self) -> Dict:
+        """
+        Evidencia serializable a JSON: usar en lugar de `asdict`, que dejaría
+        los arrays NumPy de `coordinates`
+        """
+        return {
+            'red_flag_id': self.red_flag_id,
+            'document_path': self.document_path,
+            'document_name': self.document_name,
+            # Página de la primera coordenada (referencia para el visor)
+            'page': int(self.coordinates.page[0]) if len(self.coordinates) else None,
+            'coordinates': self.coordinates.to_dicts(),
+            'highlighted_text': list(self.highlighted_text),
+            'total_pages': self.total_pages,
+            'extraction_confidence': self.extraction_confidence
+        }
 
 class PDFEvidenceViewer:
     """
     Extractor y visualizador de evidencia en PDFs para red flags
     """
     
-    def __init__(self):
-        logger.info("PDFEvidenceViewer inicializado")
+    def __init__(self, backend: Optional[str] = None, cache_dir: Optional[Path] = None):
+        """
+        Args:
+            backend: 'pymupdf' o 'pdfplumber'; por defecto PyMuPDF si está instalado
+            cache_dir: directorio opcional para cachear en disco los PDFs parseados
+        """
+        self.backend = _resolve_backend(backend)
+        self.cache_dir = cache_dir
+        logger.info(f"PDFEvidenceViewer inicializado (backend: {self.backend.name})")
     
-    def extract_evidence_coordinates(self, file_path: Path, red_flag: RedFlag) -> PDFEvidenceData:
+    def extract_evidence_coordinates(self, file_path: Path, red_flag: "RedFlag") -> PDFEvidenceData:
         """
         Extrae coordenadas exactas de evidencia para una red flag específica
         """
@@ -56,191 +388,211 @@ class PDFEvidenceViewer:
                 logger.warning(f"PDF no encontrado: {file_path}")
                 return self._create_empty_evidence(red_flag.id, str(file_path))
             
-            coordinates = []
-            highlighted_text = []
-            total_pages = 0
-            
-            # Extraer keywords de búsqueda basadas en el tipo de red flag
-            search_keywords = self._extract_search_keywords(red_flag)
-            
-            with pdfplumber.open(file_path) as pdf:
-                total_pages = len(pdf.pages)
-                
-                for page_num, page in enumerate(pdf.pages, 1):
-                    page_text = page.extract_text() or ""
-                    
-                    # Buscar evidencia en esta página
-                    page_coordinates = self._find_evidence_in_page(
-                        page, page_text, search_keywords, page_num
-                    )
-                    
-                    coordinates.extend(page_coordinates)
-                    
-                    # Extraer texto destacado
-                    page_highlights = self._extract_highlighted_text(
-                        page_text, search_keywords
-                    )
-                    highlighted_text.extend(page_highlights)
+            return self._extract_from_pages(
+                self._load_pages(file_path), file_path, red_flag
+            )
             
-            # Calcular confianza de extracción
-            confidence = self._calculate_extraction_confidence(
-                coordinates, highlighted_text, red_flag
+        except Exception as e:
+            logger.error(f"Error extrayendo evidencia de {file_path}: {e}")
+            return self._create_empty_evidence(red_flag.id, str(file_path))
+    
+    def _load_pages(self, file_path: Path) -> Tuple[ParsedPage, ...]:
+        """
+        Devuelve las páginas parseadas del PDF, reutilizando el cache si existe
+        """
+        return _parse_pdf(
+            self.backend.name,
+            str(file_path),
+            file_path.stat().st_mtime,
+            str(self.cache_dir) if self.cache_dir is not None else None
+        )
+    
+    def _extract_from_pages(self, pages, file_path: Path, red_flag: "RedFlag") -> PDFEvidenceData:
+        """
+        Busca la evidencia de una red flag sobre páginas ya parseadas
+        """
+        page_batches = []
+        num_coords = 0
+        highlighted_text = []
+        total_pages = 0
+        
+        # Extraer keywords de búsqueda basadas en el tipo de red flag
+        search_keywords = self._extract_search_keywords(red_flag)
+        if not search_keywords:
+            return self._create_empty_evidence(red_flag.id, str(file_path))
+        
+        # Compilar todas las keywords en un único autómata de búsqueda
+        matcher = _compile_keywords(search_keywords)
+        
+        for page_num, page_text, words, total_pages in pages:
+            # Buscar evidencia en esta página
+            page_coordinates = self._find_evidence_in_page(
+                words, page_text, matcher, page_num
             )
             
-            return PDFEvidenceData(
-                red_flag_id=red_flag.id,
-                document_path=str(file_path),
-                coordinates=coordinates,
-                highlighted_text=highlighted_text,
-                total_pages=total_pages,
-                extraction_confidence=confidence
+            if len(page_coordinates):
+                page_batches.append(page_coordinates)
+                num_coords += len(page_coordinates)
+            
+            # Extraer texto destacado
+            page_highlights = self._extract_highlighted_text(
+                page_text, matcher.pattern
             )
+            highlighted_text.extend(page_highlights)
             
+            # Cortar apenas hay evidencia suficiente
+            if num_coords >= MAX_COORDS and len(highlighted_text) >= MAX_HIGHLIGHTS:
+                break
+        
+        coordinates = CoordBatch.concat(page_batches)
+        
+        # Calcular confianza de extracción
+        confidence = self._calculate_extraction_confidence(
+            coordinates, highlighted_text, red_flag
+        )
+        
+        return PDFEvidenceData(
+            red_flag_id=red_flag.id,
+            document_path=str(file_path),
+            coordinates=coordinates,
+            highlighted_text=highlighted_text,
+            total_pages=total_pages,
+            extraction_confidence=confidence
+        )
+    
+    def extract_document_evidence(self, file_path: Path,
+                                  red_flags: List["RedFlag"]) -> Dict[str, PDFEvidenceData]:
+        """
+        Extrae evidencia para todas las red flags de un mismo documento,
+        abriendo y parseando el PDF una sola vez
+        """
+        try:
+            pages = self._load_pages(file_path)
         except Exception as e:
             logger.error(f"Error extrayendo evidencia de {file_path}: {e}")
-            return self._create_empty_evidence(red_flag.id, str(file_path))
+            return {
+                flag.id: self._create_empty_evidence(flag.id, str(file_path))
+                for flag in red_flags
+            }
+        
+        results = {}
+        for red_flag in red_flags:
+            try:
+                results[red_flag.id] = self._extract_from_pages(pages, file_path, red_flag)
+            except Exception as e:
+                logger.error(f"Error extrayendo evidencia de {file_path}: {e}")
+                results[red_flag.id] = self._create_empty_evidence(red_flag.id, str(file_path))
+        
+        return results
     
-    def _extract_search_keywords(self, red_flag: RedFlag) -> List[str]:
+    def _extract_search_keywords(self, red_flag: "RedFlag") -> List[str]:
         """
         Extrae keywords de búsqueda basadas en el tipo de red flag
         """
         keywords = []
         
-        # Keywords por tipo de red flag
-        flag_keywords = {
-            'TRANSPARENCIA_CRITICA': [
-                'urgencia', 'emergencia', 'excepcional', 'directa',
-                'sin licitación', 'contratación directa'
-            ],
-            'MONTO_SOSPECHOSO': [
-                '$', 'pesos', 'monto', 'valor', 'precio', 'costo',
-                'adjudicación', 'subsidio', 'transferencia'
-            ],
-            'ANOMALIA_ML': [
-                'irregular', 'inusual', 'excepcional', 'atípico'
-            ],
-            'PATRON_SECCION_INUSUAL': [
-                'notificación', 'convocatoria', 'citación'
-            ],
-            'PATRON_ENTIDADES_OPACO': [
-                'cooperativa', 'empresa', 'sociedad', 'fundación',
-                'asociación', 'beneficiario', 'contratista'
-            ],
-            'INCONSISTENCIA_CLASIFICACION': [
-                'licitación pública', 'concurso', 'transparencia',
-                'proceso regular', 'marco legal'
-            ]
-        }
-        
         # Agregar keywords específicas del tipo
-        flag_type = red_flag.flag_type
-        if flag_type in flag_keywords:
-            keywords.extend(flag_keywords[flag_type])
+        keywords.extend(_FLAG_KEYWORDS.get(red_flag.flag_type, ()))
         
         # Agregar evidencia de la red flag
         for evidence in red_flag.evidence:
             # Extraer números (montos, fechas, etc.)
-            numbers = re.findall(r'\d+(?:\.\d{3})*(?:,\d{2})?', evidence)
+            numbers = _NUMBER_RE.findall(evidence)
             keywords.extend(numbers)
             
             # Extraer palabras clave (palabras en mayúsculas o entre comillas)
-            caps_words = re.findall(r'\b[A-Z]{2,}\b', evidence)
+            caps_words = _CAPS_RE.findall(evidence)
             keywords.extend(caps_words)
         
         # Limpiar y deduplicar
-        keywords = list(set([k.strip().lower() for k in keywords if len(k) > 2]))
+        # (orden determinístico: mismas keywords -> mismo patrón compilado)
+        keywords = sorted({k.strip().lower() for k in keywords if len(k) > 2})
         
         return keywords
     
-    def _find_evidence_in_page(self, page, page_text: str, keywords: List[str], 
-                              page_num: int) -> List[EvidenceCoordinate]:
+    def _find_evidence_in_page(self, words: List[WordBox], page_text: str,
+                              matcher: _KeywordMatcher,
+                              page_num: int) -> CoordBatch:
         """
         Encuentra coordenadas de evidencia en una página específica
         """
-        coordinates = []
+        xs, ys, ws, hs, texts, contexts = [], [], [], [], [], []
         
         try:
-            # Extraer palabras con sus coordenadas
-            words = page.extract_words()
+            # Bajar a minúsculas todas las palabras de la página de una vez
+            # (las keywords ya vienen en minúsculas de _extract_search_keywords)
+            lowered_words = [word[4].lower() for word in words]
+            page_text_lower = page_text.lower()
             
-            for word_info in words:
-                word_text = word_info.get('text', '').lower()
-                
-                # Verificar si la palabra coincide con alguna keyword
-                for keyword in keywords:
-                    if keyword in word_text or word_text in keyword:
-                        # Extraer contexto alrededor de la palabra
-                        context = self._extract_context(page_text, word_text, 100)
-                        
-                        coord = EvidenceCoordinate(
-                            page=page_num,
-                            x=float(word_info['x0']),
-                            y=float(word_info['top']),
-                            width=float(word_info['x1'] - word_info['x0']),
-                            height=float(word_info['bottom'] - word_info['top']),
-                            text=word_info['text'],
-                            context=context
-                        )
-                        
-                        coordinates.append(coord)
-                        break  # Evitar duplicados para la misma palabra
+            for (x0, top, x1, bottom, text), word_text in zip(words, lowered_words):
+                # Verificar si la palabra es (o contiene) alguna keyword
+                if matcher.matches_word(word_text):
+                    # Extraer contexto alrededor de la palabra
+                    context = self._extract_context(page_text, page_text_lower, word_text, 100)
+                    
+                    xs.append(x0)
+                    ys.append(top)
+                    ws.append(x1 - x0)
+                    hs.append(bottom - top)
+                    texts.append(text)
+                    contexts.append(context)
         
         except Exception as e:
             logger.warning(f"Error extrayendo coordenadas de página {page_num}: {e}")
         
-        return coordinates
+        return CoordBatch.from_lists(
+            [page_num] * len(texts), xs, ys, ws, hs, texts, contexts
+        )
     
-    def _extract_highlighted_text(self, page_text: str, keywords: List[str]) -> List[str]:
+    def _extract_highlighted_text(self, page_text: str, keyword_re: re.Pattern) -> List[str]:
         """
         Extrae fragmentos de texto que contienen keywords relevantes
         """
         highlighted = []
+        seen = set()
         
-        for keyword in keywords:
-            # Buscar keyword en el texto
-            pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-            matches = pattern.finditer(page_text)
+        # Una sola pasada sobre el texto para todas las keywords
+        for match in keyword_re.finditer(page_text):
+            # Extraer contexto alrededor del match
+            match_start, match_end = match.span()
+            start = max(0, match_start - 50)
+            end = min(len(page_text), match_end + 50)
             
-            for match in matches:
-                # Extraer contexto alrededor del match
-                start = max(0, match.start() - 50)
-                end = min(len(page_text), match.end() + 50)
-                context = page_text[start:end].strip()
-                
-                # Limpiar el contexto
-                context = re.sub(r'\s+', ' ', context)
+            # Limpiar el contexto (colapsa espacios y recorta extremos)
+            context = ' '.join(page_text[start:end].split())
+            
+            if len(context) > 10 and context not in seen:
+                seen.add(context)
+                highlighted.append(context)
                 
-                if len(context) > 10 and context not in highlighted:
-                    highlighted.append(context)
+                # Limitar a 5 fragmentos: no seguir escaneando la página
+                if len(highlighted) >= 5:
+                    break
         
-        return highlighted[:5]  # Limitar a 5 fragmentos más relevantes
+        return highlighted
     
-    def _extract_context(self, full_text: str, target_word: str, context_length: int = 100) -> str:
+    def _extract_context(self, full_text: str, full_text_lower: str, target_word: str,
+                         context_length: int = 100) -> str:
         """
-        Extrae contexto alrededor de una palabra específica
+        Extrae contexto alrededor de una palabra específica.
+        
+        `target_word` debe venir en minúsculas: se busca con str.find sobre el
+        texto de la página ya bajado a minúsculas, sin pasar por regex.
         """
-        try:
-            # Buscar la palabra en el texto
-            pattern = re.compile(re.escape(target_word), re.IGNORECASE)
-            match = pattern.search(full_text)
-            
-            if match:
-                start = max(0, match.start() - context_length)
-                end = min(len(full_text), match.end() + context_length)
-                context = full_text[start:end].strip()
-                
-                # Limpiar espacios múltiples
-                context = re.sub(r'\s+', ' ', context)
-                return context
+        idx = full_text_lower.find(target_word)
+        
+        if idx >= 0:
+            start = max(0, idx - context_length)
+            end = min(len(full_text), idx + len(target_word) + context_length)
             
-        except Exception:
-            pass
+            # Limpiar espacios múltiples
+            return ' '.join(full_text[start:end].split())
         
         return target_word
     
-    def _calculate_extraction_confidence(self, coordinates: List[EvidenceCoordinate], 
+    def _calculate_extraction_confidence(self, coordinates: CoordBatch, 
                                        highlighted_text: List[str], 
-                                       red_flag: RedFlag) -> float:
+                                       red_flag: "RedFlag") -> float:
         """
         Calcula la confianza de la extracción de evidencia
         """
@@ -262,10 +614,14 @@ class PDFEvidenceViewer:
             confidence += 0.1
         
         # Bonus: coincidencia con evidencia de la red flag
-        evidence_text = ' '.join(red_flag.evidence).lower()
-        highlighted_lower = [h.lower() for h in highlighted_text]
+        evidence_words = ' '.join(red_flag.evidence).lower().split()
         
-        matches = sum(1 for h in highlighted_lower if any(word in h for word in evidence_text.split()))
+        matches = 0
+        if evidence_words:
+            for h in highlighted_text:
+                h_lower = h.lower()
+                if any(word in h_lower for word in evidence_words):
+                    matches += 1
         if matches > 0:
             confidence += min(0.2, matches * 0.05)
         
@@ -278,7 +634,7 @@ class PDFEvidenceViewer:
         return PDFEvidenceData(
             red_flag_id=red_flag_id,
             document_path=document_path,
-            coordinates=[],
+            coordinates=CoordBatch.empty(),
             highlighted_text=[],
             total_pages=0,
             extraction_confidence=0.0
@@ -287,39 +643,41 @@ class PDFEvidenceViewer:
     def generate_pdf_viewer_url(self, evidence_data: PDFEvidenceData, 
                                base_url: str = "http://localhost:8000") -> str:
         """
-        Genera URL para abrir PDF con evidencia destacada
+        Genera URL para abrir PDF con evidencia destacada.
+        
+        El parámetro `highlight` es un JSON compacto con una lista de objetos
+        `{x, y, width, height}` (máximo 5), en coordenadas de página: el mismo
+        formato que arma el visor generado (`JSON.stringify` de las coordenadas).
         """
+        doc_url = f"{base_url}/documents/{evidence_data.document_name}"
+        
         if not evidence_data.coordinates:
-            return f"{base_url}/documents/{Path(evidence_data.document_path).name}"
+            return doc_url
         
-        # Usar la primera coordenada como referencia
-        first_coord = evidence_data.coordinates[0]
+        coords = evidence_data.coordinates
+        highlights = [
+            {'x': x, 'y': y, 'width': w, 'height': h}
+            for x, y, w, h in zip(  # Limitar a 5 destacados
+                coords.x[:5].tolist(), coords.y[:5].tolist(),
+                coords.w[:5].tolist(), coords.h[:5].tolist()
+            )
+        ]
         
-        # Crear parámetros para el visor PDF
+        # Crear parámetros para el visor PDF (primera coordenada como referencia)
         params = {
-            'page': first_coord.page,
+            'page': int(coords.page[0]),
             'zoom': 150,  # Zoom al 150%
-            'highlight': json.dumps([
-                {
-                    'x': coord.x,
-                    'y': coord.y,
-                    'width': coord.width,
-                    'height': coord.height
-                }
-                for coord in evidence_data.coordinates[:5]  # Limitar a 5 destacados
-            ])
+            'highlight': json.dumps(highlights, separators=(',', ':'))
         }
         
-        param_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        
-        return f"{base_url}/documents/{Path(evidence_data.document_path).name}?{param_string}"
+        return f"{doc_url}?{urlencode(params)}"
     
     def create_evidence_report(self, evidence_data: PDFEvidenceData) -> str:
         """
         Crea reporte textual de la evidencia encontrada
         """
-        report = f"""
-📄 REPORTE DE EVIDENCIA - {Path(evidence_data.document_path).name}
+        parts = [f"""
+📄 REPORTE DE EVIDENCIA - {evidence_data.document_name}
 {'='*60}
 
 Red Flag ID: {evidence_data.red_flag_id}
@@ -329,53 +687,102 @@ Coordenadas encontradas: {len(evidence_data.coordinates)}
 Texto destacado: {len(evidence_data.highlighted_text)}
 
 📍 UBICACIONES EN PDF:
-"""
+"""]
         
         for i, coord in enumerate(evidence_data.coordinates[:10], 1):
-            report += f"""
+            parts.append(f"""
 {i}. Página {coord.page}
    Posición: x={coord.x:.1f}, y={coord.y:.1f}
    Dimensiones: {coord.width:.1f} x {coord.height:.1f}
    Texto: "{coord.text}"
    Contexto: {coord.context[:100]}...
-"""
+""")
         
         if evidence_data.highlighted_text:
-            report += f"\n💡 TEXTO DESTACADO:\n"
+            parts.append("\n💡 TEXTO DESTACADO:\n")
             for i, text in enumerate(evidence_data.highlighted_text, 1):
-                report += f"\n{i}. {text}\n"
+                parts.append(f"\n{i}. {text}\n")
         
-        return report
+        return ''.join(parts)
     
     def batch_extract_evidence(self, pdf_directory: Path, 
-                              red_flags: List[RedFlag]) -> Dict[str, PDFEvidenceData]:
+                              red_flags: List["RedFlag"],
+                              max_workers: Optional[int] = None) -> Dict[str, PDFEvidenceData]:
         """
-        Extrae evidencia para múltiples red flags de un directorio de PDFs
+        Extrae evidencia para múltiples red flags de un directorio de PDFs.
+        
+        Las red flags se agrupan por documento (cada PDF se parsea una vez)
+        y los documentos se procesan en paralelo en un pool de procesos.
         """
         evidence_results = {}
         
         logger.info(f"Procesando evidencia para {len(red_flags)} red flags")
         
+        # Agrupar red flags por documento
+        flags_by_doc = defaultdict(list)
         for red_flag in red_flags:
-            # Buscar PDF correspondiente
-            pdf_file = pdf_directory / red_flag.document_id
+            flags_by_doc[red_flag.document_id].append(red_flag)
+        
+        # Resolver el PDF correspondiente a cada documento
+        jobs = {}
+        for document_id, doc_flags in flags_by_doc.items():
+            pdf_file = pdf_directory / document_id
             
             if not pdf_file.exists():
                 # Intentar con extensión .pdf
-                pdf_file = pdf_directory / f"{red_flag.document_id}"
+                pdf_file = pdf_directory / f"{document_id}.pdf"
                 if not pdf_file.exists():
-                    logger.warning(f"PDF no encontrado para {red_flag.document_id}")
+                    logger.warning(f"PDF no encontrado para {document_id}")
                     continue
             
-            # Extraer evidencia
-            evidence_data = self.extract_evidence_coordinates(pdf_file, red_flag)
-            evidence_results[red_flag.id] = evidence_data
+            jobs[document_id] = (pdf_file, doc_flags)
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        
+        if len(jobs) <= 1 or max_workers <= 1:
+            # Sin paralelismo útil: evitar el costo de levantar el pool
+            for document_id, (pdf_file, doc_flags) in jobs.items():
+                doc_results = self.extract_document_evidence(pdf_file, doc_flags)
+                self._log_document_evidence(document_id, doc_results)
+                evidence_results.update(doc_results)
+            return evidence_results
+        
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            futures = {
+                executor.submit(
+                    _process_document, self.backend.name, self.cache_dir, pdf_file, doc_flags
+                ): document_id
+                for document_id, (pdf_file, doc_flags) in jobs.items()
+            }
             
-            logger.info(f"Evidencia extraída para {red_flag.document_id}: "
-                       f"{len(evidence_data.coordinates)} coordenadas, "
-                       f"confianza: {evidence_data.extraction_confidence:.1%}")
+            for future in as_completed(futures):
+                document_id = futures[future]
+                try:
+                    doc_results = future.result()
+                except Exception as e:
+                    logger.error(f"Error procesando evidencia de {document_id}: {e}")
+                    continue
+                
+                self._log_document_evidence(document_id, doc_results)
+                evidence_results.update(doc_results)
         
         return evidence_results
+    
+    def _log_document_evidence(self, document_id: str,
+                               doc_results: Dict[str, PDFEvidenceData]) -> None:
+        for evidence_data in doc_results.values():
+            logger.info(f"Evidencia extraída para {document_id}: "
+                       f"{len(evidence_data.coordinates)} coordenadas, "
+                       f"confianza: {evidence_data.extraction_confidence:.1%}")
+
+def _process_document(backend: str, cache_dir: Optional[Path], pdf_file: Path,
+                      red_flags: List["RedFlag"]) -> Dict[str, PDFEvidenceData]:
+    """
+    Worker del pool de procesos: extrae la evidencia de todas las red flags
+    de un documento (debe ser top-level para poder serializarse)
+    """
+    viewer = PDFEvidenceViewer(backend, cache_dir=cache_dir)
+    return viewer.extract_document_evidence(pdf_file, red_flags)
 
 def main():
     """
@@ -386,6 +793,7 @@ def main():
     viewer = PDFEvidenceViewer()
     
     # Crear red flag de ejemplo
+    sys.path.append(str(Path(__file__).parent.parent))
     from agents.detection_agent import RedFlag
     import datetime
     